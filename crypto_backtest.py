@@ -0,0 +1,415 @@
+import argparse
+import csv
+import datetime
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from crypto_signals import (
+    FLAT_TOLERANCE, MA_WINDOW, PO_PROFIT_PCT, PO_TRADE_DURATION, TREND_LOOKBACK, TREND_TOLERANCE,
+    WIN_LIKELIHOOD_WINDOW,
+)
+from crypto_engine import Predictor, Tick
+from crypto_indicators import SIGNALS, signal_batch
+from crypto_tickstore import TickView, iter_log_ticks
+
+UP, FLAT, DOWN = 1, 0, -1
+
+
+# --- Inputs ---
+
+def load_log(path, symbol=None):
+    """
+    Read (timestamps, prices) for one symbol from a crypto_predictor.log.
+    Untagged single-symbol lines belong to the symbol named by the latest
+    "Script started" line. With symbol=None the log must hold exactly one symbol.
+    """
+    series = {}
+    for name, t, binance, _ in iter_log_ticks(path):
+        series.setdefault(name, []).append((t, binance))
+    if symbol is None:
+        if len(series) != 1:
+            raise ValueError(f"Log holds several symbols, pick one of: {sorted(series, key=str)}")
+        symbol = next(iter(series))
+    rows = series.get(symbol, [])
+    rows.sort(key=lambda row: row[0])
+    return _arrays(rows)
+
+
+def load_csv(path):
+    """Read (timestamps, prices) from a CSV whose first two columns are time and price.
+    Times may be epoch seconds or ISO dates; a header row is skipped."""
+    rows = []
+    with open(path, newline='') as f:
+        for record in csv.reader(f):
+            if len(record) < 2:
+                continue
+            try:
+                price = float(record[1])
+            except ValueError:
+                continue  # header
+            try:
+                t = float(record[0])
+            except ValueError:
+                t = datetime.datetime.fromisoformat(record[0].strip()).timestamp()
+            rows.append((t, price))
+    rows.sort(key=lambda row: row[0])
+    return _arrays(rows)
+
+
+def load_ticks(path):
+    """Read (timestamps, prices) from a binary tick file written by crypto_tickstore."""
+    with TickView(path) as ticks:
+        array = ticks.as_array()
+        # Copy out of the memory map so the view can be closed
+        return array['t'].copy(), array['binance'].copy()
+
+
+def synthetic_series(n, start_price=50000.0, volatility=0.0004, interval=5.0, tick_size=0.01, seed=None, start=None):
+    """Random-walk prices on a fixed tick grid. Rounding to `tick_size` yields FLAT ticks too."""
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0.0, volatility, n)
+    steps[0] = 0.0
+    prices = np.round(start_price * np.exp(np.cumsum(steps)) / tick_size) * tick_size
+    if start is None:
+        start = float(int(time.time()))
+    timestamps = start + np.arange(n) * float(interval)
+    return timestamps, prices
+
+
+def _arrays(rows):
+    timestamps = np.array([row[0] for row in rows], dtype=np.float64)
+    prices = np.array([row[1] for row in rows], dtype=np.float64)
+    return timestamps, prices
+
+
+# --- Engine ---
+
+class BacktestResult:
+    """
+    Everything the live predictor would have produced for a series.
+    Per-tick arrays: predictions and trend (UP=1, FLAT=0, DOWN=-1), confidence,
+    profit (NaN before the first buy-in), win_likelihood and po_balance.
+    Events: buy_in_idx, notice_idx and po_trades as
+    (buy_time, buy_price, sell_time, sell_price, result) with epoch times.
+    """
+
+    def __init__(self, timestamps, prices, investment, **fields):
+        self.timestamps = timestamps
+        self.prices = prices
+        self.investment = investment
+        self.__dict__.update(fields)
+
+    @property
+    def buy_in_points(self):
+        return list(zip(self.timestamps[self.buy_in_idx].tolist(), self.prices[self.buy_in_idx].tolist()))
+
+    @property
+    def po_wins(self):
+        return sum(1 for t in self.po_trades if t[-1] == 'WIN')
+
+    @property
+    def po_win_rate(self):
+        return self.po_wins / len(self.po_trades) * 100 if self.po_trades else 0.0
+
+    def summary(self):
+        n = len(self.prices)
+        if not n:
+            return "Empty series."
+        span = (self.timestamps[-1] - self.timestamps[0]) / 3600
+        final_profit = self.profit[-1]
+        lines = [
+            f"Ticks: {n} over {span:.1f} h",
+            f"Prediction win rate: {self.win_rate:.1f}%",
+            f"Buy-in signals: {len(self.buy_in_idx)} | 4-min notices: {len(self.notice_idx)}",
+            f"Profit on last buy-in: ${final_profit:+.2f}" if not np.isnan(final_profit) else "No buy-in signal.",
+            f"PO Trades: {len(self.po_trades)} W:{self.po_wins} L:{len(self.po_trades) - self.po_wins} "
+            f"({self.po_win_rate:.1f}% wins)",
+            f"PO Balance: ${self.po_balance[-1]:.2f} (min ${self.po_balance.min():.2f}, max ${self.po_balance.max():.2f})",
+        ]
+        return '\n'.join(lines)
+
+
+def backtest(timestamps, prices, investment=100.0, window=MA_WINDOW, po_trade_duration=PO_TRADE_DURATION,
+             po_profit_pct=PO_PROFIT_PCT, win_window=WIN_LIKELIHOOD_WINDOW, pocket_options=True, signal='delta'):
+    """
+    Replay a price series through the predictor's signal logic with NumPy.
+    Mirrors crypto_engine.Predictor tick for tick; see verify(). `signal`
+    names the crypto_indicators signal that decides the direction, computed
+    with its batch form.
+    """
+    ts = np.asarray(timestamps, dtype=np.float64)
+    p = np.asarray(prices, dtype=np.float64)
+    n = len(p)
+    idx = np.arange(n)
+
+    # Direction of every tick; for 'delta' the sign of the one-step move, FLAT on the first tick
+    pred = signal_batch(signal, p, window)
+
+    # Confidence, computed with the same expressions as the live code
+    confidence = np.zeros(n)
+    if n > 2:
+        p1, p2, p3 = p[2:], p[1:-1], p[:-2]
+        cur = pred[2:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            up = np.where(p2 - p3 != 0, (p1 - p2) / (p2 - p3) * 100, 0.0)
+            down = np.where(p2 - p1 != 0, (p3 - p2) / (p2 - p1) * 100, 0.0)
+        confidence[2:] = np.where(cur == UP, up, np.where(cur == DOWN, down, 0.0))
+
+    # Buy-in on every DOWN/FLAT -> UP reversal. A non-UP tick always precedes
+    # a reversal and re-arms the announcement, so every reversal is a buy-in.
+    reversal = np.zeros(n, dtype=bool)
+    reversal[1:] = (pred[1:] == UP) & (pred[:-1] != UP)
+    buy_in_idx = np.flatnonzero(reversal)
+    last_buy = np.maximum.accumulate(np.where(reversal, idx, -1)) if n else idx
+    buy_price = np.where(last_buy >= 0, p[np.maximum(last_buy, 0)], np.nan)
+    profit = investment / buy_price * p - investment
+
+    # 2-3 min trend from running sums, as PriceHistory.moving_average_at does
+    cum = np.cumsum(p)
+
+    def ma_at(offset):
+        k = np.searchsorted(ts, ts - offset, side='left')
+        start = np.maximum(k - window + 1, 0)
+        lo = np.where(start > 0, cum[np.maximum(start - 1, 0)], 0.0)
+        return (cum[k] - lo) / (k - start + 1)
+
+    trend = np.zeros(n, dtype=np.int8)
+    notice_idx = np.array([], dtype=np.int64)
+    if n:
+        back_3, back_2 = TREND_LOOKBACK
+        ma_3, ma_2 = ma_at(back_3), ma_at(back_2)
+        flat = np.abs(ma_2 - ma_3) <= TREND_TOLERANCE * np.abs(ma_3)
+        trend = np.where(flat, FLAT, np.where(ma_2 > ma_3, UP, DOWN)).astype(np.int8)
+        notice = trend == UP
+        notice[1:] &= trend[:-1] != UP
+        notice_idx = np.flatnonzero(notice)
+
+    # Rolling win likelihood over the last `win_window` scored predictions
+    hits = np.zeros(n, dtype=np.int64)
+    if n > 1:
+        prev, move = pred[:-1], p[1:] - p[:-1]
+        hits[1:] = np.where(prev == UP, move > 0,
+                            np.where(prev == DOWN, move < 0, np.abs(move) < FLAT_TOLERANCE))
+    scored = np.cumsum(hits)
+    first = np.maximum(idx - win_window + 1, 1)
+    counts = idx - first + 1
+    window_hits = scored - np.where(first > 1, scored[np.maximum(first - 1, 0)], 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_likelihood = np.where(idx > 0, window_hits / np.maximum(counts, 1) * 100, 0.0)
+    win_rate = hits[1:].mean() * 100 if n > 1 else 0.0
+
+    # Pocket Options: walk the open -> close chain, one step per trade
+    po_trades = []
+    pnl = np.zeros(n)
+    po_open = None
+    if pocket_options and len(buy_in_idx):
+        r = 0
+        while r < len(buy_in_idx):
+            i = buy_in_idx[r]
+            j = int(np.searchsorted(ts, ts[i] + po_trade_duration, side='left'))
+            j = max(j - 1, i)
+            while j < n and ts[j] - ts[i] < po_trade_duration:
+                j += 1
+            if j >= n:
+                po_open = (float(ts[i]), float(p[i]))
+                break
+            result = 'WIN' if p[j] > p[i] else 'LOSS'
+            po_trades.append((float(ts[i]), float(p[i]), float(ts[j]), float(p[j]), result))
+            pnl[j] = investment * po_profit_pct if result == 'WIN' else -investment
+            r = int(np.searchsorted(buy_in_idx, j, side='right'))
+    po_balance = np.cumsum(pnl)
+
+    return BacktestResult(
+        ts, p, investment,
+        predictions=pred, confidence=confidence, buy_in_idx=buy_in_idx, profit=profit,
+        trend=trend, notice_idx=notice_idx, win_likelihood=win_likelihood, win_rate=win_rate,
+        po_trades=po_trades, po_open=po_open, po_balance=po_balance,
+    )
+
+
+def verify(timestamps, prices, result=None, **params):
+    """
+    Replay the series through the live Predictor and compare every tick
+    with the vectorized backtest. Returns a list of mismatch descriptions.
+    """
+    if result is None:
+        result = backtest(timestamps, prices, **params)
+    predictor = Predictor('BACKTEST', investment=params.get('investment', 100.0),
+                          window=params.get('window', MA_WINDOW),
+                          pocket_options=params.get('pocket_options', True),
+                          po_trade_duration=params.get('po_trade_duration', PO_TRADE_DURATION),
+                          po_profit_pct=params.get('po_profit_pct', PO_PROFIT_PCT),
+                          win_window=params.get('win_window', WIN_LIKELIHOOD_WINDOW),
+                          signal=params.get('signal', 'delta'))
+    codes = {'UP': UP, 'FLAT': FLAT, 'DOWN': DOWN, None: FLAT}
+    buy_ins = set(result.buy_in_idx.tolist())
+    notices = set(result.notice_idx.tolist())
+    mismatches = []
+
+    def check(i, name, live, vector):
+        if live != vector and not (live is None and np.isnan(vector)):
+            mismatches.append(f"tick {i}: {name} live={live} backtest={vector}")
+
+    for i, (t, price) in enumerate(zip(result.timestamps.tolist(), result.prices.tolist())):
+        live = predictor.step(Tick(t, price), snapshot=False)
+        check(i, 'prediction', codes[live.prediction], int(result.predictions[i]))
+        check(i, 'confidence', live.confidence, float(result.confidence[i]))
+        check(i, 'buy-in', live.bought_in, i in buy_ins)
+        check(i, 'profit', live.profit, float(result.profit[i]))
+        check(i, 'trend', codes[live.trend], int(result.trend[i]))
+        check(i, 'notice', live.notice, i in notices)
+        check(i, 'win likelihood', live.win_likelihood, float(result.win_likelihood[i]))
+        if len(mismatches) > 20:
+            break
+    if predictor.po_trades != result.po_trades:
+        mismatches.append(f"PO trades differ: live {len(predictor.po_trades)} vs backtest {len(result.po_trades)}")
+    elif predictor.po_trades and predictor.po_balance != result.po_balance[-1]:
+        mismatches.append(f"PO balance live={predictor.po_balance} backtest={result.po_balance[-1]}")
+    return mismatches
+
+
+# --- Parameter sweep ---
+
+SWEEP_DURATIONS = (30, 60, 120, 180, 300)
+SWEEP_PROFITS = (0.7, 0.8, 0.9)
+SWEEP_WINDOWS = (3, 5, 10, 20)
+
+_sweep_series = None
+
+
+def _init_sweep(timestamps, prices):
+    # Each worker receives the series once, not once per task
+    global _sweep_series
+    _sweep_series = (timestamps, prices)
+
+
+def _sweep_task(duration, window, profits, investment, horizon, signal):
+    """
+    Rows for one (duration, window) backtest. The payout only scales wins,
+    so every payout in `profits` is priced from the same run.
+    """
+    timestamps, prices = _sweep_series
+    result = backtest(timestamps, prices, investment=investment, window=window, po_trade_duration=duration,
+                      signal=signal)
+    trades = len(result.po_trades)
+    wins = result.po_wins
+    # Trend hit rate: did the price `horizon` seconds later move the way the trend said?
+    ts, p, trend = result.timestamps, result.prices, result.trend
+    later = np.searchsorted(ts, ts + horizon, side='left')
+    called = (trend != FLAT) & (later < len(p))
+    moved = np.sign(p[np.minimum(later, len(p) - 1)] - p)
+    trend_hits = float((moved[called] == trend[called]).mean() * 100) if called.any() else 0.0
+    return [
+        {'duration': duration, 'payout': payout, 'window': window, 'trades': trades, 'wins': wins,
+         'win_rate': wins / trades * 100 if trades else 0.0,
+         'balance': wins * investment * payout - (trades - wins) * investment,
+         'notices': len(result.notice_idx), 'trend_hits': trend_hits}
+        for payout in profits
+    ]
+
+
+def sweep(timestamps, prices, durations=SWEEP_DURATIONS, profits=SWEEP_PROFITS, windows=SWEEP_WINDOWS,
+          investment=100.0, workers=None, horizon=TREND_LOOKBACK[1], signal='delta'):
+    """
+    Backtest every duration x payout x window combination of one signal
+    across a process pool. Returns rows ranked by final PO balance, then
+    trend hit rate.
+    """
+    ts = np.asarray(timestamps, dtype=np.float64)
+    p = np.asarray(prices, dtype=np.float64)
+    jobs = [(d, w) for d in durations for w in windows]
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    rows = []
+    if workers == 1:
+        _init_sweep(ts, p)
+        for d, w in jobs:
+            rows.extend(_sweep_task(d, w, profits, investment, horizon, signal))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_sweep, initargs=(ts, p)) as pool:
+            futures = [pool.submit(_sweep_task, d, w, profits, investment, horizon, signal) for d, w in jobs]
+            for future in futures:
+                rows.extend(future.result())
+    rows.sort(key=lambda r: (r['balance'], r['trend_hits']), reverse=True)
+    return rows
+
+
+def sweep_table(rows, top=None):
+    lines = [f"{'rank':>4} {'duration':>8} {'payout':>6} {'window':>6} {'trades':>6} {'win %':>6} "
+             f"{'balance':>11} {'notices':>7} {'trend %':>7}"]
+    for rank, r in enumerate(rows[:top] if top else rows, 1):
+        lines.append(f"{rank:>4} {r['duration']:>7g}s {r['payout']:>6.2f} {r['window']:>6} {r['trades']:>6} "
+                     f"{r['win_rate']:>6.1f} {r['balance']:>11.2f} {r['notices']:>7} {r['trend_hits']:>7.1f}")
+    return '\n'.join(lines)
+
+
+def _number_list(text, kind=float):
+    return tuple(kind(part) for part in text.split(',') if part.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a price series through crypto_predictor's signal logic.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--log', help="crypto_predictor.log to replay")
+    source.add_argument('--csv', help="CSV with timestamp,price rows")
+    source.add_argument('--ticks', help="binary tick file from crypto_tickstore")
+    source.add_argument('--synthetic', type=int, metavar='TICKS', help="random-walk series of this many 5 s ticks")
+    parser.add_argument('--symbol', help="symbol to take from a multi-symbol log")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--investment', type=float, default=100.0)
+    parser.add_argument('--window', type=int, default=MA_WINDOW)
+    parser.add_argument('--duration', type=float, default=PO_TRADE_DURATION, help="PO trade duration in seconds")
+    parser.add_argument('--payout', type=float, default=PO_PROFIT_PCT, help="PO payout fraction for a win")
+    parser.add_argument('--signal', choices=list(SIGNALS), default='delta', help="indicator driving UP/DOWN")
+    parser.add_argument('--verify', action='store_true', help="check every tick against the live code path")
+    parser.add_argument('--sweep', action='store_true', help="rank a grid of duration x payout x window settings")
+    parser.add_argument('--durations', default=','.join(map(str, SWEEP_DURATIONS)), help="sweep: PO durations (s)")
+    parser.add_argument('--payouts', default=','.join(map(str, SWEEP_PROFITS)), help="sweep: PO payout fractions")
+    parser.add_argument('--windows', default=','.join(map(str, SWEEP_WINDOWS)), help="sweep: MA windows")
+    parser.add_argument('--workers', type=int, default=None, help="sweep: worker processes (default: CPU count)")
+    parser.add_argument('--top', type=int, default=20, help="sweep: rows to print")
+    args = parser.parse_args()
+
+    if args.log:
+        timestamps, prices = load_log(args.log, args.symbol)
+    elif args.csv:
+        timestamps, prices = load_csv(args.csv)
+    elif args.ticks:
+        timestamps, prices = load_ticks(args.ticks)
+    else:
+        timestamps, prices = synthetic_series(args.synthetic, seed=args.seed)
+    if args.sweep:
+        durations = _number_list(args.durations)
+        profits = _number_list(args.payouts)
+        windows = _number_list(args.windows, int)
+        start = time.perf_counter()
+        rows = sweep(timestamps, prices, durations, profits, windows, args.investment, args.workers,
+                     signal=args.signal)
+        elapsed = time.perf_counter() - start
+        print(sweep_table(rows, args.top))
+        print(f"{len(rows)} combinations over {len(prices)} ticks in {elapsed:.2f} s")
+        return
+    params = dict(investment=args.investment, window=args.window,
+                  po_trade_duration=args.duration, po_profit_pct=args.payout, signal=args.signal)
+
+    start = time.perf_counter()
+    result = backtest(timestamps, prices, **params)
+    elapsed = time.perf_counter() - start
+    print(result.summary())
+    print(f"Backtest time: {elapsed * 1000:.1f} ms")
+    if args.verify:
+        start = time.perf_counter()
+        mismatches = verify(timestamps, prices, result, **params)
+        print(f"Live replay time: {(time.perf_counter() - start) * 1000:.1f} ms")
+        if mismatches:
+            print("MISMATCH against the live code path:")
+            for line in mismatches:
+                print(f"  {line}")
+            raise SystemExit(1)
+        print("Verified: backtest matches the live code path on every tick.")
+
+
+if __name__ == "__main__":
+    main()
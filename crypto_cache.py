@@ -0,0 +1,163 @@
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+COUNTERS = ('hits', 'stale_hits', 'misses', 'coalesced', 'refreshes', 'errors')
+
+
+class TTLCache:
+    """
+    Response cache with per-source TTLs, single-flight loading and
+    stale-while-revalidate.
+
+    get(source, key, loader) returns a cached value younger than the
+    source's TTL without calling loader. A value past its TTL but within
+    the source's stale window is still returned immediately while one
+    background refresh replaces it, so callers never wait on a refresh.
+    Anything older is a miss and blocks on loader(). Concurrent callers
+    asking for the same key share one in-flight load. Failed loads are
+    never cached. A source with TTL 0 is not cached, but concurrent
+    identical requests are still coalesced.
+    """
+
+    def __init__(self, ttls=None, stale=None, clock=None, refresh_workers=2):
+        self.ttls = dict(ttls or {})
+        self.stale = dict(stale or {})
+        self._clock = clock or time.monotonic
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (value, stored_at)
+        self._inflight = {}  # key -> Future
+        self._counters = {}
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix='cache-refresh')
+
+    def _count(self, source, name):
+        counters = self._counters.get(source)
+        if counters is None:
+            counters = self._counters[source] = dict.fromkeys(COUNTERS, 0)
+        counters[name] += 1
+
+    def get(self, source, key, loader):
+        ttl = self.ttls.get(source, 0)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                age = self._clock() - stored_at
+                if age < ttl:
+                    self._count(source, 'hits')
+                    return value
+                if age < ttl + self.stale.get(source, 0):
+                    self._count(source, 'stale_hits')
+                    if key not in self._inflight:
+                        self._count(source, 'refreshes')
+                        future = self._inflight[key] = Future()
+                        self._executor.submit(self._load, source, key, loader, future)
+                    return value
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                self._count(source, 'misses')
+                future = self._inflight[key] = Future()
+            else:
+                self._count(source, 'coalesced')
+        if owner:
+            self._load(source, key, loader, future)
+        return future.result()
+
+    def _load(self, source, key, loader, future):
+        try:
+            value = loader()
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self._count(source, 'errors')
+            future.set_exception(e)
+            return
+        with self._lock:
+            if self.ttls.get(source, 0) > 0:
+                self._entries[key] = (value, self._clock())
+            self._inflight.pop(key, None)
+        future.set_result(value)
+
+    def invalidate(self, source=None):
+        with self._lock:
+            if source is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == source]:
+                    del self._entries[key]
+
+    def stats(self):
+        """Counters per source, plus the share of lookups served without waiting on upstream."""
+        with self._lock:
+            stats = {source: dict(counters) for source, counters in self._counters.items()}
+        for counters in stats.values():
+            served = counters['hits'] + counters['stale_hits']
+            lookups = served + counters['misses'] + counters['coalesced']
+            counters['hit_rate'] = served / lookups * 100 if lookups else 0.0
+        return stats
+
+    def summary(self):
+        parts = []
+        for source, c in sorted(self.stats().items()):
+            parts.append(f"{source}: {c['hits']} hits, {c['stale_hits']} stale, {c['misses']} misses, "
+                         f"{c['coalesced']} coalesced, {c['errors']} errors ({c['hit_rate']:.0f}% cached)")
+        return "Cache " + ('; '.join(parts) if parts else "empty")
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def benchmark(ticks=120, interval=5.0):
+    """Upstream CoinGecko traffic for a simulated 10-minute session with and without the cache."""
+    from crypto_feed import DEFAULT_CACHE_STALE, DEFAULT_CACHE_TTLS, PriceFetcher, StubPriceServer
+
+    now = [0.0]
+    with StubPriceServer(latency={'coingecko': 0.05}) as stub:
+        plain = PriceFetcher(stub.url, stub.url, cache=TTLCache())
+        for _ in range(ticks):
+            plain.fetch('BTCUSDT', 'bitcoin', 'usd')
+        uncached = stub.requests['coingecko']
+
+        stub.requests = {'binance': 0, 'coingecko': 0}
+        cache = TTLCache(DEFAULT_CACHE_TTLS, DEFAULT_CACHE_STALE, clock=lambda: now[0])
+        fetcher = PriceFetcher(stub.url, stub.url, cache=cache)
+        slowest = 0.0
+        for i in range(ticks):
+            now[0] = i * interval
+            quote = fetcher.fetch('BTCUSDT', 'bitcoin', 'usd')
+            if i:  # the first tick is always a miss
+                slowest = max(slowest, quote.elapsed)
+            while cache._inflight:  # a real tick gap is far longer than a refresh
+                time.sleep(0.005)
+        cached = stub.requests['coingecko']
+        stats = cache.stats()['coingecko']
+
+        # Eight threads asking for the same price at once share one request
+        stub.requests = {'binance': 0, 'coingecko': 0}
+        stub.latency['coingecko'] = 0.2
+        burst = PriceFetcher(stub.url, stub.url, cache=TTLCache(DEFAULT_CACHE_TTLS, DEFAULT_CACHE_STALE))
+        threads = [threading.Thread(target=burst.coingecko_price, args=('bitcoin', 'usd')) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        burst_requests = stub.requests['coingecko']
+        for f in (plain, fetcher, burst):
+            f.close()
+
+    print(f"{ticks} ticks at {interval:.0f} s ({ticks * interval / 60:.0f} simulated minutes)")
+    print(f"CoinGecko requests without cache: {uncached}")
+    print(f"CoinGecko requests with cache:    {cached} ({(1 - cached / uncached) * 100:.0f}% saved)")
+    print(f"  {stats['hits']} hits, {stats['stale_hits']} stale hits, {stats['misses']} misses, "
+          f"{stats['refreshes']} background refreshes")
+    print(f"Slowest tick after warm-up: {slowest * 1000:.1f} ms (upstream latency 50 ms)")
+    print(f"8 concurrent identical lookups: {burst_requests} upstream request(s)")
+
+
+if __name__ == "__main__":
+    if '--bench' in sys.argv:
+        benchmark()
+    else:
+        print("Usage: python crypto_cache.py --bench")
@@ -0,0 +1,373 @@
+import sys
+import time
+from collections import deque
+
+import matplotlib.dates as mdates
+
+from crypto_downsample import LODSeries
+
+SECONDS_PER_DAY = 86400.0
+
+
+def to_datenum(t):
+    # Matplotlib's default date epoch is 1970-01-01, so this is just a rescale
+    return t / SECONDS_PER_DAY
+
+
+class LiveChart:
+    """
+    Incremental live price chart for crypto_predictor.
+
+    All artists are created once and updated in place. The chart keeps
+    `history` seconds of prices (at least the scrolling `viewport`) in a
+    crypto_downsample.LODSeries, and the price line only ever holds about
+    one LTTB-downsampled point per pixel of whatever range is in view, so
+    zooming out to the whole history costs the same per frame as the
+    viewport. Buy-in and Pocket Options points are always kept on the line.
+    Frames are drawn with blitting; markers are stamped onto the cached
+    background once when they arrive and dropped after they leave the
+    history. The background (axes, ticks, legend, markers) is only fully
+    redrawn when the view limits have to move, which happens every
+    `scroll_step` fraction of the viewport or when the price leaves the
+    current y range.
+    """
+
+    def __init__(self, ax, label='Price', ylabel='Price (USD)', title='Live Price & Prediction',
+                 viewport=30 * 60, scroll_step=0.2, history=None):
+        self.ax = ax
+        self.fig = ax.figure
+        self.canvas = self.fig.canvas
+        self.viewport = viewport
+        self.scroll_step = scroll_step
+        self.history = max(history or viewport, viewport)
+        self.series = LODSeries(retention=self.history)
+        self._last = None           # (datenum, price) of the latest tick
+        self._shown = []            # prices currently on the line
+        self._scrolling = False
+        self._markers = deque()     # (datenum, [artists]) in arrival order
+        self._background = None
+        self._needs_redraw = True
+        self.full_redraws = 0
+
+        ax.set_xlabel('Time')
+        ax.set_ylabel(ylabel)
+        ax.set_title(title)
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
+        ax.tick_params(axis='x', labelrotation=45)
+        (self.line,) = ax.plot([], [], label=label, animated=True)
+        # Legend entry only; each buy-in gets its own marker artist
+        ax.plot([], [], linestyle='none', marker='o', markersize=9, color='lime', label='Buy-In Signal')
+        self.arrow = ax.annotate('', xy=(0, 0), xytext=(0, 0), animated=True, visible=False,
+                                 arrowprops=dict(facecolor='green', shrink=0.05, width=5, headwidth=15))
+        self.overlay = ax.text(0.01, 0.97, '', transform=ax.transAxes, fontsize=10, verticalalignment='top',
+                               bbox=dict(facecolor='white', alpha=0.7, edgecolor='gray'), animated=True)
+        ax.legend(loc='upper right')
+        self.fig.tight_layout()
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+        # Pans and zooms pick the matching level of detail
+        ax.callbacks.connect('xlim_changed', self._on_xlim)
+
+    def _dynamic_artists(self):
+        return (self.line, self.arrow, self.overlay)
+
+    def _on_draw(self, event):
+        # Any full draw (ours, a resize, a pan) refreshes the cached background
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_dynamic()
+
+    def _draw_dynamic(self):
+        for artist in self._dynamic_artists():
+            self.ax.draw_artist(artist)
+
+    # --- Data updates ---
+
+    def add_price(self, t, price, keep=False):
+        """Add a tick; `keep` holds its point on the line at every zoom level (e.g. a trade entry)."""
+        self.series.append(t, price, keep)
+        self._last = (to_datenum(t), price)
+        self._scroll(*self._last)
+
+    def add_prices(self, items):
+        """Add many (t, price, keep) ticks, e.g. warmed history, with one scroll at the end."""
+        for t, price, keep in items:
+            self.series.append(t, price, keep)
+            self._last = (to_datenum(t), price)
+        if self._last:
+            self._scroll(*self._last)
+
+    def add_buy_in(self, t, price):
+        x = to_datenum(t)
+        self.series.mark(t)
+        (marker,) = self.ax.plot([x], [price], linestyle='none', marker='o', markersize=9, color='lime', zorder=5)
+        text = self.ax.annotate('BUY', xy=(x, price), xytext=(0, 10), textcoords='offset points',
+                                color='green', fontsize=9, fontweight='bold')
+        self._add_marker(x, [marker, text])
+
+    def add_po_trade(self, buy_t, buy_price, sell_t, sell_price, result):
+        sell_x = to_datenum(sell_t)
+        self.series.mark(buy_t)
+        self.series.mark(sell_t)
+        color = 'blue' if result == 'WIN' else 'red'
+        (marker,) = self.ax.plot([to_datenum(buy_t), sell_x], [buy_price, sell_price], linestyle='none',
+                                 marker='x', markersize=8, color=color, zorder=6)
+        text = self.ax.annotate(result, xy=(sell_x, sell_price), xytext=(0, 15), textcoords='offset points',
+                                color=color, fontsize=9, fontweight='bold')
+        self._add_marker(sell_x, [marker, text])
+
+    def _add_marker(self, x, artists):
+        self._markers.append((x, artists))
+        if self._background is None or self._needs_redraw:
+            return
+        # Stamp the new marker onto the cached background instead of redrawing it
+        self.canvas.restore_region(self._background)
+        for artist in artists:
+            self.ax.draw_artist(artist)
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+
+    def set_prediction(self, prediction):
+        if self._last is None or prediction not in ('UP', 'DOWN'):
+            self.arrow.set_visible(False)
+            return
+        x, y = self._last
+        lo, hi = self.ax.get_ylim()
+        half = (hi - lo) * 0.04
+        if prediction == 'UP':
+            self.arrow.xy, self.arrow.xyann = (x, y + half), (x, y - half)
+            self.arrow.arrow_patch.set_facecolor('green')
+        else:
+            self.arrow.xy, self.arrow.xyann = (x, y - half), (x, y + half)
+            self.arrow.arrow_patch.set_facecolor('red')
+        self.arrow.set_visible(True)
+
+    def set_overlay(self, text):
+        self.overlay.set_text(text)
+
+    def _scroll(self, x, price):
+        span = self.viewport / SECONDS_PER_DAY
+        # Markers older than the history are left of any x limits the
+        # chart can show, so removing them does not require a redraw
+        cutoff = x - self.history / SECONDS_PER_DAY
+        while self._markers and self._markers[0][0] < cutoff:
+            for artist in self._markers.popleft()[1]:
+                artist.remove()
+
+        x0, x1 = self.ax.get_xlim()
+        if self._needs_redraw or x > x1:
+            self._scrolling = True
+            self.ax.set_xlim(x - span * (1 - self.scroll_step), x + span * self.scroll_step)
+            self._scrolling = False
+            self._refresh_line()
+            self._rescale_y()
+            self._needs_redraw = True
+            return
+        self._refresh_line()
+        y0, y1 = self.ax.get_ylim()
+        if not y0 <= price <= y1:
+            self._rescale_y()
+            self._needs_redraw = True
+
+    def _refresh_line(self):
+        """Put the downsampled points for the current x limits on the line."""
+        x0, x1 = self.ax.get_xlim()
+        pixels = max(1, int(self.ax.bbox.width))
+        times, prices = self.series.view(x0 * SECONDS_PER_DAY, x1 * SECONDS_PER_DAY, pixels)
+        self.line.set_data([to_datenum(t) for t in times], prices)
+        self._shown = prices
+
+    def _on_xlim(self, ax):
+        if not self._scrolling:
+            self._refresh_line()
+
+    def _rescale_y(self):
+        if not self._shown:
+            return
+        lo, hi = min(self._shown), max(self._shown)
+        margin = (hi - lo) * 0.15 or abs(hi) * 0.001 or 1.0
+        self.ax.set_ylim(lo - margin, hi + margin)
+
+    # --- Rendering ---
+
+    def render(self):
+        """Draw one frame: a full redraw if the view moved, otherwise a blit."""
+        if self._needs_redraw or self._background is None:
+            self._needs_redraw = False
+            self.full_redraws += 1
+            self.canvas.draw()  # fires _on_draw, which caches the background
+        else:
+            self.canvas.restore_region(self._background)
+            self._draw_dynamic()
+        self.canvas.blit(self.fig.bbox)
+        self.canvas.flush_events()
+
+
+class ChartSink:
+    """
+    crypto_engine sink that draws a Predictor's ticks on a LiveChart. Opens
+    its own interactive figure unless an axes is given.
+    """
+
+    def __init__(self, ax=None, viewport=30 * 60, history=None):
+        self.ax = ax
+        self.viewport = viewport
+        self.history = history
+        self.chart = None
+
+    def on_start(self, predictor):
+        if self.ax is None:
+            import matplotlib.pyplot as plt
+            plt.ion()
+            _, self.ax = plt.subplots()
+        self.chart = LiveChart(self.ax, label=f'Binance {predictor.symbol}',
+                               ylabel=f'{predictor.symbol} Price (USD)', viewport=self.viewport,
+                               history=self.history)
+        # Put warmed history that falls inside the chart's history back on the chart
+        history = predictor.history
+        if not history:
+            return
+        cutoff = history.time_at(-1) - self.chart.history
+        keep = {t for t, _ in predictor.buy_in_points}
+        keep.update(t for trade in predictor.po_trades for t in (trade[0], trade[2]))
+        if predictor.po_trade_open:
+            keep.add(predictor.po_trade_open[0])
+        self.chart.add_prices((history.time_at(i), history[i], history.time_at(i) in keep)
+                              for i in range(history.index_at(cutoff), len(history)))
+        for t, price in predictor.buy_in_points:
+            if t >= cutoff:
+                self.chart.add_buy_in(t, price)
+        for trade in predictor.po_trades:
+            if trade[2] >= cutoff:
+                self.chart.add_po_trade(*trade)
+
+    def on_tick(self, predictor, result):
+        chart = self.chart
+        # Keep a Pocket Options entry on the line at every zoom level, so its exit marker has a partner
+        opened = predictor.po_trade_open is not None and predictor.po_trade_open[0] == result.t
+        chart.add_price(result.t, result.price, keep=result.bought_in or opened)
+        if result.bought_in:
+            chart.add_buy_in(result.t, result.price)
+        if result.closed_trade:
+            chart.add_po_trade(*result.closed_trade)
+        chart.set_prediction(result.prediction)
+        chart.set_overlay(predictor.overlay_text())
+        chart.render()
+
+
+def plot_history(symbol, hours=24.0, directory=None):
+    """
+    Zoomable chart of a symbol's stored ticks (crypto_tickstore). The line
+    is redrawn from a LODSeries on every pan or zoom, so a day or a week of
+    ticks draws as fast as a few minutes.
+    """
+    import matplotlib.pyplot as plt
+    from crypto_tickstore import TICK_DIR, TickView, tick_path
+
+    series = LODSeries()
+    with TickView(tick_path(symbol, directory or TICK_DIR)) as ticks:
+        start = ticks.index_at(ticks[len(ticks) - 1][0] - hours * 3600) if len(ticks) else 0
+        series.extend((t, binance) for t, binance, _ in ticks.rows(start))
+    if not len(series):
+        print(f"No stored ticks for {symbol}")
+        return
+    fig, ax = plt.subplots()
+    (line,) = ax.plot([], [], label=f'Binance {symbol}')
+    ax.set_xlabel('Time')
+    ax.set_ylabel(f'{symbol} Price (USD)')
+    ax.set_title(f'{symbol}: last {hours:g} h, {len(series)} ticks')
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%m-%d %H:%M'))
+    ax.tick_params(axis='x', labelrotation=45)
+
+    def refresh(ax):
+        x0, x1 = ax.get_xlim()
+        times, prices = series.view(x0 * SECONDS_PER_DAY, x1 * SECONDS_PER_DAY, max(1, int(ax.bbox.width)))
+        line.set_data([to_datenum(t) for t in times], prices)
+
+    times, prices = series.view(series._ts[0], series._ts[-1], max(1, int(ax.bbox.width)))
+    ax.set_xlim(to_datenum(times[0]), to_datenum(times[-1]))
+    margin = (max(prices) - min(prices)) * 0.05 or 1.0
+    ax.set_ylim(min(prices) - margin, max(prices) + margin)
+    ax.callbacks.connect('xlim_changed', refresh)
+    refresh(ax)
+    ax.legend(loc='upper right')
+    fig.tight_layout()
+    plt.show()
+
+
+def benchmark(ticks=10000, interval=5.0):
+    """Render `ticks` simulated 5-second ticks off-screen and report ms/frame."""
+    import random
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    def simulate(chart, ticks):
+        price = 50000.0
+        t0 = time.time()
+        frame_ms = []
+        prev = price
+        for i in range(ticks):
+            t = t0 + i * interval
+            price += random.gauss(0, 15)
+            chart.add_price(t, price, keep=i % 40 in (0, 2))
+            if i % 40 == 0:
+                chart.add_buy_in(t, price)
+            if i % 40 == 14:
+                chart.add_po_trade(t - 60, prev, t, price, 'WIN' if price > prev else 'LOSS')
+            if i % 40 == 2:
+                prev = price
+            chart.set_prediction('UP' if i % 2 else 'DOWN')
+            chart.set_overlay(f"Conf: {i % 100:.1f}%\nWin: {50.0:.1f}%")
+            start = time.perf_counter()
+            chart.render()
+            frame_ms.append((time.perf_counter() - start) * 1000)
+        return frame_ms
+
+    def avg(values):
+        return sum(values) / len(values)
+
+    fig, ax = plt.subplots()
+    chart = LiveChart(ax, label='Binance BTCUSDT', ylabel='BTCUSDT Price (USD)')
+    frame_ms = simulate(chart, ticks)
+    plt.close(fig)
+    print(f"LiveChart: {ticks} ticks, {chart.full_redraws} full redraws")
+    print(f"  first 1000 frames: {avg(frame_ms[:1000]):.2f} ms/frame")
+    print(f"  last 1000 frames:  {avg(frame_ms[-1000:]):.2f} ms/frame")
+
+    # A whole day in view: the line holds about one point per pixel however long the session
+    day = int(SECONDS_PER_DAY / interval)
+    fig, ax = plt.subplots()
+    chart = LiveChart(ax, label='Binance BTCUSDT', ylabel='BTCUSDT Price (USD)', viewport=SECONDS_PER_DAY)
+    frame_ms = simulate(chart, day)
+    points = len(chart.line.get_xdata())
+    plt.close(fig)
+    print(f"LiveChart, 24 h viewport: {day} ticks, {chart.full_redraws} full redraws, "
+          f"{points} points on the line at the end ({int(ax.bbox.width)} px)")
+    print(f"  first 1000 frames: {avg(frame_ms[:1000]):.2f} ms/frame")
+    print(f"  last 1000 frames:  {avg(frame_ms[-1000:]):.2f} ms/frame")
+
+    # The old ax.clear()/replot approach at a few history lengths, for comparison
+    t0 = time.time()
+    fig, ax = plt.subplots()
+    for n in (100, 1000, ticks, day):
+        xs = [to_datenum(t0 + i * interval) for i in range(n)]
+        ys = [50000.0 + random.gauss(0, 15) for _ in range(n)]
+        marks = list(range(0, n, 40))
+        start = time.perf_counter()
+        ax.clear()
+        ax.plot(xs, ys)
+        ax.scatter([xs[i] for i in marks], [ys[i] for i in marks], color='lime', s=80, marker='o')
+        for i in marks:
+            ax.annotate('BUY', xy=(xs[i], ys[i]), xytext=(0, 10), textcoords='offset points')
+        fig.tight_layout()
+        fig.canvas.draw()
+        print(f"Full replot at {n} ticks: {(time.perf_counter() - start) * 1000:.2f} ms/frame")
+    plt.close(fig)
+
+
+if __name__ == "__main__":
+    if '--bench' in sys.argv:
+        benchmark()
+    elif '--history' in sys.argv and len(sys.argv) > sys.argv.index('--history') + 1:
+        args = sys.argv[sys.argv.index('--history') + 1:]
+        plot_history(args[0], float(args[1]) if len(args) > 1 else 24.0)
+    else:
+        print("Usage: python crypto_chart.py --bench | --history SYMBOL [HOURS]")
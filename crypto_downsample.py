@@ -0,0 +1,239 @@
+import bisect
+import math
+import sys
+import time
+
+# Zoom levels are LTTB buckets of LEVEL_BASE * 2 ** k seconds; a view uses
+# the narrowest level with at most one bucket per POINTS_PER_PIXEL pixels
+LEVEL_BASE = 1.0
+POINTS_PER_PIXEL = 1.0
+TRIM_BATCH = 1024  # fewest raw points deleted at once
+
+
+class _Level:
+    """Downsampled points of one zoom level: every finalized bucket's pick, plus where the rest starts."""
+    __slots__ = ('width', 'ts', 'ys', 'start')
+
+    def __init__(self, width):
+        self.width = width
+        self.ts = []
+        self.ys = []
+        self.start = 0  # raw index of the first point not in a finalized bucket
+
+
+class LODSeries:
+    """
+    Level-of-detail cache of a growing time series for display.
+
+    Every zoom level is Largest-Triangle-Three-Buckets over fixed time
+    buckets of `width` seconds: each bucket keeps the one point that forms
+    the largest triangle with the previous bucket's pick and the next
+    bucket's average, which preserves peaks and troughs far better than
+    striding or averaging. A bucket is final once the bucket after it is
+    complete, so append() only works on the last two buckets and a level
+    is built from scratch once, on the first view() that needs it.
+
+    Points marked `keep` (buy-ins, trade entries and exits) are emitted
+    next to their bucket's pick, so markers sit on the line at every zoom
+    level. view() returns
+    about one point per pixel, whatever the length of the series.
+    """
+
+    def __init__(self, retention=None):
+        self.retention = retention
+        self._ts = []
+        self._ys = []
+        self._keep = []
+        self._first = 0  # index of the first point not trimmed yet
+        self._levels = {}
+        self.builds = 0
+
+    def __len__(self):
+        return len(self._ts) - self._first
+
+    def append(self, t, y, keep=False):
+        ts = self._ts
+        if ts and t < ts[-1]:
+            raise ValueError("timestamps must be non-decreasing")
+        ts.append(t)
+        self._ys.append(y)
+        self._keep.append(keep)
+        if len(ts) > 1:
+            prev = ts[-2]
+            for level in self._levels.values():
+                if t // level.width != prev // level.width:
+                    self._advance(level)
+        if self.retention is not None:
+            self.trim_before(t - self.retention)
+
+    def extend(self, items):
+        for t, y in items:
+            self.append(t, y)
+
+    def mark(self, t):
+        """Keep the point at time `t`. Levels that already finalized its bucket are rebuilt on next use."""
+        i = bisect.bisect_left(self._ts, t, self._first)
+        if i == len(self._ts) or self._ts[i] != t or self._keep[i]:
+            return
+        self._keep[i] = True
+        for width in [w for w, level in self._levels.items() if i < level.start]:
+            del self._levels[width]
+
+    def trim_before(self, t):
+        """
+        Drop points older than `t`. They are skipped at once and deleted
+        once there are as many of them as points kept (and TRIM_BATCH), so
+        the O(N) shift of deleting a list prefix is paid for by the points
+        it drops: amortized O(1) per point.
+        """
+        n = self._first = bisect.bisect_left(self._ts, t, self._first)
+        if n < max(TRIM_BATCH, len(self._ts) - n):
+            return
+        del self._ts[:n], self._ys[:n], self._keep[:n]
+        self._first = 0
+        for width in list(self._levels):
+            level = self._levels[width]
+            if level.start < n:
+                del self._levels[width]
+                continue
+            level.start -= n
+            k = bisect.bisect_left(level.ts, t)
+            del level.ts[:k], level.ys[:k]
+
+    # --- LTTB ---
+
+    def _bucket_end(self, start, width):
+        ts = self._ts
+        b = ts[start] // width
+        end = start + 1
+        while end < len(ts) and ts[end] // width == b:
+            end += 1
+        return end
+
+    def _pick(self, start, end, level, next_start, next_end):
+        """Emit bucket [start, end) into `level`: its LTTB point plus any kept points, in time order."""
+        ts, ys, keep = self._ts, self._ys, self._keep
+        if not level.ts:
+            best = start  # the series starts with its first point
+        else:
+            ax, ay = level.ts[-1], level.ys[-1]
+            count = next_end - next_start
+            cx = sum(ts[next_start:next_end]) / count
+            cy = sum(ys[next_start:next_end]) / count
+            best, best_area = start, -1.0
+            for i in range(start, end):
+                # Twice the triangle's area; the constant factor does not matter
+                area = abs((ax - cx) * (ys[i] - ay) - (ax - ts[i]) * (cy - ay))
+                if area > best_area:
+                    best, best_area = i, area
+        for i in range(start, end):
+            if i == best or keep[i]:
+                level.ts.append(ts[i])
+                level.ys.append(ys[i])
+
+    def _advance(self, level):
+        # Finalize every bucket whose following bucket is complete
+        n = len(self._ts)
+        while True:
+            start = level.start
+            end = self._bucket_end(start, level.width)
+            if end >= n:
+                return
+            next_end = self._bucket_end(end, level.width)
+            if next_end >= n:
+                return
+            self._pick(start, end, level, end, next_end)
+            level.start = end
+
+    def _level(self, width):
+        level = self._levels.get(width)
+        if level is None:
+            level = self._levels[width] = _Level(width)
+            level.start = self._first
+            if len(self):
+                self._advance(level)
+            self.builds += 1
+        return level
+
+    # --- Views ---
+
+    def view(self, t0, t1, pixels):
+        """Points to draw for the time range [t0, t1] on `pixels` pixels, as (times, values) lists."""
+        ts, ys, first = self._ts, self._ys, self._first
+        if first == len(ts):
+            return [], []
+        lo = max(first, bisect.bisect_left(ts, t0, first) - 1)
+        hi = min(len(ts), bisect.bisect_right(ts, t1) + 1)
+        if hi - lo <= pixels * POINTS_PER_PIXEL:
+            return ts[lo:hi], ys[lo:hi]
+        width = (t1 - t0) / (pixels * POINTS_PER_PIXEL)
+        level = self._level(LEVEL_BASE * 2 ** max(0, math.ceil(math.log2(width / LEVEL_BASE))))
+        a = max(bisect.bisect_left(level.ts, ts[first]), bisect.bisect_left(level.ts, t0) - 1)
+        b = min(len(level.ts), bisect.bisect_right(level.ts, t1) + 1)
+        out_t, out_y = level.ts[a:b], level.ys[a:b]
+        # Buckets not final yet: pick against what has arrived so far, and end on the latest point
+        start, n = max(level.start, first), len(ts)
+        if start < n and t1 >= ts[start]:
+            tail = _Level(level.width)
+            tail.ts, tail.ys = level.ts[-1:], level.ys[-1:]
+            seed = len(tail.ts)
+            while True:
+                end = self._bucket_end(start, level.width)
+                if end >= n:
+                    break
+                self._pick(start, end, tail, end, self._bucket_end(end, level.width))
+                start = end
+            for i in range(start, n):
+                if self._keep[i] or i == n - 1:
+                    tail.ts.append(ts[i])
+                    tail.ys.append(ys[i])
+            out_t += tail.ts[seed:]
+            out_y += tail.ys[seed:]
+        return out_t, out_y
+
+    def levels(self):
+        """Cached zoom levels as {bucket seconds: finalized points}."""
+        return {width: len(level.ts) for width, level in sorted(self._levels.items())}
+
+
+def benchmark(hours=24, interval=5.0, pixels=800):
+    """Points drawn and cost per tick for a day of 5-second ticks, raw and through LODSeries."""
+    import random
+    rng = random.Random(1)
+    n = int(hours * 3600 / interval)
+    t0 = time.time() - hours * 3600
+    series = LODSeries()
+    price = 50000.0
+    start = time.perf_counter()
+    for i in range(n):
+        price += rng.gauss(0, 15)
+        series.append(t0 + i * interval, price, keep=i % 40 == 0)
+    append_us = (time.perf_counter() - start) / n * 1e6
+
+    t1 = t0 + (n - 1) * interval
+    start = time.perf_counter()
+    xs, ys = series.view(t0, t1, pixels)
+    first_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for i in range(100):
+        price += rng.gauss(0, 15)
+        t1 += interval
+        series.append(t1, price)
+        xs, ys = series.view(t0, t1, pixels)
+    tick_ms = (time.perf_counter() - start) / 100 * 1000
+    kept = sum(series._keep)
+    shown = set(xs)
+    missing = sum(1 for t, k in zip(series._ts, series._keep) if k and t not in shown)
+    print(f"{len(series)} ticks ({hours} h at {interval:.0f} s), {pixels} px wide")
+    print(f"append: {append_us:.2f} us/tick")
+    print(f"full-range view: {len(xs)} points drawn instead of {len(series)} "
+          f"({first_ms:.1f} ms to build the level, {tick_ms:.2f} ms/tick after)")
+    print(f"kept markers on the line: {kept - missing} of {kept}")
+    print(f"cached levels (bucket s: points): {series.levels()}")
+
+
+if __name__ == "__main__":
+    if '--bench' in sys.argv:
+        benchmark()
+    else:
+        print("Usage: python crypto_downsample.py --bench")
@@ -0,0 +1,475 @@
+import datetime
+import logging
+from collections import deque
+
+from crypto_history import PriceHistory, DEFAULT_RETENTION
+from crypto_indicators import make_signal
+from crypto_signals import (
+    MA_WINDOW, PO_PROFIT_PCT, PO_TRADE_DURATION, TREND_LOOKBACK, WIN_LIKELIHOOD_WINDOW,
+    is_reversal, prediction_confidence, prediction_hit, trend_direction,
+)
+from crypto_tickstore import TICK_DIR, TickStore, tick_path
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+SIGNAL_MIN_INTERVAL = 60  # seconds between published signals per symbol; changes in between are coalesced
+BACKFILL_SECONDS = 15 * 60  # history loaded from klines at startup; 1s candles cover up to 1000 s per request
+
+
+class Tick:
+    """One price observation: epoch seconds, Binance price and optional CoinGecko price."""
+    __slots__ = ('t', 'binance', 'coingecko')
+
+    def __init__(self, t, binance, coingecko=None):
+        self.t = t
+        self.binance = binance
+        self.coingecko = coingecko
+
+    def __repr__(self):
+        return f"Tick(t={self.t}, binance={self.binance}, coingecko={self.coingecko})"
+
+
+class TickResult:
+    """What one Predictor.step produced. Times are epoch seconds."""
+    __slots__ = ('symbol', 't', 'price', 'coingecko', 'prediction', 'confidence', 'trend', 'bought_in',
+                 'notice', 'closed_trade', 'win_likelihood', 'buy_in_price', 'current_value', 'profit')
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @property
+    def stamp(self):
+        return datetime.datetime.fromtimestamp(self.t).strftime(TIME_FORMAT)
+
+
+EMBED_COLORS = {'UP': 0x2ECC71, 'DOWN': 0xE74C3C}
+EMBED_COLOR_FLAT = 0x95A5A6
+
+
+class SignalSnapshot:
+    """
+    Immutable, pre-rendered view of a predictor's latest tick: the one-line
+    `text` and an `embed` dict for discord.Embed.from_dict. Predictor.step
+    builds a new one per tick and swaps it in with a single assignment, so
+    readers on other threads always see one whole tick and never recompute
+    anything. Treat `embed` as read-only; it is shared by every reader.
+    """
+    __slots__ = ('symbol', 't', 'prediction', 'price', 'confidence', 'win_likelihood', 'trend', 'buy_in_price',
+                 'text', 'embed')
+
+    def __init__(self, symbol, t, prediction, price, confidence, win_likelihood=None, trend=None,
+                 buy_in_price=None):
+        text = f"{symbol}: {prediction} | Price: {price:.2f} | Confidence: {confidence:.1f}%"
+        fields = [
+            {'name': 'Price', 'value': f"{price:.2f}", 'inline': True},
+            {'name': 'Confidence', 'value': f"{confidence:.1f}%", 'inline': True},
+        ]
+        if win_likelihood is not None:
+            fields.append({'name': 'Win likelihood', 'value': f"{win_likelihood:.1f}%", 'inline': True})
+        if trend:
+            fields.append({'name': '2-3 min trend', 'value': trend, 'inline': True})
+        if buy_in_price:
+            fields.append({'name': 'Buy-in price', 'value': f"{buy_in_price:.2f}", 'inline': True})
+        embed = {
+            'title': f"{symbol}: {prediction}",
+            'color': EMBED_COLORS.get(prediction, EMBED_COLOR_FLAT),
+            'timestamp': datetime.datetime.fromtimestamp(t, datetime.timezone.utc).isoformat(),
+            'fields': tuple(fields),
+        }
+        for name, value in (('symbol', symbol), ('t', t), ('prediction', prediction), ('price', price),
+                            ('confidence', confidence), ('win_likelihood', win_likelihood), ('trend', trend),
+                            ('buy_in_price', buy_in_price), ('text', text), ('embed', embed)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SignalSnapshot is immutable")
+
+    @classmethod
+    def from_result(cls, result):
+        return cls(result.symbol, result.t, result.prediction, result.price, result.confidence,
+                   result.win_likelihood, result.trend, result.buy_in_price)
+
+    def __repr__(self):
+        return f"SignalSnapshot({self.text})"
+
+
+class Predictor:
+    """
+    Prediction engine for one symbol with all of its state on the instance.
+
+    step(tick) applies the UP/DOWN/FLAT prediction, perfect-execution buy-in,
+    2-3 min trend, win likelihood and Pocket Options simulation and returns a
+    TickResult. It does no I/O, so any number of predictors can run in one
+    process; display, logging and persistence are left to sinks. `signal`
+    names the crypto_indicators signal that decides UP/DOWN/FLAT; the
+    default 'delta' is the one-tick price move.
+    """
+
+    def __init__(self, symbol, investment=100.0, window=MA_WINDOW, pocket_options=True,
+                 po_trade_duration=PO_TRADE_DURATION, po_profit_pct=PO_PROFIT_PCT,
+                 retention=DEFAULT_RETENTION, win_window=WIN_LIKELIHOOD_WINDOW, signal='delta'):
+        self.symbol = symbol
+        self.signal = signal
+        self._direction = make_signal(signal, window)
+        self.investment = investment
+        self.window = window
+        self.pocket_options = pocket_options
+        self.po_trade_duration = po_trade_duration
+        self.po_profit_pct = po_profit_pct
+        self.history = PriceHistory(retention=retention)
+        self.predictions = deque(maxlen=win_window + 1)
+        self.prediction_results = deque(maxlen=win_window)
+        self._hits = 0  # sum of prediction_results, kept as results enter and leave the window
+        self.buy_in_points = []  # List of (time, price)
+        self.buy_in_price = None
+        self.buy_in_announced = False
+        self.notice_given = False
+        self.po_trades = []  # List of (buy_time, buy_price, sell_time, sell_price, result)
+        self.po_trade_open = None  # (buy_time, buy_price)
+        # Running Pocket Options totals, updated once per closed trade
+        self.po_wins = 0
+        self.po_losses = 0
+        self.po_balance = 0
+        self.last = None  # TickResult of the latest step
+        self.snapshot = None  # SignalSnapshot of the latest step, replaced whole on every tick
+
+    def step(self, tick, snapshot=True):
+        t, price = tick.t, tick.binance
+        prices = self.history
+        predictions = self.predictions
+        prices.append(t, price)
+
+        prediction = self._direction(price)
+        predictions.append(prediction)
+        confidence = prediction_confidence(prediction, prices[-3], prices[-2], price) if len(prices) > 2 else 0.0
+
+        # --- Perfect Execution Buy-in Logic ---
+        reversal = len(predictions) > 1 and is_reversal(predictions[-2], prediction)
+        bought_in = False
+        if len(predictions) > 1:
+            if reversal:
+                if not self.buy_in_announced:
+                    self.buy_in_points.append((t, price))
+                    self.buy_in_announced = True
+                    self.buy_in_price = price
+                    bought_in = True
+            elif prediction != 'UP':
+                self.buy_in_announced = False
+
+        # 2-3 min future trend: compare the MA 2 min ago with the MA 3 min ago
+        back_3, back_2 = TREND_LOOKBACK
+        ma_3min_ago = prices.moving_average_at(t - back_3, self.window)
+        ma_2min_ago = prices.moving_average_at(t - back_2, self.window)
+        trend = None
+        notice = False
+        if ma_3min_ago and ma_2min_ago:
+            trend = trend_direction(ma_2min_ago, ma_3min_ago)
+            if trend == 'UP':
+                if not self.notice_given:
+                    notice = True
+                    self.notice_given = True
+            else:
+                self.notice_given = False
+
+        # Win likelihood: track if previous prediction was correct
+        if len(predictions) > 1:
+            results = self.prediction_results
+            hit = 1 if prediction_hit(predictions[-2], prices[-2], price) else 0
+            if len(results) == results.maxlen:
+                self._hits -= results[0]
+            results.append(hit)
+            self._hits += hit
+
+        # --- Pocket Options Simulation ---
+        closed_trade = None
+        if self.pocket_options:
+            if reversal and self.po_trade_open is None:
+                self.po_trade_open = (t, price)
+            if self.po_trade_open:
+                buy_time, buy_price = self.po_trade_open
+                if t - buy_time >= self.po_trade_duration:
+                    result = 'WIN' if price > buy_price else 'LOSS'
+                    closed_trade = (buy_time, buy_price, t, price, result)
+                    self.po_trades.append(closed_trade)
+                    self.po_trade_open = None
+                    if result == 'WIN':
+                        self.po_wins += 1
+                        self.po_balance += self.investment * self.po_profit_pct
+                    else:
+                        self.po_losses += 1
+                        self.po_balance -= self.investment
+
+        current_value = self.investment / self.buy_in_price * price if self.buy_in_price else None
+        self.last = TickResult(
+            symbol=self.symbol, t=t, price=price, coingecko=tick.coingecko, prediction=prediction,
+            confidence=confidence, trend=trend, bought_in=bought_in, notice=notice, closed_trade=closed_trade,
+            win_likelihood=self.win_likelihood, buy_in_price=self.buy_in_price, current_value=current_value,
+            profit=current_value - self.investment if current_value is not None else None,
+        )
+        if snapshot:
+            self.snapshot = SignalSnapshot.from_result(self.last)
+        return self.last
+
+    def warm(self, ticks):
+        """Replay stored ticks to rebuild state after a restart. Ticks older than the previous one are dropped."""
+        last_t = self.history.time_at(-1) if len(self.history) else None
+        dropped = 0
+        for tick in ticks:
+            if last_t is not None and tick.t < last_t:
+                dropped += 1
+                continue
+            last_t = tick.t
+            self.step(tick, snapshot=False)
+        if dropped:
+            logging.warning(f"Warm start: {self.symbol} dropped {dropped} out-of-order stored ticks")
+        if self.last is not None:
+            self.snapshot = SignalSnapshot.from_result(self.last)
+        self.last = None
+
+    @property
+    def win_likelihood(self):
+        if not self.prediction_results:
+            return 0.0
+        return self._hits / len(self.prediction_results) * 100
+
+    def signal_text(self):
+        """The latest prediction and price as one line, e.g. for the Discord bot."""
+        snapshot = self.snapshot
+        return snapshot.text if snapshot else "No signal yet."
+
+    def status_line(self):
+        line = (f"{self.symbol:<9} {self.history[-1]:>14.4f} {self.predictions[-1]:<4} "
+                f"Win: {self.win_likelihood:5.1f}% Trend: {(self.last and self.last.trend) or '-':<4}")
+        if self.pocket_options:
+            line += f" PO W:{self.po_wins} L:{self.po_losses}"
+        return line
+
+    def overlay_text(self):
+        """Confidence, win likelihood, profit/loss and PO stats for the chart overlay."""
+        last = self.last
+        text = f'Conf: {last.confidence:.1f}%\nWin: {last.win_likelihood:.1f}%'
+        if last.buy_in_price:
+            text += f"\nProfit: ${last.profit:+.2f}"
+        if self.pocket_options:
+            text += (f"\nPO Trades: {len(self.po_trades)} W:{self.po_wins} L:{self.po_losses}"
+                     f"\nPO Balance: ${self.po_balance:.2f}")
+        return text
+
+
+# --- Message formatting shared by the sinks ---
+
+def price_line(result, tagged=False):
+    coingecko = f"{result.coingecko:.2f}" if result.coingecko is not None else "n/a"
+    tag = f"{result.symbol} | " if tagged else ""
+    return f"{result.stamp} | {tag}Binance: {result.price:.2f} | CoinGecko: {coingecko}"
+
+
+def buy_in_message(result, tagged=False):
+    tag = f"{result.symbol} " if tagged else ""
+    return f"*** PERFECT EXECUTION: {tag}BUY-IN SIGNAL at {result.stamp} | Price: {result.price:.2f} ***"
+
+
+def profit_message(predictor, result):
+    return (f"If you invested ${predictor.investment:.2f} at buy-in price {result.buy_in_price:.2f}, "
+            f"your current value is ${result.current_value:.2f} (Profit: ${result.profit:+.2f})")
+
+
+# --- Sinks: anything with on_start(predictor) and on_tick(predictor, result) ---
+
+class Sink:
+    def on_start(self, predictor):
+        pass
+
+    def on_tick(self, predictor, result):
+        pass
+
+
+class ConsoleSink(Sink):
+    """Prints each tick. compact=True prints one status line per tick for multi-symbol mode."""
+
+    def __init__(self, compact=False):
+        self.compact = compact
+
+    def on_tick(self, predictor, result):
+        if self.compact:
+            if result.bought_in:
+                print(buy_in_message(result, tagged=True))
+            if result.notice:
+                print(f"NOTICE: {result.symbol} prepare to BUY in 4 minutes! ({result.stamp})")
+            print(predictor.status_line())
+            return
+        print(price_line(result))
+        if result.bought_in:
+            print(f"\n{buy_in_message(result)}\n")
+        if result.buy_in_price:
+            print(profit_message(predictor, result))
+        if result.trend:
+            print(f"2-3 min future trend: {result.trend}")
+            # Give 4 min advance notice if not already given
+            if result.notice:
+                print(f"NOTICE: Prepare to BUY in 4 minutes! ({result.stamp})")
+
+
+class LogSink(Sink):
+    """Writes price lines, buy-ins and profit to the log. tagged=True adds the symbol to each line."""
+
+    def __init__(self, tagged=False, logger=None):
+        self.tagged = tagged
+        self.logger = logger or logging.getLogger()
+
+    def on_tick(self, predictor, result):
+        self.logger.info(price_line(result, self.tagged))
+        if result.bought_in:
+            self.logger.info(buy_in_message(result, self.tagged))
+        if result.buy_in_price and not self.tagged:
+            self.logger.info(profit_message(predictor, result))
+
+
+class TickStoreSink(Sink):
+    """Appends every tick to the symbol's binary tick file and warms the predictor from it on start."""
+
+    def __init__(self, directory=TICK_DIR, warm_seconds=DEFAULT_RETENTION):
+        self.directory = directory
+        self.warm_seconds = warm_seconds
+        self.store = None
+
+    def on_start(self, predictor):
+        self.store = TickStore(tick_path(predictor.symbol, self.directory))
+        if self.warm_seconds:
+            ticks = self.store.read_since(datetime.datetime.now().timestamp() - self.warm_seconds)
+            predictor.warm(Tick(t, binance, coingecko) for t, binance, coingecko in ticks)
+            if ticks:
+                print(f"Warm start: {predictor.symbol} loaded {len(ticks)} stored ticks")
+                logging.info(f"Warm start: {predictor.symbol} loaded {len(ticks)} stored ticks")
+
+    def on_tick(self, predictor, result):
+        self.store.append(result.t, result.price, result.coingecko)
+
+
+class SignalStoreSink(Sink):
+    """Records buy-ins and closed Pocket Options trades in a crypto_signalstore.SignalStore."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def on_tick(self, predictor, result):
+        if result.bought_in:
+            self.store.add_buy_in(predictor.symbol, result.t, result.price)
+        if result.closed_trade:
+            buy_t, buy_price, sell_t, sell_price, outcome = result.closed_trade
+            profit = predictor.investment * predictor.po_profit_pct if outcome == 'WIN' else -predictor.investment
+            self.store.add_trade(predictor.symbol, buy_t, buy_price, sell_t, sell_price, outcome, profit)
+
+
+class BackfillSink(Sink):
+    """
+    Startup stage that loads recent Binance candles with one klines request
+    and replays their closes, `step` seconds apart, into the predictor, so
+    the trend, moving average and win likelihood are valid from the first
+    live tick. Only the gap after the predictor's newest tick (e.g. from a
+    TickStoreSink warm start) is loaded, at most `seconds` back. Place it
+    after the TickStoreSink, whose file then also receives the backfilled
+    ticks when passed as `store_sink`, and before the chart.
+    """
+
+    def __init__(self, fetcher, binance_symbol=None, step=5.0, seconds=BACKFILL_SECONDS, store_sink=None):
+        self.fetcher = fetcher
+        self.binance_symbol = binance_symbol
+        self.step = step
+        self.seconds = seconds
+        self.store_sink = store_sink
+        self.loaded = 0
+
+    def on_start(self, predictor):
+        now = datetime.datetime.now().timestamp()
+        since = now - self.seconds
+        if len(predictor.history):
+            since = max(since, predictor.history.time_at(-1))
+        if now - since < 2 * self.step:
+            return
+        symbol = self.binance_symbol or predictor.symbol
+        try:
+            candles = self.fetcher.binance_klines(symbol, start=since)
+        except Exception as e:
+            print(f"Backfill: {symbol} klines unavailable: {e}")
+            logging.warning(f"Backfill: {symbol} klines unavailable: {e}")
+            return
+        ticks = []
+        next_t = since + self.step
+        for t, close in candles:
+            if t > now:  # the candle still open
+                break
+            if t >= next_t:
+                ticks.append(Tick(t, close))
+                next_t = t + self.step
+        predictor.warm(ticks)
+        if self.store_sink is not None and self.store_sink.store is not None:
+            self.store_sink.store.extend((tick.t, tick.binance, float('nan')) for tick in ticks)
+        self.loaded = len(ticks)
+        if ticks:
+            print(f"Backfill: {predictor.symbol} loaded {len(ticks)} ticks from {len(candles)} klines")
+            logging.info(f"Backfill: {predictor.symbol} loaded {len(ticks)} ticks from {len(candles)} klines")
+
+
+class SignalEvent:
+    """A signal worth announcing: why (`reasons`), and the predictor's state when it was published."""
+    __slots__ = ('symbol', 't', 'reasons', 'prediction', 'price', 'confidence', 'buy_in_price', 'text')
+
+    def __init__(self, symbol, t, reasons, prediction, price, confidence, buy_in_price, text):
+        self.symbol = symbol
+        self.t = t
+        self.reasons = reasons
+        self.prediction = prediction
+        self.price = price
+        self.confidence = confidence
+        self.buy_in_price = buy_in_price
+        self.text = text
+
+    def __repr__(self):
+        return f"SignalEvent({self.symbol}, {', '.join(self.reasons)}: {self.text})"
+
+
+class SignalSink(Sink):
+    """
+    Publishes a SignalEvent through `publish(event)` when a tick brings a
+    buy-in or a change of direction (UP <-> DOWN; FLAT ticks are ignored),
+    instead of polling for the latest signal. A direction that only returns
+    to the last published one is not repeated. At most one event goes out
+    per `min_interval` seconds of tick time; anything that happens in
+    between is merged into one event carrying all of its reasons and the
+    latest state, published on the first tick after the interval.
+    """
+
+    def __init__(self, publish, min_interval=SIGNAL_MIN_INTERVAL):
+        self.publish = publish
+        self.min_interval = min_interval
+        self.direction = None  # latest UP/DOWN seen
+        self.published_direction = None
+        self.last_published = None  # tick time of the last event
+        self.pending = []  # reasons waiting for the interval to pass
+        self.published = 0
+        self.suppressed = 0
+
+    def on_tick(self, predictor, result):
+        if result.bought_in and 'buy-in' not in self.pending:
+            self.pending.append('buy-in')
+        if result.prediction in ('UP', 'DOWN') and result.prediction != self.direction:
+            self.direction = result.prediction
+            if 'direction' not in self.pending:
+                self.pending.append('direction')
+        if not self.pending:
+            return
+        if self.pending == ['direction'] and self.direction == self.published_direction:
+            # Flipped away and back before anything went out
+            self.pending = []
+            self.suppressed += 1
+            return
+        if self.last_published is not None and result.t - self.last_published < self.min_interval:
+            return
+        event = SignalEvent(predictor.symbol, result.t, tuple(self.pending), self.direction, result.price,
+                            result.confidence, result.buy_in_price, predictor.signal_text())
+        self.pending = []
+        self.published_direction = self.direction
+        self.last_published = result.t
+        self.published += 1
+        self.publish(event)
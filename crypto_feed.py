@@ -0,0 +1,480 @@
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from crypto_cache import TTLCache
+from crypto_scheduler import SourceBackoff
+
+BINANCE_URL = "https://api.binance.com"
+COINGECKO_URL = "https://api.coingecko.com"
+
+# (connect, read) timeouts in seconds per source
+DEFAULT_TIMEOUTS = {
+    'binance': (3.05, 4.0),
+    'coingecko': (3.05, 6.0),
+}
+
+# Seconds a response stays fresh per source, and how much longer it may be
+# served stale while a background refresh runs. Binance tickers move every
+# tick so they are not cached; CoinGecko's simple/price refreshes about
+# once a minute.
+DEFAULT_CACHE_TTLS = {
+    'binance': 0,
+    'coingecko': 60,
+}
+DEFAULT_CACHE_STALE = {
+    'coingecko': 240,
+}
+
+# Candles fetched for the startup backfill: the finest Binance interval, and
+# the most one klines request returns
+KLINE_INTERVAL = '1s'
+KLINE_LIMIT = 1000
+
+
+class RateLimited(Exception):
+    """The source rejected a request with 418/429; its backoff is already applied."""
+
+
+class BackingOff(Exception):
+    """The source is in backoff and was not called."""
+
+
+class Quote:
+    """Prices from one fetch round. A source that failed is None and has an entry in `errors`."""
+    __slots__ = ('binance', 'coingecko', 'errors', 'elapsed')
+
+    def __init__(self, binance=None, coingecko=None, errors=None, elapsed=0.0):
+        self.binance = binance
+        self.coingecko = coingecko
+        self.errors = errors or {}
+        self.elapsed = elapsed
+
+    @property
+    def complete(self):
+        return not self.errors
+
+    def __repr__(self):
+        return f"Quote(binance={self.binance}, coingecko={self.coingecko}, errors={self.errors})"
+
+
+class PriceFetcher:
+    """
+    Fetches Binance and CoinGecko prices concurrently over pooled keep-alive
+    connections. Every source has its own timeout and a slow or failing source
+    only costs its own price, never the other one. Failing or rate-limited
+    sources back off exponentially (see crypto_scheduler.SourceBackoff) and
+    are not called again until their backoff expires. Responses go through
+    a crypto_cache.TTLCache, so a source is only called when its cached
+    response has expired; a cached response is still served during backoff.
+    """
+
+    def __init__(self, binance_url=BINANCE_URL, coingecko_url=COINGECKO_URL, timeouts=None, pool_size=4,
+                 backoff=None, cache=None):
+        self.binance_url = binance_url.rstrip('/')
+        self.coingecko_url = coingecko_url.rstrip('/')
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # A stalled request keeps its worker until the read timeout fires,
+        # so leave room for the next tick's requests.
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='price-fetch')
+        self._unfiltered_batches = set()
+        self.backoff = backoff or SourceBackoff()
+        self.cache = cache or TTLCache(DEFAULT_CACHE_TTLS, DEFAULT_CACHE_STALE)
+
+    def _get_json(self, source, url, params):
+        key = (source, url, tuple(sorted(params.items())) if params else ())
+        return self.cache.get(source, key, lambda: self._request_json(source, url, params))
+
+    def _request_json(self, source, url, params):
+        if not self.backoff.ready(source):
+            raise BackingOff(f"backing off, retry in {self.backoff.remaining(source):.0f}s")
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeouts[source])
+        except requests.RequestException:
+            self.backoff.failure(source)
+            raise
+        if self.backoff.observe(source, response.status_code, response.headers):
+            raise RateLimited(f"rate limited (HTTP {response.status_code}), "
+                              f"backing off {self.backoff.remaining(source):.0f}s")
+        if response.status_code >= 500:
+            self.backoff.failure(source)
+            raise Exception(f"{source} server error (HTTP {response.status_code})")
+        # 4xx bodies carry the API's error message for the caller to report
+        self.backoff.success(source)
+        return response.json()
+
+    def binance_price(self, symbol):
+        data = self._get_json('binance', f"{self.binance_url}/api/v3/ticker/price", {'symbol': symbol})
+        if 'price' not in data:
+            print(f"Binance API response error: {data}")
+            raise Exception("'price' not found in Binance API response")
+        return float(data['price'])
+
+    def coingecko_price(self, coin_id, vs_currency):
+        data = self._get_json('coingecko', f"{self.coingecko_url}/api/v3/simple/price",
+                              {'ids': coin_id, 'vs_currencies': vs_currency})
+        if coin_id not in data or vs_currency not in data[coin_id]:
+            print(f"CoinGecko API response error: {data}")
+            raise Exception(f"'{vs_currency}' not found in CoinGecko API response for {coin_id}")
+        return float(data[coin_id][vs_currency])
+
+    def binance_prices(self, symbols):
+        """Prices for several Binance symbols from a single ticker request."""
+        url = f"{self.binance_url}/api/v3/ticker/price"
+        key = frozenset(symbols)
+        data = None
+        if key not in self._unfiltered_batches:
+            data = self._get_json('binance', url, {'symbols': json.dumps(sorted(key), separators=(',', ':'))})
+            if isinstance(data, dict):
+                # One unlisted symbol rejects the whole batch. The unfiltered
+                # ticker is still a single request, so use it from now on.
+                print(f"Binance batch ticker error: {data}")
+                self._unfiltered_batches.add(key)
+                data = None
+        if data is None:
+            data = self._get_json('binance', url, None)
+        if not isinstance(data, list):
+            raise Exception(f"Unexpected Binance ticker response: {data}")
+        return {d['symbol']: float(d['price']) for d in data if d.get('symbol') in key}
+
+    def binance_klines(self, symbol, start=None, interval=KLINE_INTERVAL, limit=KLINE_LIMIT):
+        """
+        Candles from one klines request as (close time, close price) pairs,
+        oldest first; close times are epoch seconds at the end of each candle.
+        Starts at `start` (epoch seconds) if given, else returns the latest
+        `limit` candles. The newest candle may still be open.
+        """
+        params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+        if start is not None:
+            params['startTime'] = int(start * 1000)
+        data = self._get_json('binance', f"{self.binance_url}/api/v3/klines", params)
+        if not isinstance(data, list):
+            print(f"Binance klines response error: {data}")
+            raise Exception(f"Unexpected Binance klines response for {symbol}")
+        # [open time, open, high, low, close, volume, close time, ...]; close time is the last ms of the candle
+        return [((row[6] + 1) / 1000, float(row[4])) for row in data]
+
+    def coingecko_prices(self, pairs):
+        """Prices for several (coin_id, vs_currency) pairs from a single simple/price request."""
+        ids = sorted({coin_id for coin_id, _ in pairs})
+        currencies = sorted({vs for _, vs in pairs})
+        data = self._get_json('coingecko', f"{self.coingecko_url}/api/v3/simple/price",
+                              {'ids': ','.join(ids), 'vs_currencies': ','.join(currencies)})
+        return {(coin_id, vs): float(data[coin_id][vs])
+                for coin_id, vs in pairs if coin_id in data and vs in data[coin_id]}
+
+    def _deadline(self, source):
+        connect, read = self.timeouts[source]
+        return connect + read
+
+    def fetch(self, binance_symbol, coingecko_id, coingecko_vs):
+        """Fetch both prices at once and return a Quote with whatever arrived in time."""
+        start = time.monotonic()
+        futures = {
+            'binance': self._executor.submit(self.binance_price, binance_symbol),
+            'coingecko': self._executor.submit(self.coingecko_price, coingecko_id, coingecko_vs),
+        }
+        return self._collect(futures, start)
+
+    async def fetch_async(self, binance_symbol, coingecko_id, coingecko_vs):
+        """fetch() for code running on an asyncio event loop: the loop is never blocked on a request."""
+        start = time.monotonic()
+        quote = Quote()
+        futures = {
+            'binance': asyncio.wrap_future(self._executor.submit(self.binance_price, binance_symbol)),
+            'coingecko': asyncio.wrap_future(self._executor.submit(self.coingecko_price, coingecko_id,
+                                                                   coingecko_vs)),
+        }
+        for source in sorted(futures, key=self._deadline):
+            remaining = self._deadline(source) - (time.monotonic() - start)
+            try:
+                value = await asyncio.wait_for(asyncio.shield(futures[source]), max(0.0, remaining))
+            except asyncio.TimeoutError:
+                futures[source].cancel()
+                quote.errors[source] = f"timed out after {self._deadline(source):.1f}s"
+                continue
+            except Exception as e:
+                quote.errors[source] = str(e)
+                continue
+            setattr(quote, source, value)
+        quote.elapsed = time.monotonic() - start
+        return quote
+
+    def fetch_many(self, symbols):
+        """
+        Fetch every symbol with one Binance and one CoinGecko request, concurrently.
+        `symbols` maps names to entries shaped like crypto_predictor.SYMBOLS;
+        returns {name: Quote}. Request count does not depend on len(symbols).
+        """
+        start = time.monotonic()
+        futures = {
+            'binance': self._executor.submit(self.binance_prices, [s['binance'] for s in symbols.values()]),
+            'coingecko': self._executor.submit(self.coingecko_prices,
+                                               [tuple(s['coingecko']) for s in symbols.values()]),
+        }
+        batch = self._collect(futures, start)
+        quotes = {}
+        for name, spec in symbols.items():
+            quote = Quote(elapsed=batch.elapsed)
+            for source, key in (('binance', spec['binance']), ('coingecko', tuple(spec['coingecko']))):
+                prices = getattr(batch, source)
+                if source in batch.errors:
+                    quote.errors[source] = batch.errors[source]
+                elif key in prices:
+                    setattr(quote, source, prices[key])
+                else:
+                    quote.errors[source] = f"no {source} price for {key}"
+            quotes[name] = quote
+        return quotes
+
+    def _collect(self, futures, start):
+        quote = Quote()
+        # Wait on the fastest source first, then give the others the rest of their own budget
+        for source in sorted(futures, key=self._deadline):
+            future = futures[source]
+            remaining = self._deadline(source) - (time.monotonic() - start)
+            done, _ = wait([future], timeout=max(0.0, remaining))
+            if not done:
+                # The worker's own request timeout reports the failure to the backoff
+                future.cancel()
+                quote.errors[source] = f"timed out after {self._deadline(source):.1f}s"
+                continue
+            try:
+                setattr(quote, source, future.result())
+            except Exception as e:
+                quote.errors[source] = str(e)
+        quote.elapsed = time.monotonic() - start
+        return quote
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.cache.close()
+        self.session.close()
+
+
+# --- Local stub server for testing and benchmarks ---
+
+class StubPriceServer:
+    """
+    Minimal local stand-in for the Binance and CoinGecko price endpoints.
+    `latency` maps a source name to seconds of delay injected per request and
+    `prices` maps Binance symbols to prices. `klines` maps Binance symbols to
+    kline rows in Binance's JSON layout (recorded or from synthetic_klines),
+    served by /api/v3/klines. Use as a context manager; `url` is the base URL
+    to pass as both binance_url and coingecko_url.
+    """
+
+    def __init__(self, prices=None, coingecko_ids=None, latency=None, klines=None):
+        self.prices = prices or {'BTCUSDT': 50000.0}
+        self.coingecko_ids = coingecko_ids or {'bitcoin': 'BTCUSDT'}
+        self.latency = latency or {}
+        self.klines = klines or {}
+        self.requests = {'binance': 0, 'coingecko': 0}
+        self.connections = 0
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle(self, path, query):
+        """Return (status, headers, body) for a request. Override to add endpoints."""
+        if path == '/api/v3/ticker/price':
+            self._count('binance')
+            if 'symbol' in query:
+                symbol = query['symbol'][0]
+                if symbol not in self.prices:
+                    return 400, {}, {'code': -1121, 'msg': 'Invalid symbol.'}
+                return 200, {}, {'symbol': symbol, 'price': f"{self.prices[symbol]:.8f}"}
+            symbols = json.loads(query['symbols'][0]) if 'symbols' in query else list(self.prices)
+            if any(sym not in self.prices for sym in symbols):
+                return 400, {}, {'code': -1121, 'msg': 'Invalid symbol.'}
+            return 200, {}, [{'symbol': sym, 'price': f"{self.prices[sym]:.8f}"} for sym in symbols]
+        if path == '/api/v3/klines':
+            self._count('binance')
+            symbol = query.get('symbol', [''])[0]
+            if symbol not in self.klines:
+                return 400, {}, {'code': -1121, 'msg': 'Invalid symbol.'}
+            limit = min(int(query.get('limit', ['500'])[0]), KLINE_LIMIT)
+            rows = self.klines[symbol]
+            if 'startTime' in query:
+                start = int(query['startTime'][0])
+                return 200, {}, [row for row in rows if row[0] >= start][:limit]
+            return 200, {}, rows[-limit:]
+        if path == '/api/v3/simple/price':
+            self._count('coingecko')
+            currencies = query.get('vs_currencies', ['usd'])[0].split(',')
+            body = {}
+            for coin_id in query.get('ids', [''])[0].split(','):
+                if coin_id in self.coingecko_ids:
+                    price = self.prices[self.coingecko_ids[coin_id]]
+                    body[coin_id] = {vs: price for vs in currencies}
+            return 200, {}, body
+        return 404, {}, {'error': 'not found'}
+
+    def _count(self, source):
+        self.requests[source] = self.requests.get(source, 0) + 1
+        delay = self.latency.get(source, 0)
+        if delay:
+            time.sleep(delay)
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; without this, delayed
+            # ACKs add ~40 ms to every keep-alive response
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                stub.connections += 1
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                status, headers, body = stub.handle(parsed.path, parse_qs(parsed.query))
+                payload = json.dumps(body).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                    for name, value in headers.items():
+                        self.send_header(name, str(value))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def synthetic_klines(seconds=KLINE_LIMIT, end=None, price=50000.0, seed=1, interval_ms=1000):
+    """Random-walk kline rows in Binance's layout, one per interval, the newest open at `end` (default now)."""
+    rng = random.Random(seed)
+    end_ms = int((time.time() if end is None else end) * 1000) // interval_ms * interval_ms
+    rows = []
+    for open_ms in range(end_ms - (seconds - 1) * interval_ms, end_ms + 1, interval_ms):
+        open_price = price
+        price *= 1 + rng.gauss(0, 0.0003)
+        rows.append([open_ms, f"{open_price:.8f}", f"{max(open_price, price):.8f}",
+                     f"{min(open_price, price):.8f}", f"{price:.8f}", "1.00000000",
+                     open_ms + interval_ms - 1, f"{price:.8f}", 10, "0.5", f"{price / 2:.8f}", "0"])
+    return rows
+
+
+def record_klines(symbol, path, interval=KLINE_INTERVAL, limit=KLINE_LIMIT):
+    """Save the latest klines for `symbol` from Binance as JSON, for StubPriceServer(klines=...)."""
+    response = requests.get(f"{BINANCE_URL}/api/v3/klines", timeout=DEFAULT_TIMEOUTS['binance'],
+                            params={'symbol': symbol, 'interval': interval, 'limit': limit})
+    response.raise_for_status()
+    rows = response.json()
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(rows, f)
+    print(f"Saved {len(rows)} {interval} klines for {symbol} to {path}")
+
+
+def backfill_benchmark(path=None, step=5.0):
+    """First-tick state of a cold predictor against one backfilled from stub klines (recorded JSON or synthetic)."""
+    from crypto_engine import BackfillSink, Predictor, Tick
+
+    if path:
+        with open(path, encoding='utf-8') as f:
+            rows = json.load(f)
+        # Shift the recording so its newest candle is the current one
+        shift = int(time.time() * 1000) // 1000 * 1000 - rows[-1][0]
+        rows = [[row[0] + shift] + row[1:6] + [row[6] + shift] + row[7:] for row in rows]
+    else:
+        rows = synthetic_klines()
+    price = float(rows[-1][4])
+    with StubPriceServer(prices={'BTCUSDT': price}, klines={'BTCUSDT': rows}) as stub:
+        fetcher = PriceFetcher(stub.url, stub.url)
+        for label, sinks in (('cold start', []), ('backfilled', [BackfillSink(fetcher, step=step)])):
+            stub.requests = {'binance': 0, 'coingecko': 0}
+            predictor = Predictor('BTCUSDT')
+            start = time.perf_counter()
+            for sink in sinks:
+                sink.on_start(predictor)
+            elapsed = time.perf_counter() - start
+            result = predictor.step(Tick(time.time(), fetcher.binance_price('BTCUSDT')))
+            print(f"{label:<11} {elapsed * 1000:6.1f} ms, {stub.requests['binance'] - 1} klines request(s), "
+                  f"{len(predictor.history)} ticks; first tick: trend {result.trend}, "
+                  f"win likelihood {result.win_likelihood:.1f}% over {len(predictor.prediction_results)} predictions")
+        fetcher.close()
+
+
+def benchmark(ticks=20, latency=0.2):
+    """Compare sequential bare requests.get calls against PriceFetcher on a stub with injected latency."""
+    with StubPriceServer(latency={'binance': latency, 'coingecko': latency}) as stub:
+        start = time.perf_counter()
+        for _ in range(ticks):
+            requests.get(f"{stub.url}/api/v3/ticker/price?symbol=BTCUSDT").json()
+            requests.get(f"{stub.url}/api/v3/simple/price?ids=bitcoin&vs_currencies=usd").json()
+        sequential = (time.perf_counter() - start) / ticks
+        bare_connections = stub.connections
+
+        stub.connections = 0
+        fetcher = PriceFetcher(stub.url, stub.url)
+        start = time.perf_counter()
+        for _ in range(ticks):
+            quote = fetcher.fetch('BTCUSDT', 'bitcoin', 'usd')
+            assert quote.complete, quote.errors
+        concurrent = (time.perf_counter() - start) / ticks
+        pooled_connections = stub.connections
+
+        # One source stalls past its timeout: the other price still arrives
+        stub.latency['coingecko'] = 2.0
+        slow = PriceFetcher(stub.url, stub.url, timeouts={'coingecko': (0.5, 0.5)})
+        quote = slow.fetch('BTCUSDT', 'bitcoin', 'usd')
+        fetcher.close()
+        slow.close()
+
+    print(f"Injected latency: {latency * 1000:.0f} ms per source, {ticks} ticks")
+    print(f"Sequential requests.get: {sequential * 1000:.1f} ms/tick, {bare_connections} connections")
+    print(f"PriceFetcher:            {concurrent * 1000:.1f} ms/tick, {pooled_connections} connections")
+    print(f"Stalled CoinGecko:       {quote.elapsed * 1000:.1f} ms, {quote}")
+
+
+if __name__ == "__main__":
+    if '--bench' in sys.argv:
+        benchmark()
+    elif '--backfill' in sys.argv:
+        args = sys.argv[sys.argv.index('--backfill') + 1:]
+        backfill_benchmark(args[0] if args else None)
+    elif '--record-klines' in sys.argv and len(sys.argv) > sys.argv.index('--record-klines') + 2:
+        i = sys.argv.index('--record-klines')
+        record_klines(sys.argv[i + 1], sys.argv[i + 2])
+    else:
+        print("Usage: python crypto_feed.py --bench | --backfill [KLINES.json] | --record-klines SYMBOL KLINES.json")
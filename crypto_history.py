@@ -0,0 +1,160 @@
+import bisect
+import logging
+import math
+from array import array
+
+# Default retention for the live predictor: 6 hours of ticks
+DEFAULT_RETENTION = 6 * 60 * 60
+DEFAULT_CAPACITY = 8192  # entries kept when there is no retention limit
+# Fastest tick rate the capacity is sized for: one tick a second, the
+# stream feed's default interval (about 520 KB for 6 hours)
+MIN_TICK_INTERVAL = 1.0
+
+
+def capacity_for(retention, tick_interval=MIN_TICK_INTERVAL):
+    """Entries needed to hold `retention` seconds of ticks arriving every `tick_interval` seconds."""
+    if retention is None:
+        return DEFAULT_CAPACITY
+    return max(1, math.ceil(retention / tick_interval) + 1)
+
+
+class PriceHistory:
+    """
+    Bounded, time-indexed price series backed by fixed-size arrays.
+
+    Entries are kept in a ring buffer and evicted once they are older than
+    `retention` seconds or the buffer is full. Timestamps are epoch seconds
+    and must be non-decreasing. A running sum is stored next to every value
+    so window sums and moving averages are O(1), and time lookups are a
+    binary search over the ring.
+
+    By default the buffer is sized for `retention` seconds at one tick per
+    MIN_TICK_INTERVAL. Faster ticks make it cover less than the retention,
+    which is logged once.
+    """
+
+    def __init__(self, retention=DEFAULT_RETENTION, capacity=None):
+        if capacity is None:
+            capacity = capacity_for(retention)
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.retention = retention
+        self.capacity = capacity
+        self._ts = array('d', [0.0]) * capacity
+        self._vals = array('d', [0.0]) * capacity
+        self._cum = array('d', [0.0]) * capacity
+        self._head = 0      # physical slot of the oldest entry
+        self._size = 0
+        self._base = 0.0    # running sum just before the oldest entry
+        self._total = 0.0   # running sum including the newest entry
+        self._truncated = False  # capacity evicted an entry still inside retention
+
+    def __len__(self):
+        return self._size
+
+    def _slot(self, i):
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError("PriceHistory index out of range")
+        return (self._head + i) % self.capacity
+
+    def __getitem__(self, i):
+        return self._vals[self._slot(i)]
+
+    def time_at(self, i):
+        return self._ts[self._slot(i)]
+
+    def append(self, t, value):
+        if self._size and t < self._ts[self._slot(-1)]:
+            raise ValueError("timestamps must be non-decreasing")
+        if self._size == self.capacity:
+            if not self._truncated and self.retention is not None and self._ts[self._head] >= t - self.retention:
+                self._truncated = True
+                span = t - self._ts[self._head]
+                logging.warning(f"PriceHistory full: {self.capacity} entries cover only {span:.0f}s of the "
+                                f"{self.retention}s retention; pass a larger capacity for faster ticks")
+            self._pop_oldest()
+        slot = (self._head + self._size) % self.capacity
+        self._total += value
+        self._ts[slot] = t
+        self._vals[slot] = value
+        self._cum[slot] = self._total
+        self._size += 1
+        if self.retention is not None:
+            self.evict_before(t - self.retention)
+
+    def extend(self, items):
+        for t, value in items:
+            self.append(t, value)
+
+    def _pop_oldest(self):
+        self._base = self._cum[self._head]
+        self._head = (self._head + 1) % self.capacity
+        self._size -= 1
+        if self._head == 0:
+            self._rebase()
+
+    def _rebase(self):
+        # Keep the running sums small so window differences stay precise.
+        # Runs once per wrap of the ring, so it is O(1) amortized.
+        base = self._base
+        for i in range(self._size):
+            slot = (self._head + i) % self.capacity
+            self._cum[slot] -= base
+        self._total -= base
+        self._base = 0.0
+
+    def evict_before(self, t):
+        """Drop every entry with a timestamp older than `t`."""
+        while self._size and self._ts[self._head] < t:
+            self._pop_oldest()
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
+        self._base = 0.0
+        self._total = 0.0
+
+    def index_at(self, t):
+        """Index of the first entry at or after time `t` (len(self) if none)."""
+        return bisect.bisect_left(_TimeView(self), t)
+
+    def window_sum(self, end, window):
+        """Sum of up to `window` values ending at (and including) index `end`."""
+        if end < 0:
+            end += self._size
+        start = max(0, end - window + 1)
+        hi = self._cum[self._slot(end)]
+        lo = self._cum[self._slot(start - 1)] if start > 0 else self._base
+        return hi - lo, end - start + 1
+
+    def moving_average(self, end=-1, window=5):
+        """Same result as moving_average(prices[:end+1], window), in O(1)."""
+        total, count = self.window_sum(end, window)
+        return total / count
+
+    def moving_average_at(self, t, window=5):
+        """Moving average as of the first tick at or after time `t`, or None."""
+        i = self.index_at(t)
+        if i == self._size:
+            return None
+        return self.moving_average(i, window)
+
+    def values(self):
+        return [self._vals[(self._head + i) % self.capacity] for i in range(self._size)]
+
+    def times(self):
+        return [self._ts[(self._head + i) % self.capacity] for i in range(self._size)]
+
+
+class _TimeView:
+    # Sequence view over the ring's timestamps so bisect can search it
+    def __init__(self, history):
+        self._history = history
+
+    def __len__(self):
+        return len(self._history)
+
+    def __getitem__(self, i):
+        return self._history.time_at(i)
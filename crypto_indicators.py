@@ -0,0 +1,502 @@
+import argparse
+import math
+import time
+from collections import deque
+
+from crypto_signals import MA_WINDOW, predict_direction
+
+RSI_PERIOD = 14
+RSI_OVERSOLD = 30.0
+RSI_OVERBOUGHT = 70.0
+MACD_PERIODS = (12, 26, 9)  # fast EMA, slow EMA, signal EMA
+BOLLINGER_PERIOD = 20
+BOLLINGER_WIDTH = 2.0  # band width in standard deviations
+# Batch EMAs are evaluated as one matrix product per block of this many ticks
+BATCH_BLOCK = 128
+# Running sums are recomputed from the window this often so rounding cannot accumulate
+RESYNC_EVERY = 4096
+
+
+# --- Streaming indicators: update(price) is O(1) and returns the current value ---
+#
+# Each indicator also has batch(prices), which computes the whole series with
+# NumPy for backtests, starting from fresh state. Batch and streaming results
+# agree to floating-point rounding; see check().
+
+class SMA:
+    """Simple moving average from a running sum. Averages what is available until `period` prices are in."""
+
+    def __init__(self, period=MA_WINDOW):
+        self.period = period
+        self._window = deque()
+        self._sum = 0.0
+        self._updates = 0
+        self.value = None
+
+    def update(self, x):
+        window = self._window
+        window.append(x)
+        self._sum += x
+        if len(window) > self.period:
+            self._sum -= window.popleft()
+        self._updates += 1
+        if self._updates % RESYNC_EVERY == 0:
+            self._sum = math.fsum(window)
+        self.value = self._sum / len(window)
+        return self.value
+
+    def batch(self, prices):
+        import numpy as np
+        x = np.asarray(prices, dtype=np.float64)
+        cum = np.cumsum(x)
+        n = self.period
+        out = np.empty(len(x))
+        out[:n] = cum[:n] / np.arange(1, min(n, len(x)) + 1)
+        out[n:] = (cum[n:] - cum[:-n]) / n
+        return out
+
+
+class EMA:
+    """Exponential moving average with alpha = 2 / (period + 1), seeded with the first price."""
+
+    def __init__(self, period=MA_WINDOW, alpha=None):
+        self.period = period
+        self.alpha = alpha if alpha is not None else 2.0 / (period + 1)
+        self.value = None
+
+    def update(self, x):
+        if self.value is None:
+            self.value = x
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+    def batch(self, prices):
+        import numpy as np
+        x = np.asarray(prices, dtype=np.float64)
+        out = np.empty(len(x))
+        if len(x):
+            out[0] = x[0]
+            out[1:] = _ema_batch(x[1:], self.alpha, x[0])
+        return out
+
+
+class RollingVariance:
+    """Population variance of the last `period` prices, updated with a sliding Welford step."""
+
+    def __init__(self, period=BOLLINGER_PERIOD):
+        self.period = period
+        self._window = deque()
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._updates = 0
+        self.value = None
+
+    def update(self, x):
+        window = self._window
+        window.append(x)
+        if len(window) > self.period:
+            old = window.popleft()
+            mean = self.mean + (x - old) / self.period
+            self._m2 += (x - old) * (x - mean + old - self.mean)
+            self.mean = mean
+        else:
+            delta = x - self.mean
+            self.mean += delta / len(window)
+            self._m2 += delta * (x - self.mean)
+        self._updates += 1
+        if self._updates % RESYNC_EVERY == 0:
+            self.mean = math.fsum(window) / len(window)
+            self._m2 = math.fsum((v - self.mean) ** 2 for v in window)
+        self._m2 = max(self._m2, 0.0)
+        self.value = self._m2 / len(window)
+        return self.value
+
+    def batch(self, prices):
+        import numpy as np
+        x = np.asarray(prices, dtype=np.float64)
+        n = self.period
+        out = np.empty(len(x))
+        for k in range(min(n - 1, len(x))):
+            out[k] = x[:k + 1].var()
+        if len(x) >= n:
+            out[n - 1:] = np.lib.stride_tricks.sliding_window_view(x, n).var(axis=1)
+        return out
+
+
+class RSI:
+    """Wilder's relative strength index. None until `period` price changes have been seen."""
+
+    def __init__(self, period=RSI_PERIOD):
+        self.period = period
+        self._prev = None
+        self._count = 0
+        self._gain = 0.0
+        self._loss = 0.0
+        self.value = None
+
+    def update(self, x):
+        prev, self._prev = self._prev, x
+        if prev is None:
+            return None
+        change = x - prev
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        self._count += 1
+        if self._count <= self.period:
+            # Seed with the plain average of the first `period` changes
+            self._gain += gain / self.period
+            self._loss += loss / self.period
+            if self._count < self.period:
+                return None
+        else:
+            self._gain += (gain - self._gain) / self.period
+            self._loss += (loss - self._loss) / self.period
+        self.value = _rsi(self._gain, self._loss)
+        return self.value
+
+    def batch(self, prices):
+        import numpy as np
+        x = np.asarray(prices, dtype=np.float64)
+        n = self.period
+        out = np.full(len(x), np.nan)
+        if len(x) <= n:
+            return out
+        change = np.diff(x)
+        gains, losses = np.maximum(change, 0.0), np.maximum(-change, 0.0)
+        seed_gain = _sequential_sum(gains[:n] / n)
+        seed_loss = _sequential_sum(losses[:n] / n)
+        avg_gain = np.concatenate(([seed_gain], _ema_batch(gains[n:], 1.0 / n, seed_gain)))
+        avg_loss = np.concatenate(([seed_loss], _ema_batch(losses[n:], 1.0 / n, seed_loss)))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+        rsi = np.where(avg_loss == 0, np.where(avg_gain > 0, 100.0, 50.0), rsi)
+        out[n:] = rsi
+        return out
+
+
+class MACD:
+    """MACD line, signal line and histogram as (macd, signal, histogram)."""
+
+    def __init__(self, fast=MACD_PERIODS[0], slow=MACD_PERIODS[1], signal=MACD_PERIODS[2]):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+        self.value = None
+
+    def update(self, x):
+        macd = self.fast.update(x) - self.slow.update(x)
+        signal = self.signal.update(macd)
+        self.value = (macd, signal, macd - signal)
+        return self.value
+
+    def batch(self, prices):
+        macd = self.fast.batch(prices) - self.slow.batch(prices)
+        signal = self.signal.batch(macd)
+        return macd, signal, macd - signal
+
+
+class Bollinger:
+    """Bollinger bands as (middle, upper, lower): SMA +/- `width` population standard deviations."""
+
+    def __init__(self, period=BOLLINGER_PERIOD, width=BOLLINGER_WIDTH):
+        self.width = width
+        self.sma = SMA(period)
+        self.variance = RollingVariance(period)
+        self.value = None
+
+    def update(self, x):
+        mid = self.sma.update(x)
+        band = self.width * math.sqrt(self.variance.update(x))
+        self.value = (mid, mid + band, mid - band)
+        return self.value
+
+    def batch(self, prices):
+        import numpy as np
+        mid = self.sma.batch(prices)
+        band = self.width * np.sqrt(self.variance.batch(prices))
+        return mid, mid + band, mid - band
+
+
+def _rsi(gain, loss):
+    if loss == 0:
+        return 100.0 if gain > 0 else 50.0
+    return 100.0 - 100.0 / (1.0 + gain / loss)
+
+
+def _sequential_sum(values):
+    # Left-to-right, like the streaming seed (np.sum adds pairwise)
+    total = 0.0
+    for v in values.tolist():
+        total += v
+    return total
+
+
+def _ema_batch(x, alpha, seed):
+    """y[k] = y[k-1] + alpha * (x[k] - y[k-1]) with y[-1] = seed, one matrix product per block."""
+    import numpy as np
+    n = len(x)
+    out = np.empty(n)
+    decay = 1.0 - alpha
+    i = np.arange(BATCH_BLOCK)
+    lag = i[:, None] - i[None, :]
+    weights = np.where(lag >= 0, alpha * decay ** np.maximum(lag, 0), 0.0)
+    carry = decay ** (i + 1)
+    prev = seed
+    for start in range(0, n, BATCH_BLOCK):
+        chunk = x[start:start + BATCH_BLOCK]
+        m = len(chunk)
+        out[start:start + m] = weights[:m, :m] @ chunk + carry[:m] * prev
+        prev = out[start + m - 1]
+    return out
+
+
+# --- Signals: choose the indicator that drives the UP/DOWN/FLAT prediction ---
+#
+# Each signal also has batch(prices): the direction of every tick from fresh
+# state as an int8 array of 1 (UP), 0 (FLAT) and -1 (DOWN), for backtests.
+
+def _slope(values):
+    import numpy as np
+    out = np.zeros(len(values), dtype=np.int8)
+    out[1:] = np.sign(np.diff(values))
+    return out
+
+class DeltaSignal:
+    """The original rule: direction of the last one-tick price move."""
+
+    def __init__(self):
+        self._prev = None
+
+    def __call__(self, price):
+        prev, self._prev = self._prev, price
+        return 'FLAT' if prev is None else predict_direction(prev, price)
+
+    def batch(self, prices):
+        import numpy as np
+        return _slope(np.asarray(prices, dtype=np.float64))
+
+
+class SlopeSignal:
+    """Direction the indicator moved on this tick."""
+
+    def __init__(self, indicator):
+        self.indicator = indicator
+        self._prev = None
+
+    def __call__(self, price):
+        value = self.indicator.update(price)
+        prev, self._prev = self._prev, value
+        return 'FLAT' if prev is None else predict_direction(prev, value)
+
+    def batch(self, prices):
+        return _slope(self.indicator.batch(prices))
+
+
+class SMASlopeSignal:
+    """
+    Direction the simple moving average moved on this tick, decided without
+    its rounding: once the window is full the SMA moves the way the new
+    price compares with the one it replaces, and before that the way the
+    new price compares with the previous average.
+    """
+
+    def __init__(self, period=MA_WINDOW):
+        self.sma = SMA(period)
+
+    def __call__(self, price):
+        sma = self.sma
+        if len(sma._window) == sma.period:
+            old = sma._window[0]
+            sma.update(price)
+            return predict_direction(old, price)
+        prev = sma.value
+        sma.update(price)
+        return 'FLAT' if prev is None else predict_direction(prev, price)
+
+    def batch(self, prices):
+        import numpy as np
+        x = np.asarray(prices, dtype=np.float64)
+        n = self.sma.period
+        out = np.zeros(len(x), dtype=np.int8)
+        warm = min(n, len(x))
+        if warm > 1:
+            # np.cumsum adds left to right, like the streaming running sum before the window fills
+            means = np.cumsum(x[:warm - 1]) / np.arange(1, warm)
+            out[1:warm] = np.sign(x[1:warm] - means)
+        if len(x) > n:
+            out[n:] = np.sign(x[n:] - x[:-n])
+        return out
+
+
+class MACDSignal:
+    """UP while the MACD histogram is positive, DOWN while it is negative."""
+
+    def __init__(self, macd=None):
+        self.macd = macd or MACD()
+
+    def __call__(self, price):
+        histogram = self.macd.update(price)[2]
+        return 'UP' if histogram > 0 else 'DOWN' if histogram < 0 else 'FLAT'
+
+    def batch(self, prices):
+        import numpy as np
+        return np.sign(self.macd.batch(prices)[2]).astype(np.int8)
+
+
+class RSISignal:
+    """Mean reversion: UP when oversold, DOWN when overbought."""
+
+    def __init__(self, rsi=None, oversold=RSI_OVERSOLD, overbought=RSI_OVERBOUGHT):
+        self.rsi = rsi or RSI()
+        self.oversold = oversold
+        self.overbought = overbought
+
+    def __call__(self, price):
+        value = self.rsi.update(price)
+        if value is None:
+            return 'FLAT'
+        return 'UP' if value < self.oversold else 'DOWN' if value > self.overbought else 'FLAT'
+
+    def batch(self, prices):
+        import numpy as np
+        rsi = self.rsi.batch(prices)  # NaN until warmed up, which compares False: FLAT
+        return np.where(rsi < self.oversold, 1, np.where(rsi > self.overbought, -1, 0)).astype(np.int8)
+
+
+class BollingerSignal:
+    """Mean reversion: UP below the lower band, DOWN above the upper band."""
+
+    def __init__(self, bands=None):
+        self.bands = bands or Bollinger()
+
+    def __call__(self, price):
+        _, upper, lower = self.bands.update(price)
+        return 'UP' if price < lower else 'DOWN' if price > upper else 'FLAT'
+
+    def batch(self, prices):
+        import numpy as np
+        x = np.asarray(prices, dtype=np.float64)
+        _, upper, lower = self.bands.batch(x)
+        return np.where(x < lower, 1, np.where(x > upper, -1, 0)).astype(np.int8)
+
+
+SIGNALS = {
+    'delta': lambda window: DeltaSignal(),
+    'sma': lambda window: SMASlopeSignal(window),
+    'ema': lambda window: SlopeSignal(EMA(window)),
+    'macd': lambda window: MACDSignal(),
+    'rsi': lambda window: RSISignal(),
+    'bollinger': lambda window: BollingerSignal(),
+}
+
+
+def make_signal(name, window=MA_WINDOW):
+    """A callable price -> 'UP'/'DOWN'/'FLAT' for one of SIGNALS, with its own indicator state."""
+    if name not in SIGNALS:
+        raise ValueError(f"Unknown signal '{name}', choose from: {', '.join(SIGNALS)}")
+    return SIGNALS[name](window)
+
+
+def signal_batch(name, prices, window=MA_WINDOW):
+    """Directions of one of SIGNALS for a whole price series: int8 1 (UP), 0 (FLAT), -1 (DOWN) per tick."""
+    return make_signal(name, window).batch(prices)
+
+
+# --- Checks and benchmark ---
+
+def _indicators():
+    return {
+        'SMA(5)': lambda: SMA(5),
+        'SMA(200)': lambda: SMA(200),
+        'EMA(12)': lambda: EMA(12),
+        'RollingVariance(20)': lambda: RollingVariance(20),
+        'RSI(14)': lambda: RSI(14),
+        'MACD(12,26,9)': lambda: MACD(),
+        'Bollinger(20,2)': lambda: Bollinger(),
+    }
+
+
+def check(prices, rtol=1e-8):
+    """Largest relative difference between streaming and batch results per indicator. Raises if above rtol."""
+    import numpy as np
+    worst = {}
+    for name, make in _indicators().items():
+        indicator = make()
+        streamed = [indicator.update(p) for p in prices]
+        batch = make().batch(prices)
+        columns = batch if isinstance(batch, tuple) else (batch,)
+        diff = 0.0
+        for c, column in enumerate(columns):
+            live = np.array([np.nan if v is None else (v[c] if isinstance(v, tuple) else v) for v in streamed])
+            if not np.array_equal(np.isnan(live), np.isnan(column)):
+                raise ValueError(f"{name}: streaming and batch disagree on where values start")
+            ok = ~np.isnan(live)
+            scale = np.maximum(np.abs(column[ok]), np.abs(np.asarray(prices)[ok]) * 1e-6)
+            if ok.any():
+                diff = max(diff, float((np.abs(live[ok] - column[ok]) / scale).max()))
+        if diff > rtol:
+            raise ValueError(f"{name}: streaming and batch differ by {diff:.3g} (relative)")
+        worst[name] = diff
+    return worst
+
+
+def benchmark(ticks=200_000, seed=1):
+    """Per-tick update cost of each streaming indicator, batch throughput and the naive slice re-sum."""
+    import random
+    rng = random.Random(seed)
+    prices = []
+    price = 50000.0
+    for _ in range(ticks):
+        price += rng.gauss(0, 15)
+        prices.append(price)
+
+    print(f"{ticks} ticks")
+    print(f"{'indicator':<22}{'stream ns/tick':>15}{'batch ns/tick':>15}{'max rel diff':>14}")
+    worst = check(prices[:20_000])
+    for name, make in _indicators().items():
+        indicator = make()
+        update = indicator.update
+        start = time.perf_counter()
+        for p in prices:
+            update(p)
+        stream = (time.perf_counter() - start) / ticks * 1e9
+        start = time.perf_counter()
+        make().batch(prices)
+        batch = (time.perf_counter() - start) / ticks * 1e9
+        print(f"{name:<22}{stream:>15.0f}{batch:>15.1f}{worst[name]:>14.2e}")
+
+    # Baseline: the old crypto_predictor.moving_average, which re-summed a slice on every call
+    def moving_average(values, window=5):
+        if len(values) < window:
+            return sum(values) / len(values)
+        return sum(values[-window:]) / window
+
+    sample = prices[:20_000]
+    for window in (5, 50, 500):
+        history = []
+        start = time.perf_counter()
+        for p in sample:
+            history.append(p)
+            moving_average(history, window)
+        naive = (time.perf_counter() - start) / len(sample) * 1e9
+        sma = SMA(window)
+        start = time.perf_counter()
+        for p in sample:
+            sma.update(p)
+        running = (time.perf_counter() - start) / len(sample) * 1e9
+        print(f"window {window:>3}: slice re-sum {naive:7.0f} ns/tick, running SMA {running:5.0f} ns/tick")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming indicators for crypto_predictor.")
+    parser.add_argument('--bench', action='store_true', help="measure per-tick update cost")
+    parser.add_argument('--ticks', type=int, default=200_000)
+    args = parser.parse_args()
+    if args.bench:
+        benchmark(args.ticks)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
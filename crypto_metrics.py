@@ -0,0 +1,208 @@
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+METRICS_PATH = 'crypto_metrics.json'
+WRITE_EVERY = 30.0  # seconds between snapshot file rewrites
+# Histogram buckets grow by 2 ** (1 / BUCKETS_PER_OCTAVE) from MIN_SECONDS,
+# so percentiles are accurate to about 9% over 1 us .. ~18 min
+MIN_SECONDS = 1e-6
+BUCKETS_PER_OCTAVE = 8
+BUCKET_COUNT = 30 * BUCKETS_PER_OCTAVE
+
+
+class Histogram:
+    """Log-bucketed latency histogram; record() is O(1) and memory is fixed."""
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, seconds):
+        if seconds > MIN_SECONDS:
+            i = min(int(math.log2(seconds / MIN_SECONDS) * BUCKETS_PER_OCTAVE), BUCKET_COUNT - 1)
+        else:
+            i = 0
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """Upper edge of the bucket holding the q-th percentile, capped at the observed max."""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(MIN_SECONDS * 2 ** ((i + 1) / BUCKETS_PER_OCTAVE), self.max)
+        return self.max
+
+    def summary(self):
+        ms = 1000.0
+        return {
+            'count': self.count,
+            'total_s': round(self.total, 6),
+            'mean_ms': round(self.total / self.count * ms, 4) if self.count else 0.0,
+            'min_ms': round(self.min * ms, 4) if self.count else 0.0,
+            'p50_ms': round(self.percentile(50) * ms, 4),
+            'p90_ms': round(self.percentile(90) * ms, 4),
+            'p99_ms': round(self.percentile(99) * ms, 4),
+            'max_ms': round(self.max * ms, 4),
+        }
+
+
+class _Stage:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.record(time.perf_counter() - self.start)
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NULL_STAGE = _NullStage()
+
+
+class Metrics:
+    """
+    Per-stage latency histograms for the predictor's hot path.
+
+        with metrics.stage('fetch'):
+            ...
+
+    snapshot() returns every stage's count, mean, percentiles and max plus
+    whatever the registered sources report (scheduler, cache, ...).
+    maybe_write() rewrites the snapshot JSON file at most every
+    `write_every` seconds. When disabled, stage() returns a shared no-op
+    context manager and nothing is recorded or written.
+    """
+
+    def __init__(self, enabled=True, path=METRICS_PATH, write_every=WRITE_EVERY):
+        self.enabled = enabled
+        self.path = path
+        self.write_every = write_every
+        self.started = time.time()
+        self._histograms = {}
+        self._sources = {}
+        # Guards adding stages and sources: other threads record while snapshot() iterates
+        self._lock = threading.Lock()
+        self._last_write = time.monotonic()
+
+    def _histogram(self, name):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram())
+        return histogram
+
+    def stage(self, name):
+        if not self.enabled:
+            return NULL_STAGE
+        return _Stage(self._histogram(name))
+
+    def record(self, name, seconds):
+        if self.enabled:
+            self._histogram(name).record(seconds)
+
+    def add_source(self, name, fn):
+        """Include fn()'s result under `name` in every snapshot."""
+        with self._lock:
+            self._sources[name] = fn
+
+    def snapshot(self):
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            sources = list(self._sources.items())
+        snap = {
+            'generated': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'uptime_s': round(time.time() - self.started, 1),
+            'enabled': self.enabled,
+            'stages': {name: h.summary() for name, h in histograms},
+        }
+        for name, fn in sources:
+            try:
+                snap[name] = fn()
+            except Exception as e:
+                snap[name] = {'error': str(e)}
+        return snap
+
+    def write(self, path=None):
+        """Write the snapshot atomically, so readers never see a partial file."""
+        path = path or self.path
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp, path)
+
+    def maybe_write(self):
+        if not self.enabled or not self.path:
+            return
+        now = time.monotonic()
+        if now - self._last_write >= self.write_every:
+            self._last_write = now
+            self.write()
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+def benchmark(n=500_000):
+    """Cost of a timed stage with metrics enabled and disabled, against an untimed loop."""
+    def loop(metrics):
+        start = time.perf_counter()
+        for _ in range(n):
+            with metrics.stage('tick'):
+                pass
+        return (time.perf_counter() - start) / n * 1e9
+
+    start = time.perf_counter()
+    for _ in range(n):
+        pass
+    bare = (time.perf_counter() - start) / n * 1e9
+    enabled = loop(Metrics(enabled=True, path=None))
+    disabled = loop(Metrics(enabled=False, path=None))
+    metrics = Metrics(enabled=True, path=None)
+    for i in range(10_000):
+        metrics.record('sample', (i % 100 + 1) / 1000)
+    s = metrics.snapshot()['stages']['sample']
+    print(f"empty loop:           {bare:6.0f} ns/iteration")
+    print(f"stage() when enabled:  {enabled - bare:6.0f} ns/stage")
+    print(f"stage() when disabled: {disabled - bare:6.0f} ns/stage")
+    print(f"uniform 1-100 ms sample: p50 {s['p50_ms']:.1f} ms, p90 {s['p90_ms']:.1f} ms, "
+          f"p99 {s['p99_ms']:.1f} ms, max {s['max_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    if '--bench' in sys.argv:
+        benchmark()
+    else:
+        print("Usage: python crypto_metrics.py --bench")
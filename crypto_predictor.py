@@ -1,12 +1,20 @@
-import requests
+import argparse
+import asyncio
 import time
-import datetime
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
 import logging
 import subprocess
 import sys
 
+from crypto_engine import BackfillSink, ConsoleSink, LogSink, Predictor, SignalStoreSink, Tick, TickStoreSink
+from crypto_feed import PriceFetcher
+from crypto_history import DEFAULT_RETENTION
+from crypto_indicators import SIGNALS
+from crypto_metrics import METRICS_PATH, Metrics
+from crypto_scheduler import TickScheduler
+from crypto_signalstore import SIGNAL_DB, SignalStore
+from crypto_stream import STREAM_INTERVAL, StreamFeed
+from crypto_signals import MA_WINDOW, PO_PROFIT_PCT, PO_TRADE_DURATION
+
 # Supported symbols for Binance and CoinGecko
 SYMBOLS = {
     'BTCUSDT': {'binance': 'BTCUSDT', 'coingecko': ('bitcoin', 'usd')},
@@ -28,271 +36,324 @@ def select_symbol():
     idx = int(input("Enter number: ")) - 1
     return list(SYMBOLS.keys())[idx]
 
+def select_symbols():
+    print("Select symbols to track:")
+    names = list(SYMBOLS.keys())
+    for i, sym in enumerate(names):
+        print(f"{i+1}. {sym}")
+    choice = input("Enter a number, several numbers separated by commas, or 'all': ").strip().lower()
+    if choice == 'all':
+        return names
+    return [names[int(part) - 1] for part in choice.split(',') if part.strip()]
+
+# Shared fetcher: pooled keep-alive connections and per-source timeouts
+fetcher = PriceFetcher()
+
 def get_binance_price(symbol):
-    url = f"https://api.binance.com/api/v3/ticker/price?symbol={symbol}"
-    response = requests.get(url)
-    data = response.json()
-    if 'price' not in data:
-        print(f"Binance API response error: {data}")
-        raise Exception("'price' not found in Binance API response")
-    return float(data['price'])
+    return fetcher.binance_price(symbol)
 
 def get_coingecko_price(coin_id, vs_currency):
-    url = f"https://api.coingecko.com/api/v3/simple/price?ids={coin_id}&vs_currencies={vs_currency}"
-    response = requests.get(url)
-    data = response.json()
-    if coin_id not in data or vs_currency not in data[coin_id]:
-        print(f"CoinGecko API response error: {data}")
-        raise Exception(f"'{vs_currency}' not found in CoinGecko API response for {coin_id}")
-    return float(data[coin_id][vs_currency])
-
-def moving_average(prices, window=5):
-    if len(prices) < window:
-        return sum(prices) / len(prices)
-    return sum(prices[-window:]) / window
-
-# Setup logging
-logging.basicConfig(
-    filename='crypto_predictor.log',
-    level=logging.INFO,
-    format='%(asctime)s | %(levelname)s | %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-
-symbol = select_symbol()
-binance_symbol = SYMBOLS[symbol]['binance']
-coingecko_id, coingecko_vs = SYMBOLS[symbol]['coingecko']
-logging.info('--- Script started for symbol: %s ---', symbol)
-
-# Ask user for investment amount
-while True:
-    try:
-        investment = float(input("Enter your investment amount in USD: "))
-        if investment > 0:
-            break
-        else:
-            print("Please enter a positive number.")
-    except ValueError:
-        print("Invalid input. Please enter a number.")
-
-# Initialize global variables
-prices = []
-timestamps = []
-predictions = []
-buy_in_points = []
-prediction_results = []
-buy_in_price = None
-buy_in_announced = False
-window = 5  # Set window variable
+    return fetcher.coingecko_price(coin_id, vs_currency)
+
+# Settings
+HISTORY_RETENTION = DEFAULT_RETENTION  # seconds of price history kept in memory
+window = MA_WINDOW  # Set window variable
+PREDICTION_SIGNAL = 'delta'  # indicator driving UP/DOWN: one of crypto_indicators.SIGNALS
+CHART_VIEWPORT = 30 * 60  # seconds of price history visible on the live chart
+CHART_HISTORY = 24 * 60 * 60  # seconds kept on the chart for zooming out; drawn downsampled
+TICK_INTERVAL = 5  # seconds between price fetches
+STATS_EVERY = 60  # ticks between tick-timing summaries in the log
+METRICS_ENABLED = True  # per-stage timing, written to METRICS_PATH every 30 s
+BACKFILL_ENABLED = True  # load recent Binance klines at startup so signals are valid from the first tick
+SIGNAL_STORE_ENABLED = True  # record buy-ins, PO trades and published signals in SIGNAL_DB
 
 # Pocket Options simulation mode
 POCKET_OPTIONS_MODE = True  # Set to True to enable simulation
-po_trades = []  # List of (buy_time, buy_price, sell_time, sell_price, result)
-po_trade_open = None  # (buy_time, buy_price)
-po_trade_duration = 60  # seconds (1 min trade)
-po_profit_pct = 0.8  # 80% payout for win
+po_trade_duration = PO_TRADE_DURATION  # seconds (1 min trade)
+po_profit_pct = PO_PROFIT_PCT  # 80% payout for win
+
+# Running predictors by symbol; the first one started answers get_latest_signal()
+predictors = {}
+# Tick scheduler of the running loop, for its lateness stats
+scheduler = None
+# Stream feed when running with --stream
+stream = None
+# SQLite signal history, opened on first use; see get_signal_store()
+signal_store = None
+# Per-stage latency histograms for the tick loops; see metrics_snapshot()
+metrics = Metrics(enabled=METRICS_ENABLED, path=METRICS_PATH)
+metrics.add_source('scheduler', lambda: tick_stats())
+metrics.add_source('cache', lambda: fetcher.cache.stats())
+metrics.add_source('stream', lambda: stream.stats() if stream else None)
+
+def setup_logging():
+    logging.basicConfig(
+        filename='crypto_predictor.log',
+        level=logging.INFO,
+        format='%(asctime)s | %(levelname)s | %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
 
-# Create plot
-fig, ax = plt.subplots()
-plt.ion()
+def ask_investment():
+    # Ask user for investment amount
+    while True:
+        try:
+            investment = float(input("Enter your investment amount in USD: "))
+            if investment > 0:
+                return investment
+            else:
+                print("Please enter a positive number.")
+        except ValueError:
+            print("Invalid input. Please enter a number.")
+
+def make_predictor(sym, investment, signal=None):
+    return Predictor(sym, investment=investment, window=window, pocket_options=POCKET_OPTIONS_MODE,
+                     po_trade_duration=po_trade_duration, po_profit_pct=po_profit_pct,
+                     retention=HISTORY_RETENTION, signal=signal or PREDICTION_SIGNAL)
+
+def get_latest_snapshot(sym=None):
+    """
+    The latest crypto_engine.SignalSnapshot (pre-rendered text and embed) of
+    `sym`, or of the first predictor started, or None before the first tick.
+    Safe to call from any thread: it only reads one reference.
+    """
+    if not predictors:
+        return None
+    predictor = predictors[sym] if sym else next(iter(predictors.values()))
+    return predictor.snapshot
 
-def get_latest_signal():
+def get_latest_signal(sym=None):
     """
     Returns a string with the latest prediction and price for Discord bot usage.
     """
-    if not prices or not predictions:
-        return "No signal yet."
-    last_price = prices[-1]
-    last_pred = predictions[-1]
-    conf = 0.0
-    if len(prices) > 2:
-        if last_pred == 'UP':
-            conf = (prices[-1] - prices[-2]) / (prices[-2] - prices[-3]) * 100 if (prices[-2] - prices[-3]) != 0 else 0.0
-        elif last_pred == 'DOWN':
-            conf = (prices[-3] - prices[-2]) / (prices[-2] - prices[-1]) * 100 if (prices[-2] - prices[-1]) != 0 else 0.0
-    return f"{symbol}: {last_pred} | Price: {last_price:.2f} | Confidence: {conf:.1f}%"
-
-def run_predictor():
-    global buy_in_price, notice_given
-    # Main loop
+    snapshot = get_latest_snapshot(sym)
+    return snapshot.text if snapshot else "No signal yet."
+
+def start_predictor(predictor, sinks):
+    predictors.setdefault(predictor.symbol, predictor)
+    for sink in sinks:
+        sink.on_start(predictor)
+
+def get_signal_store():
+    """The shared SignalStore (SIGNAL_DB), opened on first use."""
+    global signal_store
+    if signal_store is None:
+        signal_store = SignalStore(SIGNAL_DB)
+    return signal_store
+
+def make_sinks(sym, compact=False, chart=False, step=TICK_INTERVAL):
+    """
+    Tick file, kline backfill, console, log and signal history sinks, plus
+    the live chart if `chart`. compact=True is the multi-symbol layout; `step` is the tick
+    spacing the backfill replays at.
+    """
+    store = TickStoreSink(warm_seconds=HISTORY_RETENTION)
+    sinks = [store]
+    if BACKFILL_ENABLED:
+        sinks.append(BackfillSink(fetcher, SYMBOLS[sym]['binance'], step=step, store_sink=store))
+    sinks += [ConsoleSink(compact=compact), LogSink(tagged=compact)]
+    if SIGNAL_STORE_ENABLED:
+        sinks.append(SignalStoreSink(get_signal_store()))
+    if chart:
+        from crypto_chart import ChartSink
+        sinks.append(ChartSink(viewport=CHART_VIEWPORT, history=CHART_HISTORY))
+    return sinks
+
+def next_tick():
+    """Wait for the next tick on the scheduler's grid, reporting ticks the loop overran."""
+    report_tick(scheduler.wait())
+
+async def next_tick_async():
+    report_tick(await scheduler.wait_async())
+
+def report_tick(skipped):
+    if skipped:
+        print(f"Warning: running late, skipped {skipped} tick(s)")
+        logging.warning(f"Running late, skipped {skipped} tick(s)")
+    if scheduler.ticks % STATS_EVERY == 0:
+        logging.info(scheduler.summary())
+        logging.info(fetcher.cache.summary())
+
+def tick_stats():
+    return scheduler.stats() if scheduler else None
+
+def metrics_snapshot():
+    """Latency percentiles per stage (fetch, predict, each sink, whole tick) plus scheduler/cache/stream stats."""
+    return metrics.snapshot()
+
+def process_tick(predictor, tick, sinks):
+    with metrics.stage('predict'):
+        result = predictor.step(tick)
+    for sink in sinks:
+        with metrics.stage('sink.' + type(sink).__name__):
+            sink.on_tick(predictor, result)
+    return result
+
+def run_predictor(symbol=None, investment=None, chart=True, sinks=None, signal=None, heartbeat=None):
+    """
+    Track one symbol until interrupted. Prompts for the symbol and investment
+    when they are not given. `sinks` replaces the default console, log, tick
+    file and (if `chart`) chart outputs. `signal` picks the indicator that
+    drives the UP/DOWN prediction (default PREDICTION_SIGNAL). `heartbeat()`,
+    if given, is called on every tick, whether or not fetching succeeds.
+    """
+    global scheduler
+    if symbol is None:
+        symbol = select_symbol()
+    if investment is None:
+        investment = ask_investment()
+    spec = SYMBOLS[symbol]
+    coingecko_id, coingecko_vs = spec['coingecko']
+    predictor = make_predictor(symbol, investment, signal)
+    if sinks is None:
+        sinks = make_sinks(symbol, chart=chart)
+    logging.info('--- Script started for symbol: %s ---', symbol)
+    start_predictor(predictor, sinks)
+    scheduler = TickScheduler(TICK_INTERVAL)
+    # Main loop: ticks stay on a fixed grid however long fetching and drawing take
     while True:
+        next_tick()
+        if heartbeat:
+            heartbeat()
         try:
-            # --- Data Collection ---
-            price_binance = get_binance_price(binance_symbol)
-            price_coingecko = get_coingecko_price(coingecko_id, coingecko_vs)
-            now = datetime.datetime.now()
-
-            # Print and log prices
-            price_log = f"{now.strftime('%Y-%m-%d %H:%M:%S')} | Binance: {price_binance:.2f} | CoinGecko: {price_coingecko:.2f}"
-            print(price_log)
-            logging.info(price_log)
-
-            # Append data for analysis
-            prices.append(price_binance)
-            timestamps.append(now)
-
-            # --- Prediction Logic ---
-            # Simple prediction: UP if price increased, DOWN if decreased, FLAT if no change
-            if len(prices) > 1:
-                if prices[-1] > prices[-2]:
-                    prediction = 'UP'
-                elif prices[-1] < prices[-2]:
-                    prediction = 'DOWN'
-                else:
-                    prediction = 'FLAT'
-            else:
-                prediction = 'FLAT'
-            predictions.append(prediction)
-
-            # Calculate confidence as the percentage of price movement in the predicted direction
-            if len(prices) > 2:
-                if prediction == 'UP':
-                    confidence = (prices[-1] - prices[-2]) / (prices[-2] - prices[-3]) * 100
-                elif prediction == 'DOWN':
-                    confidence = (prices[-3] - prices[-2]) / (prices[-2] - prices[-1]) * 100
-                else:
-                    confidence = 0.0
-            else:
-                confidence = 0.0
-
-            # --- Perfect Execution Buy-in Logic ---
-            # Buy-in if the last prediction was DOWN or FLAT and now it's UP (trend reversal)
-            if len(predictions) > 1:
-                if (predictions[-2] in ['DOWN', 'FLAT']) and (predictions[-1] == 'UP'):
-                    if not buy_in_announced:
-                        buyin_msg = f"*** PERFECT EXECUTION: BUY-IN SIGNAL at {now.strftime('%Y-%m-%d %H:%M:%S')} | Price: {price_binance:.2f} ***"
-                        print(f"\n{buyin_msg}\n")
-                        logging.info(buyin_msg)
-                        buy_in_points.append((now, price_binance))
-                        buy_in_announced = True
-                        buy_in_price = price_binance  # Set buy-in price
-                elif predictions[-1] != 'UP':
-                    buy_in_announced = False  # Reset for next opportunity
-
-            # Calculate and display profit/loss if buy-in has occurred
-            if buy_in_price:
-                coins_bought = investment / buy_in_price
-                current_value = coins_bought * price_binance
-                profit = current_value - investment
-                profit_msg = f"If you invested ${investment:.2f} at buy-in price {buy_in_price:.2f}, your current value is ${current_value:.2f} (Profit: ${profit:+.2f})"
-                print(profit_msg)
-                logging.info(profit_msg)
-
-            # 2-3 min future trend (simple): compare current MA to MA 2-3 min ago
-            three_min_ago = now - datetime.timedelta(minutes=3)
-            two_min_ago = now - datetime.timedelta(minutes=2)
-            ma_3min_ago = None
-            ma_2min_ago = None
-            for i, t in enumerate(timestamps):
-                if ma_3min_ago is None and t >= three_min_ago:
-                    ma_3min_ago = moving_average(prices[:i+1], window)
-                if ma_2min_ago is None and t >= two_min_ago:
-                    ma_2min_ago = moving_average(prices[:i+1], window)
-            if ma_3min_ago and ma_2min_ago:
-                if ma_2min_ago > ma_3min_ago:
-                    print("2-3 min future trend: UP")
-                    # Give 4 min advance notice if not already given
-                    if not notice_given:
-                        print(f"NOTICE: Prepare to BUY in 4 minutes! ({now.strftime('%Y-%m-%d %H:%M:%S')})")
-                        notice_given = True
-                elif ma_2min_ago < ma_3min_ago:
-                    print("2-3 min future trend: DOWN")
-                    notice_given = False
-                else:
-                    print("2-3 min future trend: FLAT")
-                    notice_given = False
-
-            # --- Logging and Display ---
-            # Win likelihood: track if previous prediction was correct
-            if len(prediction_results) > 0:
-                prev_prediction = predictions[-2]
-                prev_price = prices[-2]
-                # If previous prediction was UP and price increased, or DOWN and price decreased
-                if prev_prediction == 'UP' and price_binance > prev_price:
-                    prediction_results.append(1)
-                elif prev_prediction == 'DOWN' and price_binance < prev_price:
-                    prediction_results.append(1)
-                elif prev_prediction == 'FLAT' and abs(price_binance - prev_price) < 0.0001:
-                    prediction_results.append(1)
-                else:
-                    prediction_results.append(0)
-            # Calculate win likelihood as rolling average of last 20 predictions
-            if len(prediction_results) > 0:
-                win_likelihood = sum(prediction_results[-20:]) / min(20, len(prediction_results)) * 100
-            else:
-                win_likelihood = 0.0
-
-            # --- Pocket Options Simulation ---
-            if POCKET_OPTIONS_MODE:
-                # Simulate a trade on every buy-in signal
-                if len(predictions) > 1 and (predictions[-2] in ['DOWN', 'FLAT']) and (predictions[-1] == 'UP'):
-                    if po_trade_open is None:
-                        po_trade_open = (now, price_binance)
-                # Check if trade should close
-                if po_trade_open:
-                    buy_time, buy_price = po_trade_open
-                    if (now - buy_time).total_seconds() >= po_trade_duration:
-                        sell_time = now
-                        sell_price = price_binance
-                        result = 'WIN' if sell_price > buy_price else 'LOSS'
-                        po_trades.append((buy_time, buy_price, sell_time, sell_price, result))
-                        po_trade_open = None
-
-            # Update plot
-            ax.clear()
-            ax.plot(timestamps, prices, label=f'Binance {binance_symbol}')
-            ax.set_xlabel('Time')
-            ax.set_ylabel(f'{symbol} Price (USD)')
-            ax.set_title('Live Price & Prediction')
-            ax.legend()
-            # Draw up/down arrow
-            if len(prices) > 1:
-                if prediction == 'UP':
-                    ax.annotate('', xy=(timestamps[-1], prices[-1]+20), xytext=(timestamps[-1], prices[-1]-20),
-                                arrowprops=dict(facecolor='green', shrink=0.05, width=5, headwidth=15))
-                elif prediction == 'DOWN':
-                    ax.annotate('', xy=(timestamps[-1], prices[-1]-20), xytext=(timestamps[-1], prices[-1]+20),
-                                arrowprops=dict(facecolor='red', shrink=0.05, width=5, headwidth=15))
-            # Mark buy-in points
-            if buy_in_points:
-                buy_times, buy_prices = zip(*buy_in_points)
-                ax.scatter(buy_times, buy_prices, color='lime', s=80, marker='o', label='Buy-In Signal', zorder=5)
-                for t, p in buy_in_points:
-                    ax.annotate('BUY', xy=(t, p), xytext=(0, 10), textcoords='offset points', color='green', fontsize=9, fontweight='bold')
-            # Pocket Options trade markers
-            if POCKET_OPTIONS_MODE and po_trades:
-                for trade in po_trades:
-                    buy_time, buy_price, sell_time, sell_price, result = trade
-                    color = 'blue' if result == 'WIN' else 'red'
-                    ax.scatter([buy_time, sell_time], [buy_price, sell_price], color=color, s=60, marker='x', zorder=6)
-                    ax.annotate(result, xy=(sell_time, sell_price), xytext=(0, 15), textcoords='offset points', color=color, fontsize=9, fontweight='bold')
-            # Show overlays: confidence, win likelihood, profit/loss, PO stats
-            overlay_text = f'Conf: {confidence:.1f}%\nWin: {win_likelihood:.1f}%'
-            if buy_in_price:
-                overlay_text += f"\nProfit: ${profit:+.2f}"
-            if POCKET_OPTIONS_MODE:
-                wins = sum(1 for t in po_trades if t[-1] == 'WIN')
-                losses = sum(1 for t in po_trades if t[-1] == 'LOSS')
-                po_balance = 0
-                for t in po_trades:
-                    if t[-1] == 'WIN':
-                        po_balance += investment * po_profit_pct
-                    else:
-                        po_balance -= investment
-                overlay_text += f"\nPO Trades: {len(po_trades)} W:{wins} L:{losses}\nPO Balance: ${po_balance:.2f}"
-            ax.text(0.01, 0.97, overlay_text, transform=ax.transAxes, fontsize=10, verticalalignment='top', bbox=dict(facecolor='white', alpha=0.7, edgecolor='gray'))
-            plt.xticks(rotation=45, ha='right')
-            plt.tight_layout()
-
-            time.sleep(5)  # Wait before next update
+            with metrics.stage('tick'):
+                # --- Data Collection ---
+                with metrics.stage('fetch'):
+                    quote = fetcher.fetch(spec['binance'], coingecko_id, coingecko_vs)
+                process_quote(predictor, quote, sinks)
+        except Exception as e:
+            print(f"Error: {e}")
+            logging.error(f"Error: {e}")
+        metrics.maybe_write()
 
+def process_quote(predictor, quote, sinks):
+    # Both sources are fetched concurrently; a missing CoinGecko price is
+    # tolerated, but Binance drives the prediction so it is required.
+    for source, err in quote.errors.items():
+        print(f"Warning: {source} price unavailable: {err}")
+        logging.warning(f"{source} price unavailable: {err}")
+    if quote.binance is None:
+        raise Exception(f"Binance price unavailable: {quote.errors['binance']}")
+    return process_tick(predictor, Tick(time.time(), quote.binance, quote.coingecko), sinks)
+
+async def run_predictor_async(symbol, investment, sinks=None, signal=None):
+    """
+    run_predictor() as a task on a running asyncio event loop, e.g. inside
+    the Discord bot. Waiting and fetching never block the loop, and the
+    startup warm start and kline backfill run in a worker thread. There is
+    no prompt and no chart; add a crypto_engine.SignalSink to `sinks` to get
+    signal events.
+    """
+    global scheduler
+    spec = SYMBOLS[symbol]
+    coingecko_id, coingecko_vs = spec['coingecko']
+    predictor = make_predictor(symbol, investment, signal)
+    if sinks is None:
+        sinks = make_sinks(symbol)
+    logging.info('--- Async predictor started for symbol: %s ---', symbol)
+    await asyncio.get_running_loop().run_in_executor(None, start_predictor, predictor, sinks)
+    scheduler = TickScheduler(TICK_INTERVAL)
+    while True:
+        await next_tick_async()
+        try:
+            with metrics.stage('tick'):
+                with metrics.stage('fetch'):
+                    quote = await fetcher.fetch_async(spec['binance'], coingecko_id, coingecko_vs)
+                process_quote(predictor, quote, sinks)
         except Exception as e:
             print(f"Error: {e}")
             logging.error(f"Error: {e}")
-            time.sleep(5)  # Wait before retrying
+        metrics.maybe_write()
 
-plt.ioff()
-plt.show()
+def run_multi_predictor(symbols, investment=None, signal=None):
+    """
+    Track several symbols in one process. Every tick fetches all prices with
+    one batched Binance request and one multi-id CoinGecko request.
+    """
+    global scheduler
+    if investment is None:
+        investment = ask_investment()
+    specs = {sym: SYMBOLS[sym] for sym in symbols}
+    running = {}
+    for sym in symbols:
+        predictor = make_predictor(sym, investment, signal)
+        sym_sinks = make_sinks(sym, compact=True)
+        start_predictor(predictor, sym_sinks)
+        running[sym] = (predictor, sym_sinks)
+    logging.info('--- Script started for symbol: %s ---', ', '.join(symbols))
+    scheduler = TickScheduler(TICK_INTERVAL)
+    while True:
+        next_tick()
+        try:
+            with metrics.stage('tick'):
+                with metrics.stage('fetch'):
+                    quotes = fetcher.fetch_many(specs)
+                now = time.time()
+                print(f"\n--- {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))} ---")
+                for sym, quote in quotes.items():
+                    if quote.binance is None:
+                        print(f"{sym:<9} Binance price unavailable: {quote.errors.get('binance')}")
+                        logging.warning(f"{sym} Binance price unavailable: {quote.errors.get('binance')}")
+                        continue
+                    predictor, sym_sinks = running[sym]
+                    process_tick(predictor, Tick(now, quote.binance, quote.coingecko), sym_sinks)
+        except Exception as e:
+            print(f"Error: {e}")
+            logging.error(f"Error: {e}")
+        metrics.maybe_write()
+
+def run_stream_predictor(symbols, investment=None, interval=STREAM_INTERVAL, chart=True, feed=None, signal=None):
+    """
+    Track symbols from Binance's trade stream instead of polling REST. Trades
+    are coalesced into one tick per symbol every `interval` seconds, so
+    signals follow the market within about one interval. The stream carries
+    no CoinGecko price.
+    """
+    global stream
+    if investment is None:
+        investment = ask_investment()
+    compact = len(symbols) > 1
+    running = {}
+    for sym in symbols:
+        predictor = make_predictor(sym, investment, signal)
+        sym_sinks = make_sinks(sym, compact=compact, chart=chart and not compact, step=interval)
+        start_predictor(predictor, sym_sinks)
+        running[SYMBOLS[sym]['binance']] = (predictor, sym_sinks)
+    stream = feed or StreamFeed(list(running), interval=interval)
+    logging.info('--- Script started for symbol: %s ---', ', '.join(symbols))
+
+    def on_tick(binance_symbol, tick):
+        try:
+            with metrics.stage('tick'):
+                predictor, sym_sinks = running[binance_symbol]
+                process_tick(predictor, tick, sym_sinks)
+        except Exception as e:
+            print(f"Error: {e}")
+            logging.error(f"Error: {e}")
+        metrics.maybe_write()
+
+    stream.run(on_tick)
+
+def main():
+    global BACKFILL_ENABLED
+    parser = argparse.ArgumentParser(description="Live crypto price predictor.")
+    parser.add_argument('--stream', action='store_true', help="use Binance's trade stream instead of polling")
+    parser.add_argument('--signal', choices=list(SIGNALS), default=PREDICTION_SIGNAL,
+                        help="indicator driving the UP/DOWN prediction")
+    parser.add_argument('--no-metrics', action='store_true', help="disable per-stage timing and the metrics file")
+    parser.add_argument('--no-backfill', action='store_true', help="start without loading recent klines")
+    args = parser.parse_args()
+    metrics.enabled = not args.no_metrics
+    BACKFILL_ENABLED = not args.no_backfill
+    setup_logging()
+    symbols = select_symbols()
+    investment = ask_investment()
+    if args.stream:
+        run_stream_predictor(symbols, investment, signal=args.signal)
+    elif len(symbols) > 1:
+        run_multi_predictor(symbols, investment, signal=args.signal)
+    else:
+        run_predictor(symbols[0], investment, signal=args.signal)
 
 def auto_fix_error(e):
     error_str = str(e)
@@ -318,5 +379,4 @@ def auto_fix_error(e):
         print("[AI Auto-Fix] No automatic fix available. Please check the logs for details.")
 
 if __name__ == "__main__":
-    run_predictor()
- 
\ No newline at end of file
+    main()
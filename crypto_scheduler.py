@@ -0,0 +1,256 @@
+import asyncio
+import random
+import sys
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+# Per-source exponential backoff: first delay, growth factor and cap in seconds
+BACKOFF_BASE = 2.0
+BACKOFF_FACTOR = 2.0
+BACKOFF_CAP = 300.0
+BACKOFF_JITTER = 0.5  # each delay is scaled by a random factor in [1 - jitter, 1]
+# HTTP statuses that mean "slow down" rather than "broken"
+RATE_LIMIT_STATUSES = (418, 429)
+# Used-weight headers: source -> (header, limit per window, window seconds)
+WEIGHT_HEADERS = {
+    'binance': ('X-MBX-USED-WEIGHT-1M', 6000, 60),
+}
+WEIGHT_THRESHOLD = 0.9  # pause a source once it has used this share of its window
+LATENESS_SAMPLES = 1000
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - (time.time() if now is None else now))
+
+
+class TickScheduler:
+    """
+    Fixed-rate tick loop on a monotonic deadline grid.
+
+    Deadlines are start + k * interval, so time spent fetching and drawing
+    does not push later ticks back. wait() sleeps until the next deadline; if
+    the loop overran one or more deadlines they are skipped, counted as
+    missed and wait() returns how many were skipped. Lateness (how far after
+    its deadline a tick actually started) and work time (from tick start to
+    the next wait()) are kept for stats().
+    """
+
+    def __init__(self, interval=5.0, clock=None, sleep=None):
+        self.interval = interval
+        self._clock = clock or time.monotonic
+        self._sleep = sleep or time.sleep
+        self.start = self._clock()
+        self.next_deadline = self.start
+        self.tick_started = None
+        self.ticks = 0
+        self.missed = 0
+        self._lateness = deque(maxlen=LATENESS_SAMPLES)
+        self._work = deque(maxlen=LATENESS_SAMPLES)
+        self._max_lateness = 0.0
+
+    def _plan(self):
+        now = self._clock()
+        if self.tick_started is not None:
+            self._work.append(now - self.tick_started)
+        skipped = 0
+        if now > self.next_deadline + self.interval:
+            # Overran by whole periods: drop them rather than firing a burst
+            skipped = int((now - self.next_deadline) // self.interval)
+            self.next_deadline += skipped * self.interval
+            self.missed += skipped
+        return skipped, self.next_deadline - now
+
+    def _begin(self):
+        self.tick_started = self._clock()
+        lateness = max(0.0, self.tick_started - self.next_deadline)
+        self._lateness.append(lateness)
+        self._max_lateness = max(self._max_lateness, lateness)
+        self.ticks += 1
+        self.next_deadline += self.interval
+
+    def wait(self):
+        """Sleep until the next tick is due. Returns the number of deadlines skipped."""
+        skipped, delay = self._plan()
+        if delay > 0:
+            self._sleep(delay)
+        self._begin()
+        return skipped
+
+    async def wait_async(self):
+        """wait() for code running on an asyncio event loop."""
+        skipped, delay = self._plan()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._begin()
+        return skipped
+
+    def stats(self):
+        lateness = sorted(self._lateness)
+        work = list(self._work)
+        return {
+            'ticks': self.ticks,
+            'missed': self.missed,
+            'interval': self.interval,
+            'lateness_mean': sum(lateness) / len(lateness) if lateness else 0.0,
+            'lateness_p95': lateness[int(len(lateness) * 0.95)] if lateness else 0.0,
+            'lateness_max': self._max_lateness,
+            'work_mean': sum(work) / len(work) if work else 0.0,
+            'work_max': max(work) if work else 0.0,
+        }
+
+    def summary(self):
+        s = self.stats()
+        return (f"Ticks: {s['ticks']} missed: {s['missed']} | lateness mean {s['lateness_mean'] * 1000:.1f} ms "
+                f"p95 {s['lateness_p95'] * 1000:.1f} ms max {s['lateness_max'] * 1000:.1f} ms | "
+                f"work mean {s['work_mean'] * 1000:.1f} ms max {s['work_max'] * 1000:.1f} ms")
+
+
+class SourceBackoff:
+    """
+    Per-source exponential backoff with jitter, driven by failures and by
+    rate-limit headers. A source is skipped while ready() is False.
+    Thread-safe: fetch workers report into it concurrently.
+    """
+
+    def __init__(self, base=BACKOFF_BASE, factor=BACKOFF_FACTOR, cap=BACKOFF_CAP, jitter=BACKOFF_JITTER,
+                 clock=None, rng=None):
+        self.base = base
+        self.factor = factor
+        self.cap = cap
+        self.jitter = jitter
+        self._clock = clock or time.monotonic
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._failures = {}
+        self._until = {}
+        self.used_weight = {}
+
+    def ready(self, source):
+        return self.remaining(source) <= 0
+
+    def remaining(self, source):
+        """Seconds until `source` may be called again."""
+        return self._until.get(source, 0.0) - self._clock()
+
+    def _hold(self, source, seconds):
+        self._until[source] = max(self._until.get(source, 0.0), self._clock() + seconds)
+
+    def failure(self, source, retry_after=None):
+        """Record a failed call. Returns the delay applied."""
+        with self._lock:
+            count = self._failures.get(source, 0)
+            self._failures[source] = count + 1
+            delay = min(self.cap, self.base * self.factor ** count)
+            delay *= 1 - self.jitter * self._rng.random()
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            self._hold(source, delay)
+            return delay
+
+    def success(self, source):
+        with self._lock:
+            self._failures.pop(source, None)
+
+    def observe(self, source, status, headers):
+        """
+        Read rate-limit information from a response. A 418/429 holds the
+        source for at least its Retry-After; a used-weight header near the
+        limit holds it until the weight window rolls over. Returns True if
+        the response was a rate-limit rejection.
+        """
+        spec = WEIGHT_HEADERS.get(source)
+        if spec:
+            header, limit, window = spec
+            used = headers.get(header)
+            if used is not None:
+                try:
+                    used = int(used)
+                except ValueError:
+                    used = None
+            if used is not None:
+                self.used_weight[source] = used
+                if used >= limit * WEIGHT_THRESHOLD:
+                    with self._lock:
+                        self._hold(source, window - time.time() % window)
+        if status in RATE_LIMIT_STATUSES:
+            self.failure(source, parse_retry_after(headers.get('Retry-After')))
+            return True
+        return False
+
+    def status(self):
+        return {source: max(0.0, self.remaining(source)) for source in self._until if not self.ready(source)}
+
+
+def benchmark(ticks=100, interval=0.02):
+    """Tick spacing of a plain sleep(interval) loop against TickScheduler with the same simulated work."""
+    rng = random.Random(1)
+    work = [interval * rng.uniform(0.1, 0.6) for _ in range(ticks)]
+    work[ticks // 2] = interval * 3.5  # one stall longer than several periods
+
+    start = time.monotonic()
+    for w in work:
+        time.sleep(w)
+        time.sleep(interval)
+    naive = time.monotonic() - start
+
+    scheduler = TickScheduler(interval)
+    skipped = 0
+    for w in work:
+        skipped += scheduler.wait()
+        time.sleep(w)
+    scheduler.wait()
+    grid = time.monotonic() - scheduler.start
+
+    expected = ticks * interval
+    print(f"{ticks} ticks at {interval * 1000:.0f} ms, simulated work 10-60% of the period plus one 3.5x stall")
+    print(f"sleep(interval) loop: {naive:.3f} s elapsed, drift {(naive - expected) / expected * 100:+.1f}%")
+    print(f"TickScheduler:        {grid:.3f} s elapsed, {skipped} ticks skipped")
+    print(f"  {scheduler.summary()}")
+
+    backoff = SourceBackoff(rng=random.Random(1))
+    delays = [backoff.failure('binance') for _ in range(8)]
+    print("Backoff after consecutive failures: " + ", ".join(f"{d:.1f}s" for d in delays))
+
+    # A stub that answers the first two Binance requests with 429 + Retry-After
+    from crypto_feed import PriceFetcher, StubPriceServer
+
+    class RateLimitedStub(StubPriceServer):
+        def handle(self, path, query):
+            status, headers, body = super().handle(path, query)
+            if path == '/api/v3/ticker/price':
+                if self.requests['binance'] <= 2:
+                    return 429, {'Retry-After': '1'}, {'code': -1003, 'msg': 'Too many requests.'}
+                headers = dict(headers, **{'X-MBX-USED-WEIGHT-1M': self.requests['binance'] * 2})
+            return status, headers, body
+
+    with RateLimitedStub() as stub:
+        fetcher = PriceFetcher(stub.url, stub.url, backoff=SourceBackoff(base=0.5, rng=random.Random(1)))
+        scheduler = TickScheduler(0.25)
+        for _ in range(12):
+            scheduler.wait()
+            quote = fetcher.fetch('BTCUSDT', 'bitcoin', 'usd')
+            elapsed = scheduler.tick_started - scheduler.start
+            print(f"  t={elapsed:5.2f}s binance={quote.binance} {quote.errors.get('binance', '')}")
+        fetcher.close()
+    print(f"Binance requests sent: {stub.requests['binance']} over 12 ticks; "
+          f"used weight {fetcher.backoff.used_weight.get('binance')}")
+
+
+if __name__ == "__main__":
+    if '--bench' in sys.argv:
+        benchmark()
+    else:
+        print("Usage: python crypto_scheduler.py --bench")
@@ -0,0 +1,49 @@
+# Defaults shared by the live predictor and the backtester
+MA_WINDOW = 5
+WIN_LIKELIHOOD_WINDOW = 20
+PO_TRADE_DURATION = 60  # seconds (1 min trade)
+PO_PROFIT_PCT = 0.8  # 80% payout for win
+TREND_LOOKBACK = (180, 120)  # compare the MA 3 min ago with the MA 2 min ago
+FLAT_TOLERANCE = 0.0001
+# Relative MA difference treated as no change. Window sums come from running
+# totals, so identical windows can differ in the last few bits.
+TREND_TOLERANCE = 1e-9
+
+
+def predict_direction(prev_price, price):
+    """UP if price increased, DOWN if decreased, FLAT if no change."""
+    if price > prev_price:
+        return 'UP'
+    if price < prev_price:
+        return 'DOWN'
+    return 'FLAT'
+
+
+def prediction_confidence(prediction, p3, p2, p1):
+    """Percentage of the last move relative to the one before, in the predicted direction."""
+    if prediction == 'UP':
+        return (p1 - p2) / (p2 - p3) * 100 if (p2 - p3) != 0 else 0.0
+    if prediction == 'DOWN':
+        return (p3 - p2) / (p2 - p1) * 100 if (p2 - p1) != 0 else 0.0
+    return 0.0
+
+
+def is_reversal(prev_prediction, prediction):
+    """Perfect execution buy-in: the last prediction was DOWN or FLAT and now it's UP."""
+    return prev_prediction in ('DOWN', 'FLAT') and prediction == 'UP'
+
+
+def prediction_hit(prev_prediction, prev_price, price):
+    """Whether the previous prediction turned out right."""
+    if prev_prediction == 'UP':
+        return price > prev_price
+    if prev_prediction == 'DOWN':
+        return price < prev_price
+    return abs(price - prev_price) < FLAT_TOLERANCE
+
+
+def trend_direction(ma_recent, ma_older):
+    """UP, DOWN or FLAT comparing the MA 2 min ago with the MA 3 min ago."""
+    if abs(ma_recent - ma_older) <= TREND_TOLERANCE * abs(ma_older):
+        return 'FLAT'
+    return 'UP' if ma_recent > ma_older else 'DOWN'
@@ -0,0 +1,268 @@
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+SIGNAL_DB = 'crypto_signals.db'
+BATCH_SIZE = 500  # rows per write transaction at most
+FLUSH_INTERVAL = 0.5  # seconds the writer waits to fill a batch
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signals (
+    symbol TEXT NOT NULL, t REAL NOT NULL, prediction TEXT, price REAL, confidence REAL, reasons TEXT, text TEXT
+);
+CREATE INDEX IF NOT EXISTS signals_symbol_t ON signals (symbol, t);
+CREATE INDEX IF NOT EXISTS signals_t ON signals (t);
+CREATE TABLE IF NOT EXISTS buy_ins (
+    symbol TEXT NOT NULL, t REAL NOT NULL, price REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS buy_ins_symbol_t ON buy_ins (symbol, t);
+CREATE TABLE IF NOT EXISTS trades (
+    symbol TEXT NOT NULL, buy_t REAL, buy_price REAL, sell_t REAL NOT NULL, sell_price REAL, result TEXT,
+    profit REAL
+);
+-- Covering indexes: win rate and profit over a time range never touch the table
+CREATE INDEX IF NOT EXISTS trades_symbol_sell_t ON trades (symbol, sell_t, result, profit);
+CREATE INDEX IF NOT EXISTS trades_sell_t ON trades (sell_t, result, profit);
+"""
+
+INSERTS = {
+    'signals': "INSERT INTO signals VALUES (?, ?, ?, ?, ?, ?, ?)",
+    'buy_ins': "INSERT INTO buy_ins VALUES (?, ?, ?)",
+    'trades': "INSERT INTO trades VALUES (?, ?, ?, ?, ?, ?, ?)",
+}
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class SignalStore:
+    """
+    Indexed SQLite history of published signals, buy-ins and Pocket Options
+    trades, in WAL mode so reads never wait for the writer.
+
+    add_*() only put a row on a queue and never block on disk, so they are
+    safe on the event loop and in predictor sinks. One writer thread
+    drains the queue into batched transactions of up to BATCH_SIZE rows.
+    Query methods are ordinary blocking calls on per-thread connections;
+    run them in an executor from async code.
+    """
+
+    def __init__(self, path=SIGNAL_DB, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        conn = connect(path)
+        conn.executescript(SCHEMA)
+        conn.close()
+        self._queue = queue.SimpleQueue()
+        self._local = threading.local()
+        self.written = 0
+        self.batches = 0
+        self._writer = threading.Thread(target=self._write_loop, name='signal-store', daemon=True)
+        self._writer.start()
+
+    # --- Writes (non-blocking) ---
+
+    def add_signal(self, event):
+        """Record a crypto_engine.SignalEvent."""
+        self._queue.put(('signals', (event.symbol, event.t, event.prediction, event.price, event.confidence,
+                                     ','.join(event.reasons), event.text)))
+
+    def add_buy_in(self, symbol, t, price):
+        self._queue.put(('buy_ins', (symbol, t, price)))
+
+    def add_trade(self, symbol, buy_t, buy_price, sell_t, sell_price, result, profit):
+        self._queue.put(('trades', (symbol, buy_t, buy_price, sell_t, sell_price, result, profit)))
+
+    def add_many(self, table, rows):
+        """Queue many rows for one table in a single item, e.g. an import."""
+        self._queue.put((table, None, rows))
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far is on disk."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._writer.join()
+
+    def _write_loop(self):
+        conn = connect(self.path)
+        while True:
+            item = self._queue.get()
+            batch = []
+            rows = 0
+            waiters = []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is None:
+                    self._write(conn, batch)
+                    for done in waiters:
+                        done.set()
+                    conn.close()
+                    return
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                rows += len(item[2]) if len(item) == 3 else 1
+                if rows >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            self._write(conn, batch)
+            for done in waiters:
+                done.set()
+
+    def _write(self, conn, batch):
+        if not batch:
+            return
+        rows = {}
+        for item in batch:
+            if len(item) == 3:
+                rows.setdefault(item[0], []).extend(item[2])
+            else:
+                rows.setdefault(item[0], []).append(item[1])
+        try:
+            with conn:
+                for table, table_rows in rows.items():
+                    conn.executemany(INSERTS[table], table_rows)
+        except sqlite3.Error as e:
+            print(f"Signal store write failed: {e}")
+            return
+        self.written += sum(len(r) for r in rows.values())
+        self.batches += 1
+
+    # --- Queries (blocking) ---
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = connect(self.path)
+        return conn
+
+    def recent_signals(self, symbol=None, limit=10):
+        """Newest signals first, as (symbol, t, prediction, price, confidence, reasons, text)."""
+        if symbol:
+            sql = "SELECT * FROM signals WHERE symbol = ? ORDER BY t DESC LIMIT ?"
+            return self._conn().execute(sql, (symbol, limit)).fetchall()
+        return self._conn().execute("SELECT * FROM signals ORDER BY t DESC LIMIT ?", (limit,)).fetchall()
+
+    def recent_trades(self, symbol=None, limit=10):
+        """Newest closed trades first, as (symbol, buy_t, buy_price, sell_t, sell_price, result, profit)."""
+        if symbol:
+            sql = "SELECT * FROM trades WHERE symbol = ? ORDER BY sell_t DESC LIMIT ?"
+            return self._conn().execute(sql, (symbol, limit)).fetchall()
+        return self._conn().execute("SELECT * FROM trades ORDER BY sell_t DESC LIMIT ?", (limit,)).fetchall()
+
+    def trade_stats(self, symbol=None, since=None, until=None):
+        """Trades, wins, win rate (%) and total profit for trades closed in [since, until]."""
+        where = ["sell_t >= ?", "sell_t <= ?"]
+        args = [since if since is not None else float('-inf'), until if until is not None else float('inf')]
+        if symbol:
+            where.insert(0, "symbol = ?")
+            args.insert(0, symbol)
+        sql = (f"SELECT count(*), coalesce(sum(result = 'WIN'), 0), coalesce(sum(profit), 0.0) FROM trades "
+               f"WHERE {' AND '.join(where)}")
+        trades, wins, profit = self._conn().execute(sql, args).fetchone()
+        return {
+            'trades': trades,
+            'wins': wins,
+            'losses': trades - wins,
+            'win_rate': wins / trades * 100 if trades else 0.0,
+            'profit': profit,
+        }
+
+    def counts(self):
+        conn = self._conn()
+        return {table: conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0] for table in INSERTS}
+
+
+def benchmark(signals=2_000_000, trades=1_000_000, path='crypto_signals_bench.db'):
+    """Query latency on a store with millions of rows, and the cost of a non-blocking insert."""
+    import random
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    rng = random.Random(1)
+    symbols = ['BTCUSDT', 'ETHUSDT', 'LTCUSDT', 'BNBUSDT', 'XRPUSDT', 'DOGEUSDT', 'ADAUSDT', 'SOLUSDT']
+    now = time.time()
+    span = 365 * 86400
+    store = SignalStore(path)
+    start = time.perf_counter()
+    chunk = 100_000
+    for lo in range(0, signals, chunk):
+        store.add_many('signals', [(rng.choice(symbols), now - span + (lo + i) * span / signals,
+                                    rng.choice(['UP', 'DOWN']), 50000.0, 50.0, 'direction', 'signal')
+                                   for i in range(min(chunk, signals - lo))])
+    for lo in range(0, trades, chunk):
+        rows = []
+        for i in range(min(chunk, trades - lo)):
+            t = now - span + (lo + i) * span / trades
+            win = rng.random() < 0.55
+            rows.append((rng.choice(symbols), t - 60, 50000.0, t, 50010.0, 'WIN' if win else 'LOSS',
+                         80.0 if win else -100.0))
+        store.add_many('trades', rows)
+    store.flush()
+    load = time.perf_counter() - start
+
+    def timed(fn, *args, repeat=20):
+        fn(*args)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = fn(*args)
+        return (time.perf_counter() - start) / repeat * 1000, result
+
+    print(f"Loaded {signals} signals and {trades} trades over one year in {load:.1f} s "
+          f"({store.batches} transactions)")
+    ms, _ = timed(store.recent_signals, 'BTCUSDT', 10)
+    print(f"last 10 BTCUSDT signals:         {ms:7.3f} ms")
+    ms, _ = timed(store.recent_signals, None, 10)
+    print(f"last 10 signals, all symbols:    {ms:7.3f} ms")
+    ms, s = timed(store.trade_stats, 'BTCUSDT', now - 86400, now)
+    print(f"BTCUSDT win rate, last 24 h:     {ms:7.3f} ms  ({s['trades']} trades, {s['win_rate']:.1f}%)")
+    ms, s = timed(store.trade_stats, 'BTCUSDT', now - 30 * 86400, now)
+    print(f"BTCUSDT win rate, last 30 days:  {ms:7.3f} ms  ({s['trades']} trades, {s['win_rate']:.1f}%)")
+    ms, s = timed(store.trade_stats, None, now - 30 * 86400, now, repeat=5)
+    print(f"all symbols win rate, 30 days:   {ms:7.3f} ms  ({s['trades']} trades, {s['win_rate']:.1f}%)")
+    plan = store._conn().execute("EXPLAIN QUERY PLAN SELECT count(*) FROM trades WHERE symbol = ? AND sell_t >= ? "
+                                 "AND sell_t <= ?", ('BTCUSDT', 0, now)).fetchall()
+    print(f"plan: {plan[0][-1]}")
+
+    from crypto_engine import SignalEvent
+    event = SignalEvent('BTCUSDT', now, ('direction',), 'UP', 50000.0, 50.0, None, 'BTCUSDT: UP')
+    n = 100_000
+    start = time.perf_counter()
+    for _ in range(n):
+        store.add_signal(event)
+    enqueue = (time.perf_counter() - start) / n * 1e6
+    start = time.perf_counter()
+    store.flush()
+    print(f"add_signal: {enqueue:.2f} us per call on the caller's thread; "
+          f"{n} rows written in {time.perf_counter() - start:.2f} s more")
+    store.close()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    if '--bench' in sys.argv:
+        benchmark()
+    else:
+        print("Usage: python crypto_signalstore.py --bench")
@@ -0,0 +1,352 @@
+import argparse
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+from crypto_engine import Tick
+from crypto_scheduler import SourceBackoff
+from crypto_tickstore import TICK_DIR, TickView, tick_path
+
+BINANCE_WS_URL = "wss://stream.binance.com:9443"
+STREAM_INTERVAL = 1.0  # seconds of trades coalesced into one tick
+# Reconnect backoff: first delay and cap in seconds
+RECONNECT_BASE = 1.0
+RECONNECT_CAP = 60.0
+
+
+class StreamFeed:
+    """
+    Streaming price feed from Binance's combined trade stream.
+
+    Trades arrive as fast as the exchange publishes them; a burst for one
+    symbol is coalesced into its latest price and every `interval` seconds
+    (on a fixed grid) each symbol that traded yields one Tick, stamped with
+    its last trade time. Dropped connections are reopened with exponential
+    backoff and jitter. run(on_tick) blocks and calls on_tick(symbol, tick)
+    from the event loop thread.
+    """
+
+    def __init__(self, symbols, url=BINANCE_WS_URL, stream='aggTrade', interval=STREAM_INTERVAL, backoff=None):
+        self.symbols = [s.upper() for s in symbols]
+        self.url = url.rstrip('/')
+        self.stream = stream
+        self.interval = interval
+        self.backoff = backoff or SourceBackoff(base=RECONNECT_BASE, cap=RECONNECT_CAP)
+        self._pending = {}  # symbol -> (trade time, price, event time)
+        self._last_t = {}
+        self._loop = None
+        self._stop = None
+        self.connected = False
+        self.messages = 0
+        self.coalesced = 0
+        self.stale = 0
+        self.malformed = 0
+        self.ticks = 0
+        self.reconnects = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+
+    def stream_url(self):
+        names = '/'.join(f"{s.lower()}@{self.stream}" for s in self.symbols)
+        return f"{self.url}/stream?streams={names}"
+
+    def handle_message(self, raw):
+        """Fold one stream message (aggTrade, trade or ticker payload) into the pending prices."""
+        msg = json.loads(raw)
+        data = msg.get('data', msg)
+        symbol = data.get('s')
+        price = data.get('p', data.get('c'))
+        if symbol is None or price is None:
+            return
+        price = float(price)
+        event = data.get('E', 0) / 1000
+        t = data.get('T', data.get('E', 0)) / 1000
+        # A reconnect can replay trades that were already emitted
+        if t < self._last_t.get(symbol, 0.0):
+            self.stale += 1
+            return
+        self.messages += 1
+        if symbol in self._pending:
+            self.coalesced += 1
+        self._pending[symbol] = (t, price, event)
+
+    def flush(self):
+        """Ticks for every symbol that traded since the last flush, as (symbol, Tick)."""
+        pending, self._pending = self._pending, {}
+        now = time.time()
+        ticks = []
+        for symbol, (t, price, event) in pending.items():
+            self._last_t[symbol] = t
+            if event:
+                lag = now - event
+                self.lag_total += lag
+                self.lag_max = max(self.lag_max, lag)
+            ticks.append((symbol, Tick(t, price)))
+        self.ticks += len(ticks)
+        return ticks
+
+    async def _read(self):
+        import websockets
+        url = self.stream_url()
+        while not self._stop.is_set():
+            try:
+                async with websockets.connect(url, open_timeout=10, ping_interval=20) as ws:
+                    self.connected = True
+                    logging.info(f"Stream connected: {url}")
+                    async for raw in ws:
+                        try:
+                            self.handle_message(raw)
+                        except (ValueError, TypeError, AttributeError) as e:
+                            # A bad frame or price is skipped; it must not end the reader
+                            self.malformed += 1
+                            logging.warning(f"Stream message skipped ({type(e).__name__}: {e}): {str(raw)[:200]}")
+                            continue
+                        self.backoff.success('stream')
+                reason = "closed by server"
+            except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+                reason = str(e) or type(e).__name__
+            self.connected = False
+            if self._stop.is_set():
+                break
+            delay = self.backoff.failure('stream')
+            self.reconnects += 1
+            print(f"Stream disconnected ({reason}), reconnecting in {delay:.1f}s")
+            logging.warning(f"Stream disconnected ({reason}), reconnecting in {delay:.1f}s")
+            try:
+                await asyncio.wait_for(self._stop.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _emit(self, on_tick):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while not self._stop.is_set():
+            deadline += self.interval
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
+            for symbol, tick in self.flush():
+                on_tick(symbol, tick)
+
+    async def _run(self, on_tick, duration):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        if duration is not None:
+            self._loop.call_later(duration, self._stop.set)
+        reader = asyncio.ensure_future(self._read())
+        emitter = asyncio.ensure_future(self._emit(on_tick))
+        await self._stop.wait()
+        for task in (reader, emitter):
+            task.cancel()
+        await asyncio.gather(reader, emitter, return_exceptions=True)
+        for symbol, tick in self.flush():
+            on_tick(symbol, tick)
+
+    def run(self, on_tick, duration=None):
+        """Stream until stop() is called (or `duration` seconds pass), calling on_tick(symbol, tick)."""
+        asyncio.run(self._run(on_tick, duration))
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    def stats(self):
+        return {
+            'messages': self.messages,
+            'ticks': self.ticks,
+            'coalesced': self.coalesced,
+            'stale': self.stale,
+            'malformed': self.malformed,
+            'reconnects': self.reconnects,
+            'lag_mean': self.lag_total / self.ticks if self.ticks else 0.0,
+            'lag_max': self.lag_max,
+        }
+
+
+# --- Local stand-in server for testing and benchmarks ---
+
+def load_recorded(symbols, directory=TICK_DIR):
+    """Recorded (t, symbol, price) ticks of several symbols from their tick files, merged by time."""
+    ticks = []
+    for symbol in symbols:
+        with TickView(tick_path(symbol, directory)) as view:
+            ticks.extend((t, symbol, binance) for t, binance, _ in view.rows())
+    ticks.sort()
+    return ticks
+
+
+class StubStreamServer:
+    """
+    Minimal local stand-in for Binance's combined stream endpoint. Replays
+    recorded (t, symbol, price) ticks as aggTrade messages, `speed` times
+    faster than they were recorded, to the symbols a client subscribed to.
+    With `drop_every`, each connection is closed after that many messages;
+    the replay resumes where it stopped on the next connection. Use as a
+    context manager; `url` is the base URL to pass to StreamFeed.
+    """
+
+    def __init__(self, ticks, speed=1.0, drop_every=None):
+        self.ticks = ticks
+        self.speed = speed
+        self.drop_every = drop_every
+        self.connections = 0
+        self.sent = 0
+        self._cursor = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self.port = None
+
+    @property
+    def url(self):
+        return f"ws://127.0.0.1:{self.port}"
+
+    @property
+    def finished(self):
+        return self._cursor >= len(self.ticks)
+
+    async def _handler(self, ws, path=None):
+        self.connections += 1
+        request = getattr(ws, 'request', None)
+        path = request.path if request is not None else path
+        streams = parse_qs(urlparse(path).query).get('streams', [''])[0].split('/')
+        subscribed = {name.split('@')[0].upper() for name in streams if name}
+        sent_here = 0
+        prev_t = None
+        while self._cursor < len(self.ticks):
+            t, symbol, price = self.ticks[self._cursor]
+            if prev_t is not None and t > prev_t:
+                await asyncio.sleep((t - prev_t) / self.speed)
+            prev_t = t
+            self._cursor += 1
+            if symbol not in subscribed:
+                continue
+            await ws.send(json.dumps({
+                'stream': f"{symbol.lower()}@aggTrade",
+                'data': {'e': 'aggTrade', 'E': int(time.time() * 1000), 's': symbol, 'p': f"{price:.8f}",
+                         'q': '0.001', 'T': int(t * 1000)},
+            }))
+            self.sent += 1
+            sent_here += 1
+            if self.drop_every and sent_here >= self.drop_every:
+                await ws.close()
+                return
+        await ws.wait_closed()
+
+    def start(self):
+        import websockets
+        ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        async def listen():
+            return await websockets.serve(self._handler, '127.0.0.1', 0)
+
+        def serve():
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(listen())
+            self.port = next(iter(self._server.sockets)).getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        async def close():
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(close(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def synthetic_trades(symbols, seconds=60, rate=20, seed=1):
+    """Random-walk trades for each symbol at about `rate` trades per second, arriving in bursts."""
+    rng = random.Random(seed)
+    t0 = time.time() - seconds
+    trades = []
+    for symbol in symbols:
+        price = 100.0
+        t = t0
+        while t < t0 + seconds:
+            t += rng.expovariate(rate / 4)
+            for i in range(rng.randint(1, 7)):  # a burst of fills within a few ms
+                price *= 1 + rng.gauss(0, 0.0002)
+                trades.append((t + i * 0.001, symbol, price))
+    trades.sort()
+    return trades
+
+
+def benchmark(seconds=60, speed=20.0, interval=0.05, poll_interval=5.0):
+    """Replay synthetic trade bursts through the stand-in server with forced reconnects."""
+    symbols = ['BTCUSDT', 'ETHUSDT']
+    trades = synthetic_trades(symbols, seconds)
+    received = {}
+
+    def on_tick(symbol, tick):
+        received[symbol] = received.get(symbol, 0) + 1
+
+    with StubStreamServer(trades, speed=speed, drop_every=len(trades) // 3 + 1) as stub:
+        feed = StreamFeed(symbols, url=stub.url, interval=interval,
+                          backoff=SourceBackoff(base=0.05, cap=0.5, rng=random.Random(1)))
+        start = time.perf_counter()
+
+        def watch():
+            while not stub.finished:
+                time.sleep(0.05)
+            time.sleep(interval * 4)
+            feed.stop()
+
+        threading.Thread(target=watch, daemon=True).start()
+        feed.run(on_tick, duration=seconds / speed * 3 + 5)
+        elapsed = time.perf_counter() - start
+
+    s = feed.stats()
+    print(f"Replayed {len(trades)} trades ({seconds} s recorded) in {elapsed:.2f} s at {speed:.0f}x, "
+          f"{stub.connections} connections")
+    print(f"Messages received: {s['messages']} of {stub.sent} sent, {s['reconnects']} reconnects")
+    print(f"Ticks emitted: {s['ticks']} ({s['coalesced']} trades coalesced, interval {interval * 1000:.0f} ms)")
+    print(f"Trade-to-tick lag: mean {s['lag_mean'] * 1000:.1f} ms, max {s['lag_max'] * 1000:.1f} ms")
+    print(f"REST polling every {poll_interval:.0f} s: mean lag about {poll_interval / 2 * 1000:.0f} ms "
+          f"plus request time")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Binance trade stream feed for crypto_predictor.")
+    parser.add_argument('--replay', nargs='+', metavar='SYMBOL', help="replay recorded tick files over a local stream")
+    parser.add_argument('--dir', default=TICK_DIR, help="tick file directory")
+    parser.add_argument('--speed', type=float, default=60.0, help="replay speed-up")
+    parser.add_argument('--interval', type=float, default=STREAM_INTERVAL, help="aggregation interval (seconds)")
+    parser.add_argument('--bench', action='store_true', help="replay synthetic trade bursts with reconnects")
+    args = parser.parse_args()
+    if args.bench:
+        benchmark()
+    elif args.replay:
+        ticks = load_recorded(args.replay, args.dir)
+        with StubStreamServer(ticks, speed=args.speed) as stub:
+            feed = StreamFeed(args.replay, url=stub.url, interval=args.interval)
+
+            def on_tick(symbol, tick):
+                print(f"{symbol:<9} {tick.t:.3f} {tick.binance:.2f}")
+                if stub.finished:
+                    feed.stop()
+
+            feed.run(on_tick)
+        print(feed.stats())
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+import argparse
+import datetime
+import mmap
+import os
+import re
+import struct
+import time
+
+# File layout: a 16-byte header, then fixed-width little-endian records of
+# (timestamp, Binance price, CoinGecko price) as float64. A missing
+# CoinGecko price is stored as NaN.
+HEADER = struct.Struct('<8sII')
+MAGIC = b'CPTICKS\x00'
+VERSION = 1
+RECORD = struct.Struct('<ddd')
+FIELDS = ('t', 'binance', 'coingecko')
+TICK_DIR = 'ticks'
+NAN = float('nan')
+
+# "<asctime> | INFO | <ts> | [SYMBOL | ]Binance: <price> | CoinGecko: <price or n/a>"
+LOG_PRICE_RE = re.compile(
+    r"\| (\d{4}-\d\d-\d\d \d\d:\d\d:\d\d) \| (?:([A-Z0-9]+) \| )?Binance: ([-\d.]+) \| CoinGecko: ([-\d.]+|n/a)")
+LOG_START_RE = re.compile(r"--- Script started for symbol: (.*) ---")
+LOG_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def tick_path(symbol, directory=TICK_DIR):
+    return os.path.join(directory, f"{symbol}.ticks")
+
+
+def iter_log_ticks(path):
+    """
+    Yield (symbol, timestamp, binance, coingecko) from a crypto_predictor.log.
+    Untagged single-symbol lines belong to the symbol named by the latest
+    "Script started" line. A missing CoinGecko price is NaN.
+    """
+    current = None
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            start = LOG_START_RE.search(line)
+            if start:
+                names = [name.strip() for name in start.group(1).split(',')]
+                current = names[0] if len(names) == 1 else None
+                continue
+            match = LOG_PRICE_RE.search(line)
+            if not match:
+                continue
+            stamp, tagged, binance, coingecko = match.groups()
+            t = datetime.datetime.strptime(stamp, LOG_TIME_FORMAT).timestamp()
+            yield tagged or current, t, float(binance), NAN if coingecko == 'n/a' else float(coingecko)
+
+
+class TickStore:
+    """
+    Append-only binary tick file for one symbol.
+
+    Appends are buffered and written every `flush_every` records (1 means
+    every tick reaches the OS before append returns). A record torn by a
+    crash is dropped the next time the file is opened. Reads go through
+    view(), which memory-maps the file.
+    """
+
+    def __init__(self, path, flush_every=1):
+        self.path = path
+        self.flush_every = flush_every
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a+b')
+        self._file.seek(0, os.SEEK_END)
+        size = self._file.tell()
+        if size == 0:
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+            self._file.flush()
+        else:
+            _check_header(self._file, path)
+            torn = (size - HEADER.size) % RECORD.size
+            if torn:
+                self._file.truncate(size - torn)
+        self._file.seek(0, os.SEEK_END)
+        self._count = (self._file.tell() - HEADER.size) // RECORD.size
+        self._pending = []
+
+    def __len__(self):
+        return self._count + len(self._pending)
+
+    def append(self, t, binance, coingecko=None):
+        self._pending.append(RECORD.pack(t, binance, NAN if coingecko is None else coingecko))
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self._pending.append(RECORD.pack(*row))
+        self.flush()
+
+    def flush(self):
+        if self._pending:
+            self._file.write(b''.join(self._pending))
+            self._file.flush()
+            self._count += len(self._pending)
+            self._pending = []
+
+    def view(self):
+        """Memory-mapped, zero-copy view of everything flushed so far."""
+        self.flush()
+        return TickView(self.path)
+
+    def tail(self, n):
+        with self.view() as ticks:
+            return ticks.rows(max(0, len(ticks) - n))
+
+    def read_since(self, t):
+        with self.view() as ticks:
+            return ticks.rows(ticks.index_at(t))
+
+    def last_time(self):
+        """Timestamp of the newest record, or None for an empty file."""
+        if self._pending:
+            return RECORD.unpack(self._pending[-1])[0]
+        if not self._count:
+            return None
+        return self.tail(1)[0][0]
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TickView:
+    """Read-only memory map of a tick file. Records are sorted by timestamp when written by one predictor."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            _check_header(f, path)
+            size = os.fstat(f.fileno()).st_size
+            self._count = (size - HEADER.size) // RECORD.size
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self._count else None
+        if self._mmap is not None:
+            end = HEADER.size + self._count * RECORD.size
+            self._doubles = memoryview(self._mmap)[HEADER.size:end].cast('d')
+        else:
+            self._doubles = memoryview(b'').cast('d')
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("tick index out of range")
+        base = i * 3
+        return self._doubles[base], self._doubles[base + 1], self._doubles[base + 2]
+
+    @property
+    def timestamps(self):
+        return self._doubles[0::3]
+
+    def index_at(self, t):
+        """Index of the first record at or after time `t`."""
+        lo, hi = 0, self._count
+        doubles = self._doubles
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if doubles[mid * 3] < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def rows(self, start=0, stop=None):
+        stop = self._count if stop is None else min(stop, self._count)
+        flat = self._doubles[start * 3:stop * 3].tolist()
+        return list(zip(flat[0::3], flat[1::3], flat[2::3]))
+
+    def as_array(self):
+        """Zero-copy NumPy structured array with fields t, binance and coingecko."""
+        import numpy as np
+        dtype = np.dtype([(name, '<f8') for name in FIELDS])
+        if self._mmap is None:
+            return np.zeros(0, dtype=dtype)
+        return np.frombuffer(self._mmap, dtype=dtype, count=self._count, offset=HEADER.size)
+
+    def close(self):
+        self._doubles.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # an as_array() result still references the map; it closes with it
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _check_header(f, path):
+    f.seek(0)
+    raw = f.read(HEADER.size)
+    if len(raw) < HEADER.size:
+        raise ValueError(f"{path}: truncated tick file header")
+    magic, version, record_size = HEADER.unpack(raw)
+    if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+        raise ValueError(f"{path}: not a version {VERSION} tick file")
+
+
+def convert_log(log_path, directory=TICK_DIR, symbols=None):
+    """
+    Append the price lines of a crypto_predictor.log to per-symbol tick
+    files. Only lines newer than a file's last record are added, so
+    converting the same log twice, or a log older than the store, keeps the
+    files sorted. Returns the ticks added per symbol.
+    """
+    stores = {}
+    last = {}  # symbol -> newest timestamp in its file
+    counts = {}
+    try:
+        for symbol, t, binance, coingecko in iter_log_ticks(log_path):
+            if symbol is None or (symbols and symbol not in symbols):
+                continue
+            store = stores.get(symbol)
+            if store is None:
+                store = stores[symbol] = TickStore(tick_path(symbol, directory), flush_every=4096)
+                last[symbol] = store.last_time()
+                counts[symbol] = 0
+            if last[symbol] is not None and t <= last[symbol]:
+                continue
+            store.append(t, binance, coingecko)
+            last[symbol] = t
+            counts[symbol] += 1
+    finally:
+        for store in stores.values():
+            store.close()
+    return counts
+
+
+def benchmark(n=1_000_000, directory=None):
+    """Append and scan throughput on a temporary tick file."""
+    import tempfile
+    directory = directory or tempfile.mkdtemp(prefix='ticks_')
+    rows = [(1_700_000_000.0 + i * 5, 50000.0 + (i % 100), 50001.0) for i in range(n)]
+
+    for flush_every in (1, 4096):
+        path = os.path.join(directory, f"bench_{flush_every}.ticks")
+        if os.path.exists(path):
+            os.remove(path)
+        count = n if flush_every > 1 else min(n, 200_000)
+        with TickStore(path, flush_every=flush_every) as store:
+            start = time.perf_counter()
+            for t, b, c in rows[:count]:
+                store.append(t, b, c)
+            store.flush()
+            elapsed = time.perf_counter() - start
+        print(f"append (flush every {flush_every}): {count / elapsed:,.0f} ticks/s")
+
+    with TickStore(path) as store:
+        with store.view() as ticks:
+            start = time.perf_counter()
+            tail = ticks.rows(ticks.index_at(rows[-1][0] - 6 * 3600))
+            warm = time.perf_counter() - start
+            start = time.perf_counter()
+            total = sum(ticks.timestamps)
+            scan_py = time.perf_counter() - start
+            try:
+                array = ticks.as_array()
+                start = time.perf_counter()
+                total = float(array['binance'].sum())
+                scan_np = time.perf_counter() - start
+                del array
+            except ImportError:
+                scan_np = None
+    size_mb = os.path.getsize(path) / 1e6
+    print(f"warm read of last 6 h ({len(tail)} ticks): {warm * 1000:.2f} ms")
+    print(f"scan timestamps via memoryview: {n / scan_py:,.0f} ticks/s")
+    if scan_np is not None:
+        print(f"scan prices via numpy memmap:  {n / scan_np:,.0f} ticks/s ({size_mb:.1f} MB file)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Binary tick files for crypto_predictor.")
+    parser.add_argument('--convert', metavar='LOG', help="convert a crypto_predictor.log into tick files")
+    parser.add_argument('--dir', default=TICK_DIR, help="tick file directory")
+    parser.add_argument('--show', metavar='SYMBOL', help="print the last ticks stored for a symbol")
+    parser.add_argument('--bench', action='store_true', help="measure append and scan throughput")
+    args = parser.parse_args()
+    if args.convert:
+        for symbol, count in convert_log(args.convert, args.dir).items():
+            print(f"{symbol}: {count} ticks -> {tick_path(symbol, args.dir)}")
+    elif args.show:
+        with TickView(tick_path(args.show, args.dir)) as ticks:
+            print(f"{len(ticks)} ticks")
+            for t, binance, coingecko in ticks.rows(max(0, len(ticks) - 10)):
+                stamp = datetime.datetime.fromtimestamp(t).strftime(LOG_TIME_FORMAT)
+                print(f"{stamp} | Binance: {binance:.2f} | CoinGecko: {coingecko:.2f}")
+    elif args.bench:
+        benchmark()
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from crypto_engine import SIGNAL_MIN_INTERVAL, Predictor, SignalSink, Sink, Tick
+from crypto_metrics import Histogram
+from crypto_shm import RING_CAPACITY, SIGNAL, TICK, SignalRing
+
+POLL_INTERVAL = 0.01  # seconds between ring reads on the bot's event loop
+STARTUP_TIMEOUT = 180.0  # seconds a new worker gets for its warm start and backfill before the first heartbeat
+HEARTBEAT_TIMEOUT = 30.0  # seconds without a heartbeat before a running worker is restarted
+RESTART_DELAY = 1.0  # first wait before a restart, doubled after each crash
+RESTART_DELAY_MAX = 60.0
+STABLE_AFTER = 300.0  # seconds a worker must have run for the restart delay to reset
+
+
+class RingSink(Sink):
+    """Writes every tick's SignalSnapshot to a crypto_shm.SignalRing."""
+
+    def __init__(self, ring):
+        self.ring = ring
+
+    def on_tick(self, predictor, result):
+        self.ring.put_snapshot(predictor.snapshot)
+
+
+def predictor_worker(ring_name, symbol, investment, min_interval=SIGNAL_MIN_INTERVAL, signal=None):
+    """
+    Worker process entry point: crypto_predictor's polling loop for `symbol`
+    with its usual tick file, backfill, console, log and signal history
+    sinks, publishing ticks and signal events into the ring `ring_name`.
+    """
+    import crypto_predictor
+    crypto_predictor.setup_logging()
+    ring = SignalRing(ring_name)
+    pid = os.getpid()
+    sinks = crypto_predictor.make_sinks(symbol) + [RingSink(ring), SignalSink(ring.put_event, min_interval)]
+    crypto_predictor.run_predictor(symbol, investment, chart=False, sinks=sinks, signal=signal,
+                                   heartbeat=lambda: ring.beat(pid))
+
+
+class WorkerProcess:
+    """
+    Runs `target(ring_name, *args)` in a child process and supervises it, so
+    the predictor's CPU work never competes for the bot's GIL.
+
+    The worker writes ticks and signal events into a shared SignalRing and
+    beats a heartbeat in the ring's header once per tick. run() polls the
+    ring on the event loop every `poll_interval`, hands signal events to
+    `publish` and keeps the latest tick's SignalSnapshot for commands. A worker that
+    exits, or stops beating for `heartbeat_timeout` seconds
+    (`startup_timeout` before its first beat), is killed and started again
+    after a delay that doubles with every crash and resets once a worker
+    has stayed up for STABLE_AFTER seconds.
+    """
+
+    def __init__(self, target, args=(), capacity=RING_CAPACITY, poll_interval=POLL_INTERVAL,
+                 heartbeat_timeout=HEARTBEAT_TIMEOUT, startup_timeout=STARTUP_TIMEOUT):
+        self.target = target
+        self.args = args
+        self.capacity = capacity
+        self.poll_interval = poll_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.startup_timeout = startup_timeout
+        # spawn, not fork: the bot has threads and an event loop that must not be copied
+        self.context = multiprocessing.get_context('spawn')
+        self.ring = None
+        self.process = None
+        self.started = None
+        self.delay = RESTART_DELAY
+        self.latest = None  # SignalSnapshot of the newest tick
+        self.restarts = 0
+        self.events = 0
+        self.latency = Histogram()  # worker publish to bot read, per signal event
+
+    def start(self):
+        if self.ring is None:
+            self.ring = SignalRing(capacity=self.capacity)
+        self.process = self.context.Process(target=self.target, args=(self.ring.name,) + tuple(self.args),
+                                            name='predictor-worker', daemon=True)
+        self.process.start()
+        self.started = time.time()
+        logging.info(f"Predictor worker started, pid {self.process.pid}")
+        return self
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join(5)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+            self.process = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def poll(self):
+        """Signal events written since the last poll; also updates `latest`."""
+        now = time.time()
+        events = []
+        for kind, sent, value in self.ring.read():
+            if kind == TICK:
+                self.latest = value
+            elif kind == SIGNAL:
+                self.latency.record(max(now - sent, 0.0))
+                events.append(value)
+        self.events += len(events)
+        return events
+
+    def check(self):
+        """Why the worker needs a restart, or None while it is healthy."""
+        if not self.process.is_alive():
+            return f"exited with code {self.process.exitcode}"
+        beat, _ = self.ring.heartbeat()
+        now = time.time()
+        if beat >= self.started:
+            if now - beat > self.heartbeat_timeout:
+                return f"no heartbeat for {now - beat:.0f} s"
+        elif now - self.started > self.startup_timeout:
+            return f"no heartbeat {now - self.started:.0f} s after start"
+        return None
+
+    async def restart(self, reason):
+        print(f"Predictor worker {reason}; restarting in {self.delay:.0f} s")
+        logging.warning(f"Predictor worker {reason}; restarting in {self.delay:.0f} s")
+        if time.time() - self.started >= STABLE_AFTER:
+            self.delay = RESTART_DELAY
+        self.process.kill()
+        self.process.join()
+        await asyncio.sleep(self.delay)
+        self.delay = min(self.delay * 2, RESTART_DELAY_MAX)
+        self.restarts += 1
+        self.start()
+
+    async def run(self, publish):
+        """Start the worker and supervise it until cancelled, calling publish(event) for each signal event."""
+        if self.process is None:
+            self.start()
+        try:
+            while True:
+                for event in self.poll():
+                    publish(event)
+                reason = self.check()
+                if reason:
+                    await self.restart(reason)
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            self.stop()
+
+    def signal_text(self):
+        return self.latest.text if self.latest else "No signal yet."
+
+    def stats(self):
+        return {
+            'pid': self.process.pid if self.process else None,
+            'restarts': self.restarts,
+            'events': self.events,
+            'dropped': self.ring.dropped if self.ring else 0,
+            'latency': self.latency.summary(),
+        }
+
+
+# --- Benchmark ---
+
+def _predictor_load(publish, seconds, heartbeat=None, publish_every=0.01):
+    """
+    Predictor-like CPU load: steps a Predictor over a synthetic random walk
+    as fast as it can for `seconds`, publishing a SignalEvent at most every
+    `publish_every` seconds of wall time.
+    """
+    rng = random.Random(1)
+    predictor = Predictor('BTCUSDT')
+    state = {'last': 0.0}
+
+    def throttled(event):
+        now = time.time()
+        if now - state['last'] >= publish_every:
+            state['last'] = now
+            publish(event)
+
+    sink = SignalSink(throttled, min_interval=0)
+    price = 50000.0
+    t = time.time()
+    end = time.monotonic() + seconds
+    i = 0
+    while time.monotonic() < end:
+        price *= 1 + rng.gauss(0, 0.0005)
+        t += 1.0
+        sink.on_tick(predictor, predictor.step(Tick(t, price, price)))
+        i += 1
+        if heartbeat and i % 1000 == 0:
+            heartbeat()
+
+
+def _bench_worker(ring_name, seconds):
+    ring = SignalRing(ring_name)
+    _predictor_load(ring.put_event, seconds, heartbeat=lambda: ring.beat(os.getpid()))
+
+
+async def _loop_lag(seconds, period=0.01):
+    """How late a `period` sleep wakes up, i.e. how long a gateway heartbeat would wait."""
+    lag = Histogram()
+    loop = asyncio.get_running_loop()
+    end = loop.time() + seconds
+    while loop.time() < end:
+        start = loop.time()
+        await asyncio.sleep(period)
+        lag.record(loop.time() - start - period)
+    return lag
+
+
+def _print_run(name, lag, latency, extra=''):
+    lag, latency = lag.summary(), latency.summary()
+    print(f"{name}: loop lag p50 {lag['p50_ms']:.2f} ms, p99 {lag['p99_ms']:.2f} ms, max {lag['max_ms']:.1f} ms | "
+          f"signal latency p50 {latency['p50_ms']:.2f} ms, p99 {latency['p99_ms']:.2f} ms "
+          f"({latency['count']} events){extra}")
+
+
+async def _bench_thread(seconds):
+    loop = asyncio.get_running_loop()
+    latency = Histogram()
+
+    def publish(event):
+        sent = time.time()
+        loop.call_soon_threadsafe(lambda: latency.record(time.time() - sent))
+
+    lag_task = asyncio.ensure_future(_loop_lag(seconds))
+    await loop.run_in_executor(None, _predictor_load, publish, seconds)
+    _print_run("predictor thread ", await lag_task, latency)
+
+
+async def _bench_process(seconds):
+    # The worker outlives the measurement so the kill below hits a running worker
+    worker = WorkerProcess(_bench_worker, (seconds * 4,), heartbeat_timeout=5.0, startup_timeout=30.0)
+    worker.start()
+    # Wait for the child to get going so interpreter startup is not counted
+    while worker.ring.heartbeat()[0] < worker.started:
+        await asyncio.sleep(0.01)
+    lag_task = asyncio.ensure_future(_loop_lag(seconds))
+    run = asyncio.ensure_future(worker.run(lambda event: None))
+    await lag_task
+    _print_run("predictor process", lag_task.result(), worker.latency, f", {worker.ring.dropped} dropped")
+
+    # Crash recovery: kill the worker and time the first signal from its replacement
+    worker.process.kill()
+    killed = time.time()
+    events = worker.events
+    while worker.events == events:
+        await asyncio.sleep(0.01)
+    print(f"worker killed: restarted and publishing again after {time.time() - killed:.2f} s "
+          f"(restart delay {RESTART_DELAY:.0f} s, {worker.restarts} restart)")
+    run.cancel()
+    try:
+        await run
+    except asyncio.CancelledError:
+        pass
+
+
+def benchmark(seconds=5.0):
+    """
+    Event-loop responsiveness and signal latency with the predictor's CPU
+    load in a thread of the bot's process versus in a supervised worker
+    process publishing through the shared-memory ring.
+    """
+    asyncio.run(_bench_thread(seconds))
+    asyncio.run(_bench_process(seconds))
+
+
+if __name__ == "__main__":
+    if '--bench' in sys.argv:
+        benchmark()
+    else:
+        print("Usage: python crypto_worker.py --bench")
@@ -0,0 +1,511 @@
+import asyncio
+import itertools
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from crypto_metrics import Histogram
+
+# Message sends allowed per channel and across the bot: (count, per seconds).
+# Discord's create-message bucket is 5 per 5 s per channel; the global
+# limit is 50 requests per second.
+ROUTE_RATE = (5, 5.0)
+GLOBAL_RATE = (50, 1.0)
+WINDOW_MARGIN = 0.05  # seconds added to every rate-limit window, for network jitter
+MAX_IN_FLIGHT = 8  # concurrent sends; one slot is always left for command replies
+# Tokens per channel and across the bot that broadcasts leave for command replies
+ROUTE_RESERVE = 1
+GLOBAL_RESERVE = 5
+MESSAGE_LIMIT = 2000  # Discord's maximum message length, for batching broadcasts
+
+COMMAND = 0  # replies to commands: sent before any waiting broadcast
+BROADCAST = 1  # signal fan-out: coalesced and batched per channel
+
+
+class SendRateLimited(Exception):
+    """The gateway rejected a send with 429; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after, is_global=False):
+        super().__init__(f"rate limited, retry after {retry_after:.2f}s" + (" (global)" if is_global else ""))
+        self.retry_after = retry_after
+        self.is_global = is_global
+
+
+class TokenBucket:
+    """
+    `capacity` tokens per `per`-second window, refilled in full when the
+    window ends, which is how Discord counts. The window starts with the
+    first send after the previous one ended; `margin` seconds are added so
+    our window never ends before the gateway's does.
+    """
+
+    def __init__(self, capacity, per, margin=WINDOW_MARGIN, clock=None):
+        self.capacity = capacity
+        self.per = per
+        self.margin = margin
+        self._clock = clock or time.monotonic
+        self.tokens = capacity
+        self.reset_at = 0.0
+
+    def delay(self, reserve=0):
+        """Seconds until a token is free while leaving `reserve` tokens untouched."""
+        now = self._clock()
+        if now >= self.reset_at or self.tokens > reserve:
+            return 0.0
+        return self.reset_at - now
+
+    def take(self):
+        now = self._clock()
+        if now >= self.reset_at:
+            self.tokens = self.capacity
+            self.reset_at = now + self.per + self.margin
+        self.tokens -= 1
+
+    def hold(self, seconds):
+        """Send nothing for `seconds` (a 429's retry_after)."""
+        self.tokens = 0
+        self.reset_at = max(self.reset_at, self._clock() + seconds + self.margin)
+
+    def observe(self, remaining, reset_after):
+        """Trust the gateway's own count (X-RateLimit-Remaining / -Reset-After) over ours."""
+        self.tokens = min(self.tokens, remaining)
+        self.reset_at = self._clock() + reset_after + self.margin
+
+
+class _Message:
+    __slots__ = ('target', 'content', 'embed', 'priority', 'key', 'future', 'queued_at')
+
+    def __init__(self, target, content, embed, priority, key, future, queued_at):
+        self.target = target
+        self.content = content
+        self.embed = embed
+        self.priority = priority
+        self.key = key
+        self.future = future
+        self.queued_at = queued_at
+
+
+class _Route:
+    __slots__ = ('bucket', 'commands', 'broadcasts', 'busy')
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.commands = deque()
+        self.broadcasts = {}  # key -> _Message, in queue order
+        self.busy = False
+
+
+class SendQueue:
+    """
+    Rate-limit-aware send scheduler for posting to many Discord channels.
+
+    Every channel (route) has a token bucket, and so does the bot as a
+    whole. A message is only sent once both have a token, so routine
+    fan-out never hits a 429. If one does happen, the route (or everything,
+    for a global limit) is held for its retry_after and the message is
+    requeued. Command replies (priority COMMAND) go before any waiting
+    broadcast, and broadcasts leave them a send slot and a few tokens, so
+    `!signal` never queues behind a fan-out. A broadcast with the same `key` as one still waiting for
+    the same channel supersedes it in place. Broadcasts waiting for one
+    channel are sent together as one message while they fit in
+    MESSAGE_LIMIT characters. Channels take turns.
+
+    `send(target, content)` is a coroutine that posts one message. It may
+    return the response's rate-limit headers and raises SendRateLimited on
+    a 429. A message with an embed dict is never batched and is sent as
+    send(target, content, embed=embed). submit() returns a future that
+    resolves to True once the message (or a batch containing it) is sent,
+    and False if it was superseded or the send failed.
+    """
+
+    def __init__(self, send, route_rate=ROUTE_RATE, global_rate=GLOBAL_RATE, max_in_flight=MAX_IN_FLIGHT,
+                 clock=None):
+        self.send = send
+        self.route_rate = route_rate
+        self._clock = clock or time.monotonic
+        self.global_bucket = TokenBucket(*global_rate, clock=self._clock)
+        self.max_in_flight = max_in_flight
+        self._routes = {}
+        self._keys = itertools.count()
+        self._in_flight = 0
+        self._wake = None
+        self._task = None
+        self.latency = {COMMAND: Histogram(), BROADCAST: Histogram()}
+        self.counts = dict.fromkeys(('submitted', 'sent', 'requests', 'batched', 'superseded', 'rate_limited',
+                                     'failed'), 0)
+
+    def start(self):
+        """Start dispatching on the running event loop."""
+        self._wake = asyncio.Event()
+        self._task = asyncio.ensure_future(self._dispatch())
+        return self
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def submit(self, target, content, priority=BROADCAST, key=None, embed=None):
+        """Queue `content` for `target` (a channel or channel id). Returns a future: True once sent."""
+        route_id = getattr(target, 'id', target)
+        route = self._routes.get(route_id)
+        if route is None:
+            route = self._routes[route_id] = _Route(TokenBucket(*self.route_rate, clock=self._clock))
+        if priority != COMMAND and key is None:
+            key = ('unique', next(self._keys))  # before _Message: _requeue() files it under message.key
+        future = asyncio.get_running_loop().create_future()
+        message = _Message(target, content, embed, priority, key, future, self._clock())
+        self.counts['submitted'] += 1
+        if priority == COMMAND:
+            route.commands.append(message)
+        else:
+            old = route.broadcasts.get(key)
+            if old is not None:
+                # Keeps its place in the queue, so a fast-changing signal is not starved
+                message.queued_at = old.queued_at
+                self._finish(old, False, 'superseded')
+            route.broadcasts[key] = message
+        if self._wake is not None:
+            self._wake.set()
+        return future
+
+    async def send_now(self, target, content, embed=None):
+        """Send a command reply ahead of every waiting broadcast and wait for it."""
+        return await self.submit(target, content, priority=COMMAND, embed=embed)
+
+    def pending(self):
+        return sum(len(r.commands) + len(r.broadcasts) for r in self._routes.values())
+
+    def _finish(self, message, ok, counter=None):
+        if counter:
+            self.counts[counter] += 1
+        if not message.future.done():
+            message.future.set_result(ok)
+
+    # --- Dispatch ---
+
+    def _next(self):
+        """Pick (route_id, route, messages) to send now, or the seconds until something can be sent."""
+        wait = None
+        for lane in (COMMAND, BROADCAST):
+            if lane == COMMAND:
+                limit, route_reserve, global_reserve = self.max_in_flight, 0, 0
+            else:
+                limit, route_reserve, global_reserve = self.max_in_flight - 1, ROUTE_RESERVE, GLOBAL_RESERVE
+            if self._in_flight >= limit:
+                continue
+            global_delay = self.global_bucket.delay(global_reserve)
+            for route_id, route in self._routes.items():
+                queue = route.commands if lane == COMMAND else route.broadcasts
+                if not queue or route.busy:
+                    continue
+                delay = max(route.bucket.delay(route_reserve), global_delay)
+                if delay > 0:
+                    wait = delay if wait is None else min(wait, delay)
+                    continue
+                if lane == COMMAND:
+                    messages = [route.commands.popleft()]
+                else:
+                    messages = self._batch(route)
+                # Move the route to the back so channels take turns
+                del self._routes[route_id]
+                self._routes[route_id] = route
+                return route_id, route, messages
+        return wait
+
+    def _batch(self, route):
+        messages = []
+        length = 0
+        for key in list(route.broadcasts):
+            message = route.broadcasts[key]
+            extra = len(message.content) + (1 if messages else 0)
+            if messages and (length + extra > MESSAGE_LIMIT or message.embed is not None):
+                break
+            del route.broadcasts[key]
+            messages.append(message)
+            length += extra
+            if message.embed is not None:
+                break
+        return messages
+
+    async def _dispatch(self):
+        while True:
+            picked = self._next()
+            if isinstance(picked, tuple):
+                route_id, route, messages = picked
+                route.bucket.take()
+                self.global_bucket.take()
+                route.busy = True
+                self._in_flight += 1
+                asyncio.ensure_future(self._send(route, messages))
+                continue
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), picked)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send(self, route, messages):
+        content = '\n'.join(m.content for m in messages)
+        self.counts['requests'] += 1
+        try:
+            if messages[0].embed is not None:
+                headers = await self.send(messages[0].target, content, embed=messages[0].embed)
+            else:
+                headers = await self.send(messages[0].target, content)
+        except SendRateLimited as e:
+            self.counts['rate_limited'] += 1
+            (self.global_bucket if e.is_global else route.bucket).hold(e.retry_after)
+            self._requeue(route, messages)
+        except Exception as e:
+            print(f"Send to {getattr(messages[0].target, 'id', messages[0].target)} failed: {e}")
+            logging.error(f"Send failed: {e}")
+            for message in messages:
+                self._finish(message, False, 'failed')
+        else:
+            if headers and 'X-RateLimit-Remaining' in headers:
+                route.bucket.observe(int(headers['X-RateLimit-Remaining']),
+                                     float(headers.get('X-RateLimit-Reset-After', 0)))
+            now = self._clock()
+            if len(messages) > 1:
+                self.counts['batched'] += len(messages) - 1
+            for message in messages:
+                self.latency[message.priority].record(now - message.queued_at)
+                self._finish(message, True, 'sent')
+        finally:
+            route.busy = False
+            self._in_flight -= 1
+            self._wake.set()
+
+    def _requeue(self, route, messages):
+        if messages[0].priority == COMMAND:
+            route.commands.extendleft(reversed(messages))
+            return
+        waiting = route.broadcasts
+        route.broadcasts = {}
+        for message in messages:
+            if message.key in waiting:  # a newer version arrived while this one was in flight
+                self._finish(message, False, 'superseded')
+            else:
+                route.broadcasts[message.key] = message
+        route.broadcasts.update(waiting)
+
+    def stats(self):
+        stats = dict(self.counts)
+        stats['pending'] = self.pending()
+        stats['command_latency'] = self.latency[COMMAND].summary()
+        stats['broadcast_latency'] = self.latency[BROADCAST].summary()
+        return stats
+
+
+# --- Local fake gateway for load tests ---
+
+class FakeDiscordGateway:
+    """
+    Local stand-in for Discord's create-message endpoint
+    (POST /api/v10/channels/<id>/messages) that enforces a per-channel and
+    a global limit as fixed windows. Rejections are 429s with Discord's
+    retry_after body and X-RateLimit headers. Use as a context manager;
+    `url` is the API base for rest_sender().
+    """
+
+    def __init__(self, route_limit=ROUTE_RATE, global_limit=GLOBAL_RATE, latency=0.0):
+        self.route_limit = route_limit
+        self.global_limit = global_limit
+        self.latency = latency
+        self.messages = {}  # channel id -> [content]
+        self.accepted = 0
+        self.rejected = 0
+        self._windows = {}  # channel id or None (global) -> (window start, count)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v10"
+
+    def _check(self, key, limit, now):
+        count_limit, per = limit
+        start, count = self._windows.get(key, (now, 0))
+        if now - start >= per:
+            start, count = now, 0
+        if count >= count_limit:
+            return start + per - now, 0
+        self._windows[key] = (start, count + 1)
+        return 0.0, count_limit - count - 1
+
+    def handle(self, channel_id, body):
+        """Return (status, headers, body) for one create-message request."""
+        now = time.monotonic()
+        with self._lock:
+            retry, _ = self._check(None, self.global_limit, now)
+            if retry:
+                self.rejected += 1
+                return 429, {'X-RateLimit-Global': 'true', 'Retry-After': f"{retry:.3f}"}, {
+                    'message': 'You are being rate limited.', 'retry_after': retry, 'global': True}
+            retry, remaining = self._check(channel_id, self.route_limit, now)
+            start = self._windows[channel_id][0]
+            headers = {'X-RateLimit-Limit': self.route_limit[0], 'X-RateLimit-Remaining': remaining,
+                       'X-RateLimit-Reset-After': f"{max(0.0, start + self.route_limit[1] - now):.3f}"}
+            if retry:
+                self.rejected += 1
+                return 429, dict(headers, **{'Retry-After': f"{retry:.3f}"}), {
+                    'message': 'You are being rate limited.', 'retry_after': retry, 'global': False}
+            self.accepted += 1
+            self.messages.setdefault(channel_id, []).append(body.get('content', ''))
+        return 200, headers, {'id': str(self.accepted), 'channel_id': channel_id, 'content': body.get('content')}
+
+    def start(self):
+        gateway = self
+        path = re.compile(r'^/api/v10/channels/(\d+)/messages$')
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def handle(self):
+                try:
+                    super().handle()
+                except ConnectionResetError:  # the client closed its keep-alive connection
+                    pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                match = path.match(self.path)
+                if match is None:
+                    status, headers, reply = 404, {}, {'message': '404: Not Found'}
+                else:
+                    if gateway.latency:
+                        time.sleep(gateway.latency)
+                    status, headers, reply = gateway.handle(match.group(1), body)
+                payload = json.dumps(reply).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                    for name, value in headers.items():
+                        self.send_header(name, str(value))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def rest_sender(session, base_url, token=None):
+    """A SendQueue `send` that posts straight to a Discord-style REST API with an aiohttp session."""
+    headers = {'Authorization': f"Bot {token}"} if token else {}
+
+    async def send(channel_id, content, embed=None):
+        payload = {'content': content}
+        if embed is not None:
+            payload['embeds'] = [embed]
+        async with session.post(f"{base_url}/channels/{channel_id}/messages", json=payload,
+                                headers=headers) as response:
+            if response.status == 429:
+                body = await response.json()
+                raise SendRateLimited(float(body.get('retry_after', 1.0)), bool(body.get('global')))
+            if response.status >= 400:
+                raise Exception(f"HTTP {response.status}: {await response.text()}")
+            return response.headers
+
+    return send
+
+
+def load_test(channels=40, seconds=6.0, signal_every=0.25, commands=30):
+    """
+    Fan a stream of signals for two symbols out to `channels` channels on the
+    fake gateway while `!signal`-style replies arrive, first as direct
+    concurrent posts and then through SendQueue.
+    """
+    import random
+    import aiohttp
+
+    channel_ids = [str(1000 + i) for i in range(channels)]
+    rng = random.Random(1)
+
+    async def scenario(gateway, queued):
+        async with aiohttp.ClientSession() as session:
+            send = rest_sender(session, gateway.url)
+            queue = SendQueue(send).start() if queued else None
+            pending = []
+            command_ms = []
+            start = time.monotonic()
+
+            async def post(target, content, priority, key=None):
+                if queue is not None:
+                    return await queue.submit(target, content, priority, key)
+                try:
+                    await send(target, content)
+                    return True
+                except SendRateLimited:
+                    return False
+
+            async def command(target, content):
+                t0 = time.monotonic()
+                ok = await post(target, content, COMMAND)
+                command_ms.append(((time.monotonic() - t0) * 1000, ok))
+
+            n = 0
+            while time.monotonic() - start < seconds:
+                symbol = ('BTCUSDT', 'ETHUSDT')[n % 2]
+                text = f"Crypto Signal (now {rng.choice(['UP', 'DOWN'])}): {symbol} #{n}"
+                for cid in channel_ids:
+                    pending.append(asyncio.ensure_future(post(cid, text, BROADCAST, symbol)))
+                if rng.random() < commands * signal_every / seconds:
+                    pending.append(asyncio.ensure_future(command(rng.choice(channel_ids), "Crypto Signal: reply")))
+                n += 1
+                await asyncio.sleep(signal_every)
+            results = await asyncio.gather(*pending)
+            elapsed = time.monotonic() - start
+            stats = queue.stats() if queue else None
+            if queue:
+                await queue.close()
+            return n, results, command_ms, elapsed, stats
+
+    for queued in (False, True):
+        with FakeDiscordGateway() as gateway:
+            n, results, command_ms, elapsed, stats = asyncio.run(scenario(gateway, queued))
+        label = "SendQueue" if queued else "direct posts"
+        delivered = sum(len(v) for v in gateway.messages.values())
+        replies = sorted(ms for ms, ok in command_ms if ok)
+        print(f"{label}: {n} signals x {channels} channels + {len(command_ms)} command replies in {elapsed:.1f} s")
+        print(f"  requests {gateway.accepted + gateway.rejected}, accepted {gateway.accepted}, "
+              f"429s {gateway.rejected}, messages delivered {delivered}")
+        if replies:
+            print(f"  command replies delivered {len(replies)}/{len(command_ms)}, "
+                  f"p50 {replies[len(replies) // 2]:.0f} ms, max {replies[-1]:.0f} ms")
+        if stats:
+            print(f"  superseded {stats['superseded']}, batched {stats['batched']}, "
+                  f"broadcast latency p50 {stats['broadcast_latency']['p50_ms']:.0f} ms "
+                  f"p99 {stats['broadcast_latency']['p99_ms']:.0f} ms")
+
+
+if __name__ == "__main__":
+    if '--bench' in sys.argv:
+        load_test()
+    else:
+        print("Usage: python discord_sender.py --bench")
@@ -1,52 +1,281 @@
+import math
 import os
-import discord
-from discord.ext import commands, tasks
+import sys
+import time
 import asyncio
+import discord
+from discord.ext import commands
 
-# Replace with your bot token and channel ID
+# Replace with your bot token and the IDs of every channel (in any guild) that gets signals
 discord_token = 'YOUR_DISCORD_BOT_TOKEN_HERE'
-signal_channel_id = 1047899575098290196  # Set to your Discord channel ID
+signal_channel_ids = [1047899575098290196]
 
 
-# Import your crypto predictor function here
-import sys
-import importlib.util
-import threading
+# crypto_predictor and its crypto_* modules live next to this file
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import crypto_predictor
+from crypto_engine import SignalSink
+from crypto_worker import WorkerProcess, predictor_worker
+from discord_sender import COMMAND, SendQueue, SendRateLimited
 
-# Start the predictor in a background thread
-spec = importlib.util.spec_from_file_location("crypto_predictor", "c:/Users/drema/AutoKey/crypto_predictor.py")
-crypto_predictor = importlib.util.module_from_spec(spec)
-sys.modules["crypto_predictor"] = crypto_predictor
-spec.loader.exec_module(crypto_predictor)
+# Symbol and investment the predictor tracks (no prompts, no chart)
+PREDICTOR_SYMBOL = 'BTCUSDT'
+PREDICTOR_INVESTMENT = 100.0
+# Seconds between two posted signals; a buy-in or direction change in between is merged into the next post
+SIGNAL_MIN_INTERVAL = 60
+# True: run the predictor in its own supervised process (crypto_worker) instead of on the bot's event loop,
+# so its CPU work never delays the gateway heartbeat
+PREDICTOR_PROCESS = False
+# Defaults and limits for !history and !stats
+HISTORY_DEFAULT = 5
+HISTORY_MAX = 25
+STATS_HOURS = 24
+STATS_MAX_HOURS = 24 * 365 * 10  # !stats windows longer than this cover everything anyway
 
-def start_predictor():
-    crypto_predictor.run_predictor()
+# The predictor's SignalSink (or its worker process), the send queue and the bot's background tasks,
+# set up once in on_ready
+signal_sink = None
+worker = None
+sender = None
+background_tasks = []
 
-predictor_thread = threading.Thread(target=start_predictor, daemon=True)
-predictor_thread.start()
+def get_latest_snapshot():
+    """The predictor's latest pre-rendered SignalSnapshot, or None before the first tick."""
+    if worker is not None:
+        return worker.latest
+    return crypto_predictor.get_latest_snapshot()
 
 def get_latest_signal():
-    return crypto_predictor.get_latest_signal()
+    snapshot = get_latest_snapshot()
+    return snapshot.text if snapshot else "No signal yet."
+
+def format_event(event):
+    reasons = {'buy-in': 'BUY-IN', 'direction': f"now {event.prediction}"}
+    return f"Crypto Signal ({', '.join(reasons[r] for r in event.reasons)}): {event.text}"
+
+async def run_predictor(queue):
+    """
+    The predictor as a task on the bot's event loop, or supervised in a worker
+    process with PREDICTOR_PROCESS, publishing signal events into `queue`.
+    """
+    global signal_sink, worker
+    crypto_predictor.setup_logging()
+    store = crypto_predictor.get_signal_store()
+
+    def publish(event):
+        store.add_signal(event)
+        queue.put_nowait(event)
+
+    if PREDICTOR_PROCESS:
+        worker = WorkerProcess(predictor_worker, (PREDICTOR_SYMBOL, PREDICTOR_INVESTMENT, SIGNAL_MIN_INTERVAL))
+        await worker.run(publish)
+        return
+    signal_sink = SignalSink(publish, min_interval=SIGNAL_MIN_INTERVAL)
+    sinks = crypto_predictor.make_sinks(PREDICTOR_SYMBOL) + [signal_sink]
+    await crypto_predictor.run_predictor_async(PREDICTOR_SYMBOL, PREDICTOR_INVESTMENT, sinks=sinks)
+
+async def discord_send(channel, content, embed=None):
+    """SendQueue's send: post to a channel object or channel id through discord.py."""
+    if not hasattr(channel, 'send'):
+        channel = bot.get_channel(channel) or await bot.fetch_channel(channel)
+    try:
+        await channel.send(content, embed=discord.Embed.from_dict(embed) if embed else None)
+    except discord.HTTPException as e:
+        if e.status == 429:
+            raise SendRateLimited(float(e.response.headers.get('Retry-After', 1.0)))
+        raise
+
+async def post_signals(queue):
+    """Fan every signal event out to all signal channels as soon as it is published."""
+    await bot.wait_until_ready()
+    while True:
+        event = await queue.get()
+        text = format_event(event)
+        for channel_id in signal_channel_ids:
+            # A newer signal for the same symbol replaces one still waiting for its channel
+            sender.submit(channel_id, text, key=event.symbol)
 
 intents = discord.Intents.default()
 bot = commands.Bot(command_prefix='!', intents=intents)
 
 @bot.event
-def on_ready():
+async def on_ready():
+    global sender
     print(f'Logged in as {bot.user}')
-    send_signal.start()
+    # on_ready fires again after every reconnect; the tasks only start once
+    if not background_tasks:
+        sender = SendQueue(discord_send).start()
+        queue = asyncio.Queue()
+        background_tasks.append(asyncio.ensure_future(run_predictor(queue)))
+        background_tasks.append(asyncio.ensure_future(post_signals(queue)))
+
+async def reply_to(ctx, reply, embed=None):
+    if sender is None:
+        await ctx.send(reply, embed=discord.Embed.from_dict(embed) if embed else None)
+    else:
+        # Replies go ahead of any broadcast waiting in the queue
+        await sender.submit(ctx.channel, reply, priority=COMMAND, embed=embed)
 
-@tasks.loop(minutes=5)
-async def send_signal():
-    channel = bot.get_channel(signal_channel_id)
-    if channel:
-        signal = get_latest_signal()
-        await channel.send(f"Crypto Signal: {signal}")
+async def query_store(method, *args):
+    """Run a blocking SignalStore query off the event loop."""
+    store = crypto_predictor.get_signal_store()
+    return await asyncio.get_running_loop().run_in_executor(None, getattr(store, method), *args)
+
+def parse_symbol_and_number(args, default, integer=False):
+    """
+    `!cmd [symbol] [n]` in either order; returns (symbol or None, n). Raises
+    ValueError for a number that is not finite and positive, or not whole
+    with integer=True.
+    """
+    symbol, number = None, default
+    for arg in args:
+        try:
+            value = int(arg) if integer else float(arg)
+        except ValueError:
+            try:
+                float(arg)
+            except ValueError:
+                symbol = arg.upper()
+                continue
+            raise ValueError(f"{arg} is not a whole number")
+        if not (math.isfinite(value) and value > 0):
+            raise ValueError(f"{arg} is not a positive number")
+        number = value
+    return symbol, number
 
 @bot.command()
 async def signal(ctx):
-    signal = get_latest_signal()
-    await ctx.send(f"Crypto Signal: {signal}")
+    # Only reads the snapshot the predictor swapped in on its last tick: nothing to compute or lock
+    snapshot = get_latest_snapshot()
+    if snapshot is None:
+        await reply_to(ctx, "Crypto Signal: No signal yet.")
+    else:
+        await reply_to(ctx, f"Crypto Signal: {snapshot.text}", embed=snapshot.embed)
+
+@bot.command()
+async def history(ctx, *args):
+    """!history [symbol] [n]: the last n published signals."""
+    try:
+        symbol, n = parse_symbol_and_number(args, HISTORY_DEFAULT, integer=True)
+    except ValueError as e:
+        await reply_to(ctx, f"{e}. Usage: !history [symbol] [count, 1-{HISTORY_MAX}]")
+        return
+    n = min(n, HISTORY_MAX)
+    rows = await query_store('recent_signals', symbol, n)
+    if not rows:
+        await reply_to(ctx, f"No signals recorded{' for ' + symbol if symbol else ''} yet.")
+        return
+    lines = [f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t))} {text}"
+             for _, t, _, _, _, _, text in rows]
+    await reply_to(ctx, "Recent signals:\n" + "\n".join(lines))
+
+@bot.command()
+async def stats(ctx, *args):
+    """!stats [symbol] [hours]: Pocket Options win rate and profit over the last hours."""
+    try:
+        symbol, hours = parse_symbol_and_number(args, STATS_HOURS)
+    except ValueError as e:
+        await reply_to(ctx, f"{e}. Usage: !stats [symbol] [hours]")
+        return
+    hours = min(hours, STATS_MAX_HOURS)
+    s = await query_store('trade_stats', symbol, time.time() - hours * 3600)
+    await reply_to(ctx, f"{symbol or 'All symbols'}, last {hours:g} h: {s['trades']} trades, "
+                        f"{s['wins']} wins / {s['losses']} losses, win rate {s['win_rate']:.1f}%, "
+                        f"profit ${s['profit']:.2f}")
+
+# --- Benchmark: !signal under load with a mocked Discord client ---
+
+class _MockContext:
+    """Stands in for commands.Context: records replies instead of calling Discord."""
+
+    def __init__(self, channel_id):
+        self.channel = discord.Object(channel_id)
+        self.replies = []
+
+    async def send(self, content, embed=None):
+        await asyncio.sleep(0)
+        self.replies.append((content, embed))
+
+def benchmark(n_commands=5000, burst=250):
+    """
+    !signal latency while the predictor steps as fast as it can in another
+    thread, replying from the snapshot versus rendering per command, and a
+    check that every reply's text and embed come from the same tick.
+    """
+    import random
+    import threading
+    from crypto_engine import SignalSnapshot, Tick
+    from crypto_metrics import Histogram
+
+    predictor = crypto_predictor.make_predictor(PREDICTOR_SYMBOL, PREDICTOR_INVESTMENT)
+    crypto_predictor.start_predictor(predictor, [])
+    stop = threading.Event()
+    steps = [0]
+
+    def load():
+        rng = random.Random(1)
+        price, t = 50000.0, time.time()
+        while not stop.is_set():
+            price *= 1 + rng.gauss(0, 0.0005)
+            t += 1.0
+            predictor.step(Tick(t, price, price))
+            steps[0] += 1
+
+    async def render_per_command(ctx):
+        snapshot = SignalSnapshot.from_result(predictor.last)
+        await reply_to(ctx, f"Crypto Signal: {snapshot.text}", embed=snapshot.embed)
+
+    async def run(handler):
+        latency = Histogram()
+        contexts = []
+
+        async def one(i):
+            ctx = _MockContext(i % 50)
+            start = time.perf_counter()
+            await handler(ctx)
+            latency.record(time.perf_counter() - start)
+            contexts.append(ctx)
+
+        start = time.perf_counter()
+        for lo in range(0, n_commands, burst):
+            await asyncio.gather(*(one(i) for i in range(lo, min(lo + burst, n_commands))))
+        return latency, n_commands / (time.perf_counter() - start), contexts
+
+    thread = threading.Thread(target=load, daemon=True)
+    thread.start()
+    while predictor.snapshot is None:
+        time.sleep(0.001)
+    for name, handler in (('snapshot          ', signal.callback), ('render per command', render_per_command)):
+        steps_before = steps[0]
+        latency, rate, contexts = asyncio.run(run(handler))
+        torn = 0
+        for ctx in contexts:
+            for content, embed in ctx.replies:
+                # "Crypto Signal: BTCUSDT: UP | Price: 50000.00 | Confidence: 12.5%" against the embed
+                title, price, confidence = content[len("Crypto Signal: "):].split(' | ')
+                fields = {f['name']: f['value'] for f in embed.to_dict()['fields']}
+                if (embed.title, f"Price: {fields['Price']}", f"Confidence: {fields['Confidence']}") != \
+                        (title, price, confidence):
+                    torn += 1
+        s = latency.summary()
+        print(f"!signal, {name}: p50 {s['p50_ms']:.2f} ms, p99 {s['p99_ms']:.2f} ms "
+              f"(bursts of {burst}), "
+              f"{rate:,.0f} commands/s, {torn} inconsistent replies, {steps[0] - steps_before} ticks meanwhile")
+    stop.set()
+    thread.join()
+    n = 100_000
+    start = time.perf_counter()
+    for _ in range(n):
+        get_latest_snapshot()
+    read = (time.perf_counter() - start) / n * 1e9
+    start = time.perf_counter()
+    for _ in range(n // 10):
+        SignalSnapshot.from_result(predictor.last)
+    build = (time.perf_counter() - start) / (n // 10) * 1e6
+    print(f"snapshot read: {read:.0f} ns; building one (once per tick): {build:.1f} us")
 
 if __name__ == "__main__":
-    bot.run(discord_token)
+    if '--bench' in sys.argv:
+        benchmark()
+    else:
+        bot.run(discord_token)
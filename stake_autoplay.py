@@ -0,0 +1,377 @@
+import argparse
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+
+from stake_fair import fair_numbers
+
+SESSION_ROUNDS = 1000  # rounds per simulated session; each starts again from the starting balance
+CURVE_EVERY = 50  # rounds between balance curve points
+BLOCK_ROUNDS = 64  # numbers hashed at a time, so a session ruined early does not hash its whole range
+START_BALANCE = 100.0
+BET = 5.0
+
+
+# --- Strategies: bet(balance) -> (guess, amount), then record(won, number) ---
+
+class Strategy:
+    """Flat betting on one side: the same guess and amount every round."""
+    name = 'flat'
+
+    def __init__(self, bet=BET, guess='h'):
+        self.base = bet
+        self.guess = guess
+
+    def reset(self, recent=()):
+        """Start a session; `recent` are the numbers of rounds already played, oldest first."""
+
+    def bet(self, balance):
+        return self.guess, self.base
+
+    def record(self, won, number):
+        pass
+
+
+class Martingale(Strategy):
+    """Double the bet after every loss, back to the base bet after a win."""
+    name = 'martingale'
+
+    def reset(self, recent=()):
+        self.amount = self.base
+
+    def bet(self, balance):
+        return self.guess, self.amount
+
+    def record(self, won, number):
+        self.amount = self.base if won else self.amount * 2
+
+
+class DAlembert(Strategy):
+    """Raise the bet by one base unit after a loss, lower it by one after a win."""
+    name = 'dalembert'
+
+    def reset(self, recent=()):
+        self.amount = self.base
+
+    def bet(self, balance):
+        return self.guess, self.amount
+
+    def record(self, won, number):
+        self.amount = max(self.base, self.amount - self.base) if won else self.amount + self.base
+
+
+class Paroli(Strategy):
+    """Double the bet after a win, for at most `wins` wins in a row; base bet after a loss."""
+    name = 'paroli'
+
+    def __init__(self, bet=BET, guess='h', wins=3):
+        super().__init__(bet, guess)
+        self.wins = wins
+
+    def reset(self, recent=()):
+        self.amount = self.base
+        self.streak = 0
+
+    def bet(self, balance):
+        return self.guess, self.amount
+
+    def record(self, won, number):
+        self.streak = self.streak + 1 if won else 0
+        if self.streak and self.streak < self.wins:
+            self.amount *= 2
+        else:
+            self.amount = self.base
+            self.streak = 0
+
+
+class Smart(Strategy):
+    """
+    stake_guesser's smart_suggestion(): guess the side that came up more
+    often in the last 10 rounds (LOW on a tie, HIGH with no rounds yet),
+    with a flat bet. The window and its HIGH count are kept incrementally.
+    """
+    name = 'smart'
+
+    def reset(self, recent=()):
+        self.window = deque(maxlen=10)
+        self.high = 0
+        for number in recent[-10:]:
+            self.record(None, number)
+
+    def bet(self, balance):
+        if not self.window:
+            return 'h', self.base
+        return ('h' if 2 * self.high > len(self.window) else 'l'), self.base
+
+    def record(self, won, number):
+        window = self.window
+        if len(window) == window.maxlen:
+            self.high -= window[0] > 50
+        window.append(number)
+        self.high += number > 50
+
+
+STRATEGIES = {cls.name: cls for cls in (Strategy, Martingale, DAlembert, Paroli, Smart)}
+
+
+def make_strategy(name, bet=BET):
+    if name not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {name!r}; choose from {', '.join(STRATEGIES)}")
+    return STRATEGIES[name](bet)
+
+
+# --- Playing rounds ---
+
+def settle_round(strategy, balance, number):
+    """
+    One round: the strategy's bet, settled against the fair `number`.
+    Returns (guess, amount, won, balance after), or None when the bet is
+    more than the balance and nothing is played.
+    """
+    guess, amount = strategy.bet(balance)
+    if amount > balance:
+        return None
+    won = number > 50 if guess == 'h' else number <= 50
+    strategy.record(won, number)
+    return guess, amount, won, balance + amount if won else balance - amount
+
+
+def play_rounds(strategy, client_seed, server_hash, first_round, n, balance, recent=(), next_server_hash=None):
+    """
+    Play up to `n` rounds from `first_round` the way a stake_guesser session
+    would, without prompts or sleeps. Stops early when the strategy's bet is
+    more than the balance. A `next_server_hash` takes over after the first
+    round, like the 'n' command. Returns the rounds as history entries.
+    """
+    rounds = range(first_round, first_round + n)
+    if next_server_hash and n > 1:
+        numbers = fair_numbers(client_seed, server_hash, rounds[:1]) + \
+            fair_numbers(client_seed, next_server_hash, rounds[1:])
+    else:
+        numbers = fair_numbers(client_seed, server_hash, rounds)
+    strategy.reset(recent)
+    history = []
+    for i, (round_num, number) in enumerate(zip(rounds, numbers)):
+        settled = settle_round(strategy, balance, number)
+        if settled is None:
+            break
+        guess, amount, won, balance = settled
+        history.append({
+            'round': round_num,
+            'guess': guess,
+            'number': number,
+            'result': 'WIN' if won else 'LOSS',
+            'balance': balance,
+            'client_seed': client_seed,
+            'server_hash': next_server_hash if next_server_hash and i else server_hash,
+            'bet': amount,
+        })
+    return history
+
+
+def _run_sessions(strategy_name, bet, start_balance, client_seed, server_hash, first_session, sessions,
+                  session_rounds, curve_every):
+    """
+    Simulate sessions `first_session` .. `first_session + sessions - 1`;
+    session k plays rounds k * session_rounds + 1 onwards. Returns partial
+    results for AutoplayResult.merge().
+    """
+    strategy = make_strategy(strategy_name, bet)
+    finals, curves, ruin_rounds = [], [], []
+    win_streaks, loss_streaks = {}, {}
+    rounds_played = 0
+    wagered = 0.0
+    for k in range(first_session, first_session + sessions):
+        first = k * session_rounds + 1
+        last = first + session_rounds
+        numbers = chain.from_iterable(
+            fair_numbers(client_seed, server_hash, range(lo, min(lo + BLOCK_ROUNDS, last)))
+            for lo in range(first, last, BLOCK_ROUNDS))
+        strategy.reset()
+        balance = start_balance
+        curve = []
+        streak_won, streak = None, 0
+        played = 0
+        for number in numbers:
+            settled = settle_round(strategy, balance, number)
+            if settled is None:
+                ruin_rounds.append(played)
+                break
+            _, amount, won, balance = settled
+            wagered += amount
+            if won is streak_won:
+                streak += 1
+            else:
+                if streak:
+                    streaks = win_streaks if streak_won else loss_streaks
+                    streaks[streak] = streaks.get(streak, 0) + 1
+                streak_won, streak = won, 1
+            played += 1
+            if played % curve_every == 0:
+                curve.append(balance)
+        if streak:
+            streaks = win_streaks if streak_won else loss_streaks
+            streaks[streak] = streaks.get(streak, 0) + 1
+        # A ruined session stays at its last balance for the rest of the curve
+        curve.extend([balance] * (session_rounds // curve_every - len(curve)))
+        finals.append(balance)
+        curves.append(curve)
+        rounds_played += played
+    return finals, curves, ruin_rounds, win_streaks, loss_streaks, rounds_played, wagered
+
+
+def _percentile(sorted_values, q):
+    return sorted_values[min(int(q / 100 * len(sorted_values)), len(sorted_values) - 1)]
+
+
+class AutoplayResult:
+    """Balance curves, ruin probability and streak distributions over many simulated sessions."""
+
+    def __init__(self, strategy, bet, start_balance, session_rounds, curve_every):
+        self.strategy = strategy
+        self.bet = bet
+        self.start_balance = start_balance
+        self.session_rounds = session_rounds
+        self.curve_every = curve_every
+        self.finals = []
+        self.curves = []
+        self.ruin_rounds = []  # rounds played before each ruined session ran out
+        self.win_streaks = {}  # streak length -> count
+        self.loss_streaks = {}
+        self.rounds = 0
+        self.wagered = 0.0
+        self.elapsed = 0.0
+
+    def merge(self, part):
+        finals, curves, ruin_rounds, win_streaks, loss_streaks, rounds, wagered = part
+        self.finals.extend(finals)
+        self.curves.extend(curves)
+        self.ruin_rounds.extend(ruin_rounds)
+        for mine, theirs in ((self.win_streaks, win_streaks), (self.loss_streaks, loss_streaks)):
+            for length, count in theirs.items():
+                mine[length] = mine.get(length, 0) + count
+        self.rounds += rounds
+        self.wagered += wagered
+
+    @property
+    def ruin_probability(self):
+        return len(self.ruin_rounds) / len(self.finals) if self.finals else 0.0
+
+    def balance_curve(self, percentiles=(5, 50, 95)):
+        """[(round, mean, {percentile: balance})] across sessions at every curve point."""
+        points = []
+        for i, column in enumerate(zip(*self.curves)):
+            ordered = sorted(column)
+            points.append(((i + 1) * self.curve_every, sum(ordered) / len(ordered),
+                           {q: _percentile(ordered, q) for q in percentiles}))
+        return points
+
+    def summary(self, curve_points=10, streak_rows=12):
+        finals = sorted(self.finals)
+        n = len(finals)
+        lines = [
+            f"Strategy {self.strategy}, bet ${self.bet:.2f}, {n} sessions of {self.session_rounds} rounds "
+            f"from ${self.start_balance:.2f}: {self.rounds} rounds in {self.elapsed:.2f} s "
+            f"({self.rounds / self.elapsed if self.elapsed else 0:,.0f} rounds/s)",
+            f"Ruin probability: {self.ruin_probability * 100:.1f}%"
+            + (f" (median {sorted(self.ruin_rounds)[len(self.ruin_rounds) // 2]} rounds in)"
+               if self.ruin_rounds else ""),
+            f"Final balance: mean ${sum(finals) / n:.2f}, p5 ${_percentile(finals, 5):.2f}, "
+            f"median ${_percentile(finals, 50):.2f}, p95 ${_percentile(finals, 95):.2f}; "
+            f"total wagered ${self.wagered:,.2f}",
+            "Balance curve:    round       mean         p5        p50        p95",
+        ]
+        curve = self.balance_curve()
+        step = max(1, len(curve) // curve_points)
+        for round_num, mean, q in curve[step - 1::step]:
+            lines.append(f"               {round_num:>8} {mean:>10.2f} {q[5]:>10.2f} {q[50]:>10.2f} {q[95]:>10.2f}")
+        lines.append("Streaks:      length       wins     losses")
+        longest = max(list(self.win_streaks) + list(self.loss_streaks) + [0])
+        for length in range(1, min(longest, streak_rows) + 1):
+            lines.append(f"               {length:>6} {self.win_streaks.get(length, 0):>10} "
+                         f"{self.loss_streaks.get(length, 0):>10}")
+        if longest > streak_rows:
+            lines.append(f"               longest: {max(self.win_streaks, default=0)} wins, "
+                         f"{max(self.loss_streaks, default=0)} losses")
+        return '\n'.join(lines)
+
+
+def simulate(strategy, rounds, client_seed, server_hash, bet=BET, start_balance=START_BALANCE,
+             session_rounds=SESSION_ROUNDS, curve_every=CURVE_EVERY, workers=None):
+    """
+    Play `rounds` provably fair rounds as independent sessions of
+    `session_rounds` rounds each with the named strategy. Sessions are
+    contiguous round ranges, sharded across a process pool; workers=1
+    runs in this process. Fewer than `session_rounds` rounds play as one
+    shorter session; otherwise `rounds` must be a whole number of sessions.
+    """
+    start = time.perf_counter()
+    make_strategy(strategy, bet)  # fail fast on an unknown name
+    if rounds < 1:
+        raise ValueError(f"rounds must be at least 1, got {rounds}")
+    session_rounds = min(session_rounds, rounds)
+    if rounds % session_rounds:
+        raise ValueError(f"{rounds} rounds is not a whole number of {session_rounds}-round sessions")
+    sessions = rounds // session_rounds
+    workers = workers or min(sessions, os.cpu_count() or 1)
+    shard = -(-sessions // workers)
+    jobs = [(first, min(shard, sessions - first)) for first in range(0, sessions, shard)]
+    args = (strategy, bet, start_balance, client_seed, server_hash)
+    result = AutoplayResult(strategy, bet, start_balance, session_rounds, curve_every)
+    if workers == 1:
+        for first, count in jobs:
+            result.merge(_run_sessions(*args, first, count, session_rounds, curve_every))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_sessions, *args, first, count, session_rounds, curve_every)
+                       for first, count in jobs]
+            for future in futures:
+                result.merge(future.result())
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def benchmark(rounds=1_000_000):
+    rng = random.Random(1)
+    client_seed, server_hash = str(rng.randint(1, 1_000_000_000)), f"{rng.getrandbits(256):064x}"
+    cores = os.cpu_count() or 1
+    for name in STRATEGIES:
+        for workers in sorted({1, cores}):
+            result = simulate(name, rounds, client_seed, server_hash, workers=workers)
+            rate = result.rounds / result.elapsed
+            print(f"{name:<10} {workers} worker(s): {rate:>10,.0f} rounds/s ({rate / workers:,.0f} per core), "
+                  f"ruin {result.ruin_probability * 100:5.1f}%")
+    print("(the interactive loop sleeps 1 s per round: 1,000 rounds take over 16 minutes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate Stake Guesser betting strategies on provably fair rounds.")
+    parser.add_argument('--strategy', choices=list(STRATEGIES), default='flat')
+    parser.add_argument('--rounds', type=int, default=1_000_000)
+    parser.add_argument('--session', type=int, default=SESSION_ROUNDS, help="rounds per session")
+    parser.add_argument('--bet', type=float, default=BET)
+    parser.add_argument('--balance', type=float, default=START_BALANCE, help="starting balance per session")
+    parser.add_argument('--client-seed', default=None)
+    parser.add_argument('--server-hash', default=None)
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--bench', action='store_true', help="rounds/s of every strategy")
+    args = parser.parse_args()
+    if args.bench:
+        benchmark()
+        return
+    client_seed = args.client_seed or str(random.randint(1, 1_000_000_000))
+    server_hash = args.server_hash or str(random.randint(1, 1_000_000_000))
+    print(f"Client Seed: {client_seed} | Server Hash: {server_hash}")
+    try:
+        result = simulate(args.strategy, args.rounds, client_seed, server_hash, args.bet, args.balance, args.session,
+                          workers=args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    print(result.summary())
+
+
+if __name__ == "__main__":
+    main()
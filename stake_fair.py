@@ -0,0 +1,191 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+CHUNK_ROUNDS = 100_000  # rounds per pool task at most
+
+
+def provably_fair_number(client_seed, server_hash, round_num):
+    data = f"{client_seed}:{server_hash}:{round_num}"
+    hash_val = hashlib.sha256(data.encode()).hexdigest()
+    return int(hash_val[:8], 16) % 100 + 1
+
+
+def fair_numbers(client_seed, server_hash, rounds):
+    """
+    provably_fair_number() for many rounds of one seed pair. The
+    "client_seed:server_hash:" prefix is hashed once and its SHA-256 state
+    copied for every round, and the number is read from the digest bytes
+    instead of the hex string.
+    """
+    prefix = hashlib.sha256(f"{client_seed}:{server_hash}:".encode())
+    copy = prefix.copy
+    from_bytes = int.from_bytes
+    numbers = []
+    append = numbers.append
+    for round_num in rounds:
+        h = copy()
+        h.update(b'%d' % round_num)
+        append(from_bytes(h.digest()[:4], 'big') % 100 + 1)
+    return numbers
+
+
+# --- Loading history ---
+
+def load_rounds(path):
+    """
+    High/low rounds from an export_json() history file or a save_session()
+    file, in play order. Dragon Tower rounds have no fair number and are
+    left out.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    history = data['history'] if isinstance(data, dict) else data
+    return [h for h in history if 'number' in h]
+
+
+def seed_segments(rounds):
+    """
+    Split rounds into runs that share one (client_seed, server_hash) pair.
+    Every round records the pair it was played with, so a server hash
+    rotated in with next_server_hash simply starts a new run. A round
+    without seeds (older files) is taken to use the previous round's pair.
+    Yields (client_seed, server_hash, start, stop) index ranges.
+    """
+    client_seed = server_hash = None
+    start = 0
+    for i, h in enumerate(rounds):
+        client, server = h.get('client_seed', client_seed), h.get('server_hash', server_hash)
+        if server != server_hash or client != client_seed:
+            if i > start:
+                yield client_seed, server_hash, start, i
+            client_seed, server_hash, start = client, server, i
+    if len(rounds) > start:
+        yield client_seed, server_hash, start, len(rounds)
+
+
+# --- Verification ---
+
+def _verify_chunk(client_seed, server_hash, first, rounds, numbers):
+    expected = fair_numbers(client_seed, server_hash, rounds)
+    return [(first + i, rounds[i], want, numbers[i]) for i, want in enumerate(expected) if want != numbers[i]]
+
+
+def _chunks(rounds, chunk_rounds):
+    for client_seed, server_hash, start, stop in seed_segments(rounds):
+        for lo in range(start, stop, chunk_rounds):
+            run = rounds[lo:min(lo + chunk_rounds, stop)]
+            yield client_seed, server_hash, lo, [h['round'] for h in run], [h['number'] for h in run]
+
+
+class VerifyReport:
+    """Outcome of verify_rounds(): counts and every mismatching round."""
+
+    def __init__(self, rounds, seed_pairs, mismatches, elapsed):
+        self.rounds = rounds
+        self.seed_pairs = seed_pairs
+        self.mismatches = mismatches  # [(index, round_num, expected, recorded, client_seed, server_hash)]
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return not self.mismatches
+
+    def summary(self, show=20):
+        rate = self.rounds / self.elapsed if self.elapsed else 0.0
+        lines = [f"Verified {self.rounds} rounds over {self.seed_pairs} seed pair(s) in {self.elapsed:.2f} s "
+                 f"({rate:,.0f} rounds/s): {len(self.mismatches)} mismatch(es)"]
+        for _, round_num, expected, recorded, client_seed, server_hash in self.mismatches[:show]:
+            lines.append(f"  round {round_num}: recorded {recorded}, expected {expected} "
+                         f"for {client_seed}:{server_hash}")
+        if len(self.mismatches) > show:
+            lines.append(f"  ... and {len(self.mismatches) - show} more")
+        return '\n'.join(lines)
+
+
+def verify_rounds(rounds, workers=None, chunk_rounds=CHUNK_ROUNDS):
+    """
+    Recompute every round's fair number and compare it with the recorded
+    one, one task per seed pair run (at most `chunk_rounds` rounds) across a
+    process pool. workers=1 runs in this process.
+    """
+    start = time.perf_counter()
+    chunks = list(_chunks(rounds, chunk_rounds))
+    workers = workers or min(len(chunks), os.cpu_count() or 1) or 1
+    if workers == 1:
+        results = [_verify_chunk(*chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_verify_chunk, *zip(*chunks)))
+    mismatches = []
+    for (client_seed, server_hash, *_), found in zip(chunks, results):
+        mismatches.extend((i, r, want, got, client_seed, server_hash) for i, r, want, got in found)
+    seed_pairs = len({(c[0], c[1]) for c in chunks})
+    return VerifyReport(len(rounds), seed_pairs, mismatches, time.perf_counter() - start)
+
+
+# --- Benchmark ---
+
+def synthetic_rounds(n, rotate_every=1000, seed=1):
+    """`n` recorded rounds with a new server hash every `rotate_every` rounds, as stake_guesser writes them."""
+    rng = random.Random(seed)
+    client_seed = str(rng.randint(1, 1_000_000_000))
+    rounds = []
+    for lo in range(0, n, rotate_every):
+        server_hash = hashlib.sha256(str(rng.random()).encode()).hexdigest()
+        round_nums = range(lo + 1, min(lo + rotate_every, n) + 1)
+        for round_num, number in zip(round_nums, fair_numbers(client_seed, server_hash, round_nums)):
+            rounds.append({'round': round_num, 'guess': 'h', 'number': number, 'result': 'WIN', 'balance': 100.0,
+                           'client_seed': client_seed, 'server_hash': server_hash, 'bet': 5.0})
+    return rounds
+
+
+def benchmark(n=2_000_000):
+    rounds = synthetic_rounds(n)
+    for i in (10, n // 2, n - 1):
+        rounds[i]['number'] = rounds[i]['number'] % 100 + 1  # tampered rounds the verifier must find
+
+    sample = rounds[:200_000]
+    start = time.perf_counter()
+    for h in sample:
+        provably_fair_number(h['client_seed'], h['server_hash'], h['round'])
+    naive = len(sample) / (time.perf_counter() - start)
+    print(f"provably_fair_number one round at a time: {naive:,.0f} rounds/s")
+
+    cores = os.cpu_count() or 1
+    for workers in sorted({1, cores}):
+        report = verify_rounds(rounds, workers=workers)
+        rate = report.rounds / report.elapsed
+        print(f"verify_rounds, {workers} worker(s): {rate:,.0f} rounds/s ({rate / workers:,.0f} per core, "
+              f"{rate * 60 / 1e6:.0f}M rounds/min), {len(report.mismatches)} mismatches found "
+              f"over {report.seed_pairs} seed pairs")
+        assert [m[0] for m in report.mismatches] == [10, n // 2, n - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify the provably fair numbers of recorded Stake Guesser rounds.")
+    parser.add_argument('files', nargs='*', help="export_json() history or save_session() files")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--show', type=int, default=20, help="mismatches to list per file")
+    parser.add_argument('--bench', action='store_true', help="benchmark on synthetic rounds")
+    args = parser.parse_args()
+    if args.bench:
+        benchmark()
+        return
+    if not args.files:
+        parser.error("give at least one history file, or --bench")
+    failed = False
+    for path in args.files:
+        report = verify_rounds(load_rounds(path), workers=args.workers)
+        print(f"{path}: {report.summary(args.show)}")
+        failed = failed or not report.ok
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,12 @@ import hashlib
 import sys
 import json
 from colorama import init, Fore, Style
+# Shared with the bulk verifier: python stake_fair.py <history.json>
+from stake_fair import provably_fair_number
+from stake_autoplay import STRATEGIES, make_strategy, play_rounds
+from stake_stats import SessionStats, smart_suggestion
+from stake_leaderboard import LEADERBOARD_FILE, Leaderboard
+from stake_journal import SAVE_FILE, SessionJournal
 init(autoreset=True)
 
 def cprint(text, color=None): 
@@ -35,42 +41,60 @@ def show_help():
     print("egg: Easter egg | q: Quit game")
     print("help/?: Show this help menu\n")
 
-def save_session(filename="stake_guesser_save.json"):
-    with open(filename, 'w') as f:
-        json.dump({
-            'history': history,
-            'balance': balance,
-            'round_num': round_num,
-            'win_streak': win_streak,
-            'loss_streak': loss_streak,
-            'max_win_streak': max_win_streak,
-            'max_loss_streak': max_loss_streak,
-            # 'achievements': list(achievements),
-            'client_seed': client_seed,
-            'server_hash': server_hash,
-            'bet_amount': bet_amount
-        }, f)
-    print("Session saved.")
-
-def load_session(filename="stake_guesser_save.json"):
-    global history, balance, round_num, win_streak, loss_streak, max_win_streak, max_loss_streak, client_seed, server_hash, bet_amount
+def session_state():
+    return {
+        'balance': balance,
+        'round_num': round_num,
+        'win_streak': win_streak,
+        'loss_streak': loss_streak,
+        'max_win_streak': max_win_streak,
+        'max_loss_streak': max_loss_streak,
+        # 'achievements': list(achievements),
+        'client_seed': client_seed,
+        'server_hash': server_hash,
+        'bet_amount': bet_amount
+    }
+
+def restore_state(state):
+    global balance, round_num, win_streak, loss_streak, max_win_streak, max_loss_streak, client_seed, server_hash, bet_amount
+    balance = state['balance']
+    round_num = state['round_num']
+    win_streak = state['win_streak']
+    loss_streak = state['loss_streak']
+    max_win_streak = state['max_win_streak']
+    max_loss_streak = state['max_loss_streak']
+    # achievements = set(state['achievements'])
+    client_seed = state['client_seed']
+    server_hash = state['server_hash']
+    bet_amount = state['bet_amount']
+
+def save_session(filename=SAVE_FILE):
+    journal.save(session_state(), filename)
+    print("Session saved. Every round is saved from now on.")
+
+def load_session(filename=SAVE_FILE):
+    global stats
     try:
-        with open(filename, 'r') as f:
-            data = json.load(f)
-            history = data['history']
-            balance = data['balance']
-            round_num = data['round_num']
-            win_streak = data['win_streak']
-            loss_streak = data['loss_streak']
-            max_win_streak = data['max_win_streak']
-            max_loss_streak = data['max_loss_streak']
-            # achievements = set(data['achievements'])
-            client_seed = data['client_seed']
-            server_hash = data['server_hash']
-            bet_amount = data['bet_amount']
-        print("Session loaded.")
+        restore_state(journal.load(filename))
     except Exception:
         print("No saved session found.")
+        return
+    stats = SessionStats(history)
+    print(f"Session loaded: {len(history)} round(s).")
+
+def undo_round():
+    global stats
+    if not history:
+        print("Nothing to undo.")
+        return
+    undone = history[-1]['round']
+    state = journal.undo()
+    if state is None:
+        print("Can't undo further back.")
+        return
+    restore_state(state)
+    stats = SessionStats(history)
+    print(f"Undid round {undone}. Balance: ${balance:.2f}")
 
 def export_json():
     fname = f"stake_guesser_history_{int(time.time())}.json"
@@ -144,21 +168,22 @@ def play_sound(win):
         pass
 
 def advanced_stats():
-    if not history:
+    if not stats.games:
         print("No stats yet.")
         return
-    win_rounds = [h for h in history if h['result'] == 'WIN']
-    loss_rounds = [h for h in history if h['result'] == 'LOSS']
+    average_win = stats.average_balance('WIN')
+    average_loss = stats.average_balance('LOSS')
+    print(f"Games played: {stats.games} | Wins: {stats.wins} | Losses: {stats.losses} | Win rate: {stats.win_rate:.1f}%")
     print(f"Longest win streak: {max_win_streak}")
     print(f"Longest loss streak: {max_loss_streak}")
-    print(f"Average win: {sum(h['balance'] for h in win_rounds)/len(win_rounds):.2f}" if win_rounds else "No wins yet.")
-    print(f"Average loss: {sum(h['balance'] for h in loss_rounds)/len(loss_rounds):.2f}" if loss_rounds else "No losses yet.")
+    print(f"Average win: {average_win:.2f}" if average_win is not None else "No wins yet.")
+    print(f"Average loss: {average_loss:.2f}" if average_loss is not None else "No losses yet.")
 
 import os
 import json
 import winsound
 
-LEADERBOARD_FILE = "stake_guesser_leaderboard.json"
+leaderboard = Leaderboard(LEADERBOARD_FILE)  # re-read only when another session changes the file
  
 import random
 import time
@@ -184,11 +209,6 @@ if not server_hash:
 print(f"Using Client Seed: {client_seed}")
 print(f"Using Server Hash: {server_hash}")
 
-def provably_fair_number(client_seed, server_hash, round_num):
-    data = f"{client_seed}:{server_hash}:{round_num}"
-    hash_val = hashlib.sha256(data.encode()).hexdigest()
-    return int(hash_val[:8], 16) % 100 + 1
-
 def play_sound(win):
     try:
         if win:
@@ -198,56 +218,20 @@ def play_sound(win):
     except Exception:
         pass
 
-def load_leaderboard():
-    if os.path.exists(LEADERBOARD_FILE):
-        with open(LEADERBOARD_FILE, 'r') as f:
-            return json.load(f)
-    return []
-
-def save_leaderboard(lb):
-    with open(LEADERBOARD_FILE, 'w') as f:
-        json.dump(lb, f)
-
 def update_leaderboard(name, balance, max_win_streak):
-    lb = load_leaderboard()
-    lb.append({'name': name, 'balance': balance, 'max_win_streak': max_win_streak})
-    lb = sorted(lb, key=lambda x: (-x['balance'], -x['max_win_streak']))[:10]
-    save_leaderboard(lb)
-    return lb
+    return leaderboard.add(name, balance, max_win_streak)
 
 def print_leaderboard():
-    lb = load_leaderboard()
-    print("\nLeaderboard (Top 10):")
-    for i, entry in enumerate(lb, 1):
-        print(f"{i}. {entry['name']} - ${entry['balance']:.2f} | Max Streak: {entry['max_win_streak']}")
-    print()
+    print(f"\n{leaderboard.text()}\n")
 
-
-
-def get_confidence(history, guess):
-    # AI-inspired: use last 10 rounds, streaks, and win rate
+def record_leaderboard():
     if not history:
-        return 50.0
-    last = history[-10:]
-    win_rate = sum(1 for h in last if h['result'] == 'WIN') / len(last) * 100
-    high_count = sum(1 for h in last if h['number'] > 50)
-    low_count = len(last) - high_count
-    if guess == 'h':
-        conf = 50 + (high_count - low_count) * 5 + (win_rate - 50) * 0.5
-    else:
-        conf = 50 + (low_count - high_count) * 5 + (win_rate - 50) * 0.5
-    return max(0, min(100, conf))
+        return
+    name = input("Name for the leaderboard (blank to skip): ").strip()
+    if name:
+        update_leaderboard(name, balance, max_win_streak)
+        print_leaderboard()
 
-def smart_suggestion(history):
-    if not history:
-        return 'h', 50.0
-    last = history[-10:]
-    high_count = sum(1 for h in last if h['number'] > 50)
-    low_count = len(last) - high_count
-    if high_count > low_count:
-        return 'h', high_count / len(last) * 100
-    else:
-        return 'l', low_count / len(last) * 100
 
 def print_overlay(round_num):
     GRID_SIZE = 5
@@ -271,7 +255,6 @@ def print_overlay(round_num):
     print()
     random.seed()
 
-history = []
 stake_game_urls = []  # List of saved Stake.us game URLs
 active_game_index = None  # Index of the currently active game
 round_num = 1
@@ -279,6 +262,10 @@ win_streak = 0
 loss_streak = 0
 max_win_streak = 0
 max_loss_streak = 0
+journal = SessionJournal()  # appends a record per round once the session is saved or loaded
+journal.set_state(session_state())
+history = journal.history
+stats = SessionStats(history)  # win rate, suggestion and summary without rescanning history
 
 while True:
     print(f"\nCurrent balance: ${balance:.2f}")
@@ -289,10 +276,9 @@ while True:
     print(f"Current bet: ${bet_amount:.2f}")
     print(f"Win streak: {win_streak} | Loss streak: {loss_streak}")
     print(f"Max win streak: {max_win_streak} | Max loss streak: {max_loss_streak}")
-    if history:
-        win_rate = sum(1 for h in history if h['result'] == 'WIN') / len(history) * 100
-        print(f"Games played: {len(history)} | Win rate: {win_rate:.1f}%")
-    suggestion, suggestion_conf = smart_suggestion(history)
+    if stats.games:
+        print(f"Games played: {stats.games} | Win rate: {stats.win_rate:.1f}%")
+    suggestion, suggestion_conf = smart_suggestion(stats)
     print(f"Smart Suggestion: {'HIGH' if suggestion == 'h' else 'LOW'} ({suggestion_conf:.1f}% recent bias)")
     print_leaderboard()
 
@@ -341,15 +327,64 @@ while True:
         else:
             balance -= dragon_tower_bet
             print(f"You lost your bet of ${dragon_tower_bet:.2f}. New balance: ${balance:.2f}")
-        history.append({
+        entry = {
             'round': round_num,
             'game': 'Dragon Tower',
             'rows_cleared': dragon_tower_cleared,
             'result': 'WIN' if dragon_tower_win and dragon_tower_cleared == rows else 'LOSS',
             'reward': dragon_tower_reward if dragon_tower_cleared > 0 else -dragon_tower_bet,
             'balance': balance
-        })
+        }
+        stats.add(entry)
         round_num += 1
+        journal.add_rounds([(entry, session_state())])
+        continue
+    if guess == 'a':
+        print(f"Strategies: {', '.join(STRATEGIES)}")
+        strategy_name = input("Strategy (default smart): ").strip().lower() or 'smart'
+        try:
+            auto_rounds = int(input("Rounds to auto-play (default 100): ").strip() or 100)
+            strategy = make_strategy(strategy_name, bet_amount)
+        except ValueError as e:
+            print(f"Invalid auto-play settings: {e}")
+            continue
+        played = play_rounds(strategy, client_seed, server_hash, round_num, auto_rounds, balance,
+                             recent=stats.recent_numbers(), next_server_hash=next_server_hash)
+        rounds = []
+        for h in played:
+            stats.add(h)
+            if h['result'] == 'WIN':
+                win_streak += 1
+                loss_streak = 0
+                max_win_streak = max(max_win_streak, win_streak)
+            else:
+                loss_streak += 1
+                win_streak = 0
+                max_loss_streak = max(max_loss_streak, loss_streak)
+            balance = h['balance']
+            round_num = h['round'] + 1
+            if next_server_hash:
+                server_hash = next_server_hash
+                next_server_hash = None
+            rounds.append((h, session_state()))
+        journal.add_rounds(rounds)  # one write for the whole run
+        wins = sum(1 for h in played if h['result'] == 'WIN')
+        print(f"Auto-played {len(played)} round(s) with {strategy_name}: {wins} wins, {len(played) - wins} losses. "
+              f"Balance: ${balance:.2f}")
+        if len(played) < auto_rounds:
+            print("Stopped early: not enough balance for the next bet.")
+        continue
+    if guess == 's':
+        advanced_stats()
+        continue
+    if guess == 'u':
+        undo_round()
+        continue
+    if guess == 'save':
+        save_session()
+        continue
+    if guess == 'load':
+        load_session()
         continue
     if guess == 'url':
         url = input("Paste the Stake.us game URL: ").strip()
@@ -381,6 +416,7 @@ while True:
                 print("Invalid input.")
         continue
     if guess == 'q':
+        record_leaderboard()
         print("Thanks for playing!")
         break
     if guess == 'o':
@@ -394,6 +430,7 @@ while True:
             new_bet = float(input("Enter new bet amount: "))
             if new_bet > 0:
                 bet_amount = new_bet
+                journal.set_state(session_state())
                 print(f"Bet amount set to ${bet_amount:.2f}")
             else:
                 print("Bet must be positive.")
@@ -407,10 +444,11 @@ while True:
         loss_streak = 0
         max_win_streak = 0
         max_loss_streak = 0
-        history.clear()
+        stats = SessionStats()
 
         client_seed = input("Paste your Active Client Seed (or leave blank for random): ").strip() or str(random.randint(1, 1_000_000_000))
         server_hash = input("Paste the Server Hash (or leave blank for random): ").strip() or str(random.randint(1, 1_000_000_000))
+        journal.reset(session_state())
         print(f"Reset! Using Client Seed: {client_seed}")
         print(f"Using Server Hash: {server_hash}")
         continue
@@ -426,6 +464,7 @@ while True:
         continue
     if balance < bet_amount:
         print("Not enough balance to bet!")
+        record_leaderboard()
         break
     # Provably fair number
     number = provably_fair_number(client_seed, server_hash, round_num)
@@ -444,7 +483,7 @@ while True:
         loss_streak += 1
         win_streak = 0
         max_loss_streak = max(max_loss_streak, loss_streak)
-    history.append({
+    entry = {
         'round': round_num,
         'guess': guess,
         'number': number,
@@ -453,11 +492,13 @@ while True:
         'client_seed': client_seed,
         'server_hash': server_hash,
         'bet': bet_amount
-    })
+    }
+    stats.add(entry)
     round_num += 1
     if next_server_hash:
         server_hash = next_server_hash
         next_server_hash = None
+    journal.add_rounds([(entry, session_state())])
     time.sleep(1)
 
 # The end
@@ -0,0 +1,260 @@
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+
+from stake_leaderboard import atomic_write_json
+
+SAVE_FILE = "stake_guesser_save.json"
+COMPACT_EVERY = 500  # journal records before a snapshot, at least (grows with the history)
+UNDO_DEPTH = 100  # rounds 'u' can take back
+
+
+def journal_path(snapshot_path):
+    """The journal written next to a snapshot: stake_guesser_save.json -> stake_guesser_save.jsonl."""
+    return os.path.splitext(snapshot_path)[0] + '.jsonl'
+
+
+class SessionJournal:
+    """
+    stake_guesser's history and session state, saved as a snapshot plus an
+    append-only journal.
+
+    The snapshot is the old save_session() file (history and state, with the
+    journal sequence number it covers and the undo stack). Once a session is
+    saved or loaded, every change appends one JSON line to the journal and
+    fsyncs it: a round with the state after it, a tombstone for an undo, or
+    a state change. A save therefore costs the same whatever the length of
+    the history. When the journal has as many records as the history has
+    rounds (and at least `compact_every`), it is folded into a new snapshot
+    and truncated, which keeps compaction amortised O(1) per round.
+
+    Loading reads the snapshot and replays the journal records newer than
+    it, so a crash between writing a snapshot and truncating the journal
+    replays nothing twice, and a torn last line is dropped. The snapshot and
+    the journal's first line carry a session id: a journal left next to the
+    file by another session is ignored rather than replayed, so saving over
+    an old save never has to empty anything before its snapshot is safe.
+    Undo restores the state from before the latest round; the last
+    `undo_depth` of those are kept, across saves and loads.
+    """
+
+    def __init__(self, compact_every=COMPACT_EVERY, undo_depth=UNDO_DEPTH):
+        self.compact_every = compact_every
+        self.history = []
+        self.state = {}
+        self.undo_stack = deque(maxlen=undo_depth)  # state before each of the latest rounds
+        self.seq = 0  # last record number written or replayed
+        self.records = 0  # journal records since the snapshot
+        self.path = None
+        self.session = None  # id shared by the snapshot and its journal
+        self._journal = None
+
+    @property
+    def attached(self):
+        return self._journal is not None
+
+    # --- Recording ---
+
+    def add_rounds(self, rounds):
+        """Append played rounds, given as (history entry, state after it) pairs, in one journal write."""
+        lines = []
+        for entry, state in rounds:
+            self.undo_stack.append(self.state)
+            self.history.append(entry)
+            self.state = state
+            lines.append({'op': 'round', 'entry': entry, 'state': state})
+        self._append(lines)
+
+    def set_state(self, state):
+        """Record a change that is not a round, like the bet amount."""
+        self.state = state
+        self._append([{'op': 'state', 'state': state}])
+
+    def undo(self):
+        """Take back the latest round; returns the state from before it, or None if it can't be undone."""
+        if not self.history or not self.undo_stack:
+            return None
+        self.history.pop()
+        self.state = self.undo_stack.pop()
+        self._append([{'op': 'undo'}])
+        return self.state
+
+    def reset(self, state):
+        """Start over with an empty history (the 'r' command)."""
+        self.history.clear()
+        self.undo_stack.clear()
+        self.state = state
+        if self.attached:
+            self.compact()
+
+    def _append(self, records):
+        if not self.attached or not records:
+            return
+        for record in records:
+            self.seq += 1
+            record['seq'] = self.seq
+        self._journal.write(''.join(json.dumps(r, separators=(',', ':')) + '\n' for r in records))
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self.records += len(records)
+        if self.records >= max(self.compact_every, len(self.history)):
+            self.compact()
+
+    # --- Snapshots ---
+
+    def save(self, state, path=SAVE_FILE):
+        """Write a snapshot to `path` and journal every later change next to it."""
+        self.state = state
+        if self.attached and path == self.path:
+            self.compact()
+            return
+        self.close()
+        self.path = path
+        self.session = os.urandom(8).hex()
+        self._journal = open(journal_path(path), 'a')
+        self.compact()
+
+    def compact(self):
+        """Fold the journal into a new snapshot, then empty the journal."""
+        atomic_write_json(self.path, dict(self.state, history=self.history, seq=self.seq,
+                                          undo=list(self.undo_stack), session=self.session))
+        # Append mode: after the truncate the header is written at offset 0
+        self._journal.truncate(0)
+        self._journal.write(json.dumps({'op': 'begin', 'session': self.session}) + '\n')
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self.records = 0
+
+    def load(self, path=SAVE_FILE):
+        """Read the snapshot at `path`, replay its journal and keep journaling there. Returns the state."""
+        with open(path) as f:
+            data = json.load(f)
+        history = data.pop('history')
+        undo = data.pop('undo', [])
+        seq = data.pop('seq', 0)
+        session = data.pop('session', None)
+        self.close()
+        self.history[:] = history  # in place: stake_guesser holds on to this list
+        self.undo_stack.clear()
+        self.undo_stack.extend(undo)
+        self.state = data
+        self.seq = seq
+        self.records = 0
+        self.path = path
+        self.session = session
+        self._journal = open(journal_path(path), 'a')
+        if not self._replay():
+            # No journal of this snapshot (an older save file, or another session's leftovers)
+            self.session = self.session or os.urandom(8).hex()
+            self.compact()
+        return self.state
+
+    def _replay(self):
+        """Apply this snapshot's journal; False if the journal doesn't belong to it."""
+        good = 0  # bytes of whole records, so a torn last line can be cut off
+        with open(journal_path(self.path), 'rb') as f:
+            header = f.readline()
+            try:
+                begin = json.loads(header)
+            except ValueError:
+                return False
+            if self.session is None or not header.endswith(b'\n') \
+                    or begin != {'op': 'begin', 'session': self.session}:
+                return False
+            good = len(header)
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                good += len(line)
+                if record['seq'] <= self.seq:
+                    continue  # already in the snapshot
+                self.seq = record['seq']
+                self.records += 1
+                op = record['op']
+                if op == 'round':
+                    self.undo_stack.append(self.state)
+                    self.history.append(record['entry'])
+                    self.state = record['state']
+                elif op == 'undo':
+                    self.history.pop()
+                    self.state = self.undo_stack.pop()
+                else:
+                    self.state = record['state']
+        if good != self._journal.tell():
+            self._journal.truncate(good)
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+        return True
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+# --- Benchmark ---
+
+def _state(i, balance):
+    return {'balance': balance, 'round_num': i + 2, 'win_streak': 0, 'loss_streak': 0, 'max_win_streak': 3,
+            'max_loss_streak': 4, 'client_seed': '12345', 'server_hash': 'abcdef', 'bet_amount': 5.0}
+
+
+def benchmark(path='stake_journal_bench.json', rounds=1_000):
+    """Per-round save cost: rewriting the whole save file versus the journal, and load time."""
+    rng = random.Random(1)
+    entries = []
+    for i in range(rounds):
+        number = rng.randint(1, 100)
+        entries.append({'round': i + 1, 'guess': 'h', 'number': number, 'result': 'WIN' if number > 50 else 'LOSS',
+                        'balance': 100.0, 'client_seed': '12345', 'server_hash': 'abcdef', 'bet': 5.0})
+
+    history = []
+    start = time.perf_counter()
+    for i, entry in enumerate(entries):
+        history.append(entry)
+        with open(path, 'w') as f:
+            json.dump(dict(_state(i, 100.0), history=history), f)
+    full = (time.perf_counter() - start) / rounds * 1e6
+
+    try:
+        _bench_journal(path, rounds, entries, full)
+    finally:
+        for p in (path, journal_path(path)):
+            if os.path.exists(p):
+                os.remove(p)
+
+
+def _bench_journal(path, rounds, entries, full):
+    journal = SessionJournal()
+    journal.save(_state(-1, 100.0), path)
+    start = time.perf_counter()
+    for i, entry in enumerate(entries):
+        journal.add_rounds([(entry, _state(i, 100.0))])
+    journaled = (time.perf_counter() - start) / rounds * 1e6
+    for _ in range(3):
+        journal.undo()
+    journal.close()
+    print(f"{rounds} rounds: rewriting the save file {full:.0f} us per round on average "
+          f"(unsynced, growing with the history), journal {journaled:.0f} us per round (fsynced)")
+
+    start = time.perf_counter()
+    loaded = SessionJournal()
+    state = loaded.load(path)
+    print(f"load: {(time.perf_counter() - start) * 1000:.1f} ms for {len(loaded.history)} rounds "
+          f"({loaded.records} replayed from the journal), round_num {state['round_num']}")
+    assert loaded.history == entries[:-3] and state == _state(rounds - 4, 100.0)
+    loaded.close()
+
+
+if __name__ == "__main__":
+    if '--bench' in sys.argv:
+        benchmark()
+    else:
+        print("Usage: python stake_journal.py --bench")
@@ -0,0 +1,193 @@
+import heapq
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+LEADERBOARD_FILE = "stake_guesser_leaderboard.json"
+TOP_K = 10
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive lock on `path` + '.lock', held across processes (flock on POSIX, msvcrt on Windows)."""
+    with open(path + '.lock', 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK gives up after 10 s; keep waiting
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def atomic_write_json(path, data):
+    """Write `data` to a temp file next to `path`, fsync it and rename it over `path`."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _key(entry):
+    return entry['balance'], entry['max_win_streak']
+
+
+class Leaderboard:
+    """
+    Top-K leaderboard in a JSON file, cached in memory.
+
+    entries() and text() only re-read the file when its mtime, size or
+    inode changed, so showing the board every round costs one stat().
+    add() keeps the best `k` entries with a bounded min-heap instead of
+    re-sorting the whole board; ties go to the entry that was there first.
+    Writes hold a lock file while they re-read, update and atomically
+    replace the board, so concurrent sessions never lose each other's
+    entries and a crash never leaves a half-written file.
+    """
+
+    def __init__(self, path=LEADERBOARD_FILE, k=TOP_K):
+        self.path = path
+        self.k = k
+        self._entries = []  # best first
+        self._text = None
+        self._stamp = None  # file identity the cache was read from
+        self.reads = 0
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def _refresh(self):
+        stamp = self._file_stamp()
+        if stamp == self._stamp and self.reads:
+            return
+        entries = []
+        if stamp is not None:
+            try:
+                with open(self.path) as f:
+                    entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Leaderboard unreadable ({e}); starting a new one.")
+        self.reads += 1
+        self._entries = sorted(entries, key=_key, reverse=True)[:self.k]
+        self._text = None
+        self._stamp = stamp
+
+    def entries(self):
+        self._refresh()
+        return self._entries
+
+    def text(self):
+        """The board as printed by stake_guesser, rendered once per change."""
+        self._refresh()
+        if self._text is None:
+            lines = [f"Leaderboard (Top {self.k}):"]
+            for i, entry in enumerate(self._entries, 1):
+                lines.append(f"{i}. {entry['name']} - ${entry['balance']:.2f} | Max Streak: {entry['max_win_streak']}")
+            self._text = '\n'.join(lines)
+        return self._text
+
+    def add(self, name, balance, max_win_streak):
+        """Record a result; returns the updated board, best first."""
+        entry = {'name': name, 'balance': balance, 'max_win_streak': max_win_streak}
+        with file_lock(self.path):
+            self._refresh()
+            # Min-heap of the board: (key, -position) so a newer entry loses ties
+            heap = [(_key(e), -i, e) for i, e in enumerate(self._entries)]
+            heapq.heapify(heap)
+            item = (_key(entry), -len(heap), entry)
+            if len(heap) < self.k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+            else:
+                return self._entries
+            entries = [e for _, _, e in sorted(heap, reverse=True)]
+            atomic_write_json(self.path, entries)
+            self._entries = entries
+            self._text = None
+            self._stamp = self._file_stamp()
+        return entries
+
+
+def _add_many(path, name, count):
+    board = Leaderboard(path)
+    for i in range(count):
+        board.add(f"{name}-{i}", float(i % 997), i % 13)
+
+
+def benchmark(path='stake_leaderboard_bench.json', rounds=20_000):
+    """Showing the board every round, uncached versus cached, and concurrent writers."""
+    from concurrent.futures import ProcessPoolExecutor
+    if os.path.exists(path):
+        os.remove(path)
+    board = Leaderboard(path)
+    for i in range(TOP_K):
+        board.add(f"player{i}", 100.0 + i, i)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        with open(path) as f:
+            lb = json.load(f)
+        '\n'.join(f"{i}. {e['name']} - ${e['balance']:.2f} | Max Streak: {e['max_win_streak']}"
+                  for i, e in enumerate(lb, 1))
+    uncached = (time.perf_counter() - start) / rounds * 1e6
+    start = time.perf_counter()
+    for _ in range(rounds):
+        board.text()
+    cached = (time.perf_counter() - start) / rounds * 1e6
+    print(f"show leaderboard: {uncached:.1f} us re-reading the file, {cached:.1f} us cached")
+
+    n = 200
+    start = time.perf_counter()
+    for i in range(n):
+        board.add(f"bench{i}", 50.0 + i, 1)
+    print(f"add: {(time.perf_counter() - start) / n * 1000:.2f} ms each (lock, re-read, atomic write)")
+
+    # Four processes racing to add entries that all beat the current board: the lock keeps every write
+    os.remove(path)
+    writers, each = 4, 50
+    with ProcessPoolExecutor(max_workers=writers) as pool:
+        list(pool.map(_add_many, [path] * writers, [f"w{w}" for w in range(writers)], [each] * writers))
+    final = Leaderboard(path).entries()
+    expected = sorted(((float(i % 997), i % 13) for _ in range(writers) for i in range(each)), reverse=True)[:TOP_K]
+    print(f"{writers} concurrent writers x {each} adds: board valid JSON with {len(final)} entries, "
+          f"{'matches' if [_key(e) for e in final] == expected else 'DOES NOT match'} the best {TOP_K} of all adds")
+    for suffix in ('', '.lock'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    if '--bench' in sys.argv:
+        benchmark()
+    else:
+        print("Usage: python stake_leaderboard.py --bench")
@@ -0,0 +1,29 @@
+import asyncio
+
+from discord_sender import SendQueue, SendRateLimited
+
+
+def test_rate_limited_broadcasts_all_resolve():
+    """A 429 on a batch of keyless broadcasts requeues every message, and every future resolves."""
+    sent = []
+    limited = [True]
+
+    async def send(target, content, embed=None):
+        if limited[0]:
+            limited[0] = False
+            raise SendRateLimited(0.2)
+        sent.append(content)
+
+    async def run():
+        queue = SendQueue(send, route_rate=(5, 0.5)).start()  # a short window: the 429 empties it
+        futures = [queue.submit(1, text) for text in 'abc']
+        results = await asyncio.wait_for(asyncio.gather(*futures), timeout=5)
+        stats = queue.stats()
+        await queue.close()
+        return results, stats
+
+    results, stats = asyncio.run(run())
+    assert results == [True, True, True]
+    assert '\n'.join(sent).split('\n') == ['a', 'b', 'c']
+    assert stats['rate_limited'] == 1
+    assert stats['pending'] == 0
@@ -0,0 +1,38 @@
+import pytest
+
+from stake_autoplay import simulate
+
+SEEDS = ('12345', 'ab' * 32)
+
+
+def flat(rounds, **kwargs):
+    # A balance no flat 5.0 bet can run out of, so every round is played
+    return simulate('flat', rounds, *SEEDS, start_balance=1e9, workers=1, **kwargs)
+
+
+@pytest.mark.parametrize('rounds, sessions, session_rounds', [(500, 1, 500), (1000, 1, 1000), (3000, 3, 1000)])
+def test_plays_the_requested_rounds(rounds, sessions, session_rounds):
+    result = flat(rounds)
+    assert result.rounds == rounds
+    assert len(result.finals) == sessions
+    assert result.session_rounds == session_rounds
+    assert all(len(curve) == session_rounds // result.curve_every for curve in result.curves)
+    assert sum(n * length for streaks in (result.win_streaks, result.loss_streaks)
+               for length, n in streaks.items()) == rounds
+
+
+def test_sharding_does_not_change_the_result():
+    one = flat(4000, session_rounds=500)
+    sharded = simulate('flat', 4000, *SEEDS, start_balance=1e9, session_rounds=500, workers=3)
+    assert (sharded.rounds, sharded.finals, sharded.curves) == (one.rounds, one.finals, one.curves)
+
+
+@pytest.mark.parametrize('rounds', [0, -5, 1500])
+def test_rejects_round_counts(rounds):
+    with pytest.raises(ValueError):
+        flat(rounds)
+
+
+def test_rejects_unknown_strategy():
+    with pytest.raises(ValueError):
+        simulate('nope', 100, *SEEDS)
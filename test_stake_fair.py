@@ -0,0 +1,35 @@
+import pytest
+
+from stake_fair import seed_segments, synthetic_rounds, verify_rounds
+
+
+def tamper(rounds, i):
+    rounds[i] = dict(rounds[i], number=rounds[i]['number'] % 100 + 1)
+    return rounds[i]['number']
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_mismatches_across_seed_rotation(workers):
+    rounds = synthetic_rounds(250, rotate_every=100)
+    assert len(list(seed_segments(rounds))) == 3
+    assert verify_rounds(rounds, workers=workers, chunk_rounds=40).ok
+
+    # Both sides of the first rotation, and the last round of the last pair
+    recorded = {i: tamper(rounds, i) for i in (99, 100, 249)}
+    report = verify_rounds(rounds, workers=workers, chunk_rounds=40)
+    assert report.rounds == 250 and report.seed_pairs == 3
+    assert [m[0] for m in report.mismatches] == [99, 100, 249]
+    for index, round_num, expected, got, client_seed, server_hash in report.mismatches:
+        h = rounds[index]
+        assert round_num == h['round'] == index + 1
+        assert got == recorded[index] != expected
+        assert (client_seed, server_hash) == (h['client_seed'], h['server_hash'])
+    assert report.mismatches[0][5] != report.mismatches[1][5]
+
+
+def test_rounds_without_seeds_use_the_previous_pair():
+    rounds = synthetic_rounds(30, rotate_every=10)
+    for h in rounds[12:15]:
+        del h['client_seed'], h['server_hash']
+    assert verify_rounds(rounds, workers=1).ok
+    assert [(start, stop) for _, _, start, stop in seed_segments(rounds)] == [(0, 10), (10, 20), (20, 30)]
@@ -0,0 +1,112 @@
+import json
+
+import pytest
+
+import stake_journal
+from stake_journal import SessionJournal, journal_path
+
+
+def state(round_num, balance=100.0):
+    return {'balance': balance, 'round_num': round_num, 'win_streak': 0, 'loss_streak': 0, 'max_win_streak': 0,
+            'max_loss_streak': 0, 'client_seed': 'c', 'server_hash': 's', 'bet_amount': 5.0}
+
+
+def play(journal, first, n):
+    for r in range(first, first + n):
+        journal.add_rounds([({'round': r, 'result': 'WIN', 'balance': 100.0 + r}, state(r + 1, 100.0 + r))])
+
+
+def test_compact_and_reload(tmp_path):
+    path = str(tmp_path / 'save.json')
+    journal = SessionJournal(compact_every=3)
+    journal.save(state(1), path)
+    play(journal, 1, 5)  # compacts after the third round
+    journal.close()
+    with open(journal_path(path), 'rb') as f:
+        assert not f.read().startswith(b'\x00')
+
+    loaded = SessionJournal(compact_every=3)
+    assert loaded.load(path) == state(6, 105.0)
+    assert [h['round'] for h in loaded.history] == [1, 2, 3, 4, 5]
+    loaded.close()
+
+
+def test_undo_survives_reload(tmp_path):
+    path = str(tmp_path / 'save.json')
+    journal = SessionJournal()
+    journal.save(state(1), path)
+    play(journal, 1, 3)
+    assert journal.undo() == state(3, 102.0)
+    journal.close()
+
+    loaded = SessionJournal()
+    assert loaded.load(path) == state(3, 102.0)
+    assert [h['round'] for h in loaded.history] == [1, 2]
+    assert loaded.undo() == state(2, 101.0)
+    loaded.close()
+
+
+def test_torn_tail_is_dropped(tmp_path):
+    path = str(tmp_path / 'save.json')
+    journal = SessionJournal()
+    journal.save(state(1), path)
+    play(journal, 1, 2)
+    journal.close()
+    with open(journal_path(path), 'a') as f:
+        f.write('{"op":"round","seq":9')
+
+    loaded = SessionJournal()
+    assert loaded.load(path) == state(3, 102.0)
+    play(loaded, 3, 1)
+    loaded.close()
+    again = SessionJournal()
+    again.load(path)
+    assert [h['round'] for h in again.history] == [1, 2, 3]
+    again.close()
+
+
+def test_resave_keeps_rounds_if_compaction_crashes(tmp_path, monkeypatch):
+    path = str(tmp_path / 'save.json')
+    journal = SessionJournal()
+    journal.save(state(1), path)
+    play(journal, 1, 5)
+
+    def crash(*args):
+        raise OSError("disk full")
+    monkeypatch.setattr(stake_journal, 'atomic_write_json', crash)
+    with pytest.raises(OSError):
+        journal.save(journal.state, path)
+    journal.close()
+    monkeypatch.undo()
+
+    loaded = SessionJournal()
+    loaded.load(path)
+    assert [h['round'] for h in loaded.history] == [1, 2, 3, 4, 5]
+    loaded.close()
+
+
+def test_foreign_journal_is_not_replayed(tmp_path, monkeypatch):
+    path = str(tmp_path / 'save.json')
+    a = SessionJournal()
+    a.save(state(1), path)
+    play(a, 1, 3)
+    a._journal.close()  # session A dies without compacting
+
+    b = SessionJournal()
+    real_write = stake_journal.atomic_write_json
+
+    def write_then_crash(p, data):
+        real_write(p, data)
+        raise OSError("crash before the journal is reset")
+    monkeypatch.setattr(stake_journal, 'atomic_write_json', write_then_crash)
+    with pytest.raises(OSError):
+        b.save(state(1, 7.0), path)
+    b.close()
+    monkeypatch.undo()
+
+    loaded = SessionJournal()
+    assert loaded.load(path) == state(1, 7.0)
+    assert loaded.history == []
+    loaded.close()
+    with open(journal_path(path)) as f:
+        assert json.loads(f.readline())['session'] == loaded.session
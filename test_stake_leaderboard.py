@@ -0,0 +1,46 @@
+import json
+
+from stake_leaderboard import Leaderboard
+
+
+def names(entries):
+    return [e['name'] for e in entries]
+
+
+def test_keeps_the_best_k(tmp_path):
+    path = str(tmp_path / 'board.json')
+    board = Leaderboard(path, k=3)
+    for i, balance in enumerate([50.0, 200.0, 10.0, 120.0, 80.0]):
+        board.add(f"p{i}", balance, 0)
+    assert names(board.entries()) == ['p1', 'p3', 'p4']
+    with open(path) as f:
+        assert names(json.load(f)) == ['p1', 'p3', 'p4']
+
+    # Not good enough: the board and its file stay as they were
+    stamp = board._file_stamp()
+    assert names(board.add('low', 1.0, 9)) == ['p1', 'p3', 'p4']
+    assert board._file_stamp() == stamp
+
+
+def test_ties_go_to_the_older_entry(tmp_path):
+    path = str(tmp_path / 'board.json')
+    board = Leaderboard(path, k=2)
+    board.add('first', 100.0, 2)
+    board.add('second', 100.0, 2)
+    assert names(board.add('third', 100.0, 2)) == ['first', 'second']
+    # The streak breaks a balance tie
+    assert names(board.add('streak', 100.0, 3)) == ['streak', 'first']
+    assert names(Leaderboard(path, k=2).entries()) == ['streak', 'first']
+
+
+def test_sees_other_writers(tmp_path):
+    path = str(tmp_path / 'board.json')
+    mine, theirs = Leaderboard(path), Leaderboard(path)
+    mine.add('me', 10.0, 1)
+    assert mine.text() == mine.text()
+    reads = mine.reads
+    theirs.add('them', 20.0, 1)
+    assert names(mine.entries()) == ['them', 'me']
+    assert mine.reads == reads + 1
+    # No temp files left behind by the atomic writes
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['board.json', 'board.json.lock']